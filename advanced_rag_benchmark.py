@@ -3,13 +3,13 @@
 import os
 import time
 import numpy as np
-import faiss
-import requests
 import json
 import re
 import argparse
 
-from sentence_transformers import SentenceTransformer
+from llm_client import LLMClient
+from interactive_session import InteractiveSession, run_session, add_session_arguments
+from retrieval import load_index_metadata, apply_search_parameters
 
 # --- Configuration ---
 TEXT_FILE_PATH = "my_document.txt" # Assumes this is a large file now
@@ -19,10 +19,12 @@ EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 # For IVF Index
 NLIST = 64          # Number of clusters/cells. For a few thousand vectors, 16-64 is a good start.
 NPROBE = 8          # Number of nearby clusters to search at query time. Higher is more accurate but slower.
+# index_param_sweep.py --write-metadata my_document_ivf.faiss stores measured values that replace these
 
 TOP_K = 3
 OLLAMA_MODEL_NAME = "gemma3:1b"
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
+OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_KEEP_ALIVE = "30m" # Keep the model loaded between queries
 
 # --- Chunking Configuration (can be tuned) ---
 CHUNK_SIZE_CHARS = 1000
@@ -59,10 +61,11 @@ def recursive_character_splitter(text: str, chunk_size: int, chunk_overlap: int)
     return [c.strip() for c in final_chunks if c.strip()]
 
 
-def create_and_save_index(text_file, index_path, chunks_path, model, index_type='flat'):
+def create_and_save_index(text_file, index_path, chunks_path, model, index_type='flat', nlist=NLIST):
     """
     Creates and saves a FAISS index based on the specified type ('flat' or 'ivf').
     """
+    import faiss
     print(f"--- Creating new FAISS index of type: {index_type.upper()} ---")
     start_time = time.time()
 
@@ -86,14 +89,14 @@ def create_and_save_index(text_file, index_path, chunks_path, model, index_type=
 
     # --- Index creation logic based on type ---
     if index_type == 'ivf':
-        print(f"Building IVF index with nlist={NLIST}...")
+        print(f"Building IVF index with nlist={nlist}...")
         quantizer = faiss.IndexFlatL2(embedding_dim)
-        index = faiss.IndexIVFFlat(quantizer, embedding_dim, NLIST)
+        index = faiss.IndexIVFFlat(quantizer, embedding_dim, nlist)
         
         # Training the index on the data
         print("Training index...")
-        if embeddings.shape[0] < NLIST:
-            print(f"Warning: Number of vectors ({embeddings.shape[0]}) is less than nlist ({NLIST}). This is not ideal.")
+        if embeddings.shape[0] < nlist:
+            print(f"Warning: Number of vectors ({embeddings.shape[0]}) is less than nlist ({nlist}). This is not ideal.")
         index.train(embeddings)
         print("Training complete.")
 
@@ -120,6 +123,7 @@ def create_and_save_index(text_file, index_path, chunks_path, model, index_type=
 
 def load_existing_index(index_path, chunks_path):
     # This function works for any index type
+    import faiss
     print("--- Loading existing FAISS index ---")
     try:
         index = faiss.read_index(index_path)
@@ -142,6 +146,7 @@ def main():
         help="Type of FAISS index to use ('flat' for IndexFlatL2, 'ivf' for IndexIVFFlat)."
     )
     parser.add_argument('-v', '--verbose', action='store_true', help="Print the context sent to the LLM.")
+    add_session_arguments(parser)
     args = parser.parse_args()
 
     print(f"--- RAG Benchmark using {args.index_type.upper()} index ---")
@@ -151,13 +156,19 @@ def main():
     CHUNKS_PATH = f"my_document_{args.index_type}_chunks.json"
 
     print(f"Loading embedding model: {EMBEDDING_MODEL_NAME}...")
+    from sentence_transformers import SentenceTransformer
     model = SentenceTransformer(EMBEDDING_MODEL_NAME)
     print("Embedding model loaded.")
 
+    # Parameters recommended by index_param_sweep.py, if it was run for this index
+    metadata = load_index_metadata(FAISS_INDEX_PATH)
+    nlist = metadata.get("build_parameters", {}).get("nlist", NLIST) if metadata.get("index_type") == "ivf" else NLIST
+
     if os.path.exists(FAISS_INDEX_PATH) and os.path.exists(CHUNKS_PATH):
         index, chunks = load_existing_index(FAISS_INDEX_PATH, CHUNKS_PATH)
     else:
-        index, chunks = create_and_save_index(TEXT_FILE_PATH, FAISS_INDEX_PATH, CHUNKS_PATH, model, args.index_type)
+        index, chunks = create_and_save_index(TEXT_FILE_PATH, FAISS_INDEX_PATH, CHUNKS_PATH, model, args.index_type,
+                                              nlist=nlist)
 
     if index is None or chunks is None:
         print("Failed to load or create an index. Exiting.")
@@ -166,27 +177,22 @@ def main():
     # --- IMPORTANT: Set search-time parameters for IVF index ---
     if args.index_type == 'ivf':
         index.nprobe = NPROBE
-        print(f"IVF index search parameter set: nprobe = {NPROBE}")
+        apply_search_parameters(index, metadata.get("search_parameters", {}), metadata.get("build_parameters", {}))
+        print(f"IVF index search parameter set: nprobe = {index.nprobe}")
 
-    # --- Interactive Query Loop ---
-    print("\n--- Ready to Chat! ---")
-    
-    while True:
-        query = input("\nQuery (or 'quit'): ")
-        if query.lower() in ['quit', 'exit']: break
+    # One client for the whole session, so the connection to Ollama is reused
+    client = LLMClient(base_url=OLLAMA_BASE_URL, api="ollama", keep_alive=OLLAMA_KEEP_ALIVE)
 
-        # STAGE 1: SEARCH & RETRIEVAL
-        start_retrieval_time = time.time()
+    def search(query):
         query_embedding = model.encode([query]).astype('float32')
         D, I = index.search(query_embedding, TOP_K)
-        retrieved_chunks = [chunks[i] for i in I[0]]
-        end_retrieval_time = time.time()
-        retrieval_duration = end_retrieval_time - start_retrieval_time
-        
-        context_str = "\n\n".join(retrieved_chunks)
+        return [chunks[i] for i in I[0]]
 
-        # STAGE 2: LLM RESPONSE GENERATION
-        prompt = f"""
+    def build_prompt(query, retrieved_chunks):
+        context_str = "\n\n".join(retrieved_chunks)
+        if args.verbose:
+            print("\n\n--- [VERBOSE] Context Sent to LLM ---\n" + context_str + "\n---------------------------------------")
+        return f"""
         Based on the following context, please answer the user's question.
         If the context does not contain the answer, state that the information is not available.
 
@@ -199,26 +205,13 @@ def main():
         Answer:
         """
         #prompt = f"Context:\n{context_str}\n\nQuestion:\n{query}\n\nAnswer:"
-        start_llm_time = time.time()
-        try:
-            response = requests.post(OLLAMA_API_URL, json={"model": OLLAMA_MODEL_NAME, "prompt": prompt, "stream": False}, timeout=120)
-            response.raise_for_status()
-            generated_text = response.json().get('response', '').strip()
-        except requests.exceptions.RequestException as e:
-            generated_text = f"Error communicating with Ollama: {e}"
-        end_llm_time = time.time()
-        llm_duration = end_llm_time - start_llm_time
 
-        if args.verbose:
-            print("\n\n--- [VERBOSE] Context Sent to LLM ---\n" + context_str + "\n---------------------------------------")
-
-        print("\n--- Answer ---\n" + generated_text)
-        print("\n--- Benchmarks ---")
-        print(f"  Index Type:         {args.index_type.upper()}")
-        print(f"  Search & Retrieval: {retrieval_duration:.4f} seconds")
-        print(f"  LLM Generation:     {llm_duration:.4f} seconds")
-        print(f"  Total Time:         {retrieval_duration + llm_duration:.4f} seconds")
-        print("--------------------")
+    session = InteractiveSession(client, OLLAMA_MODEL_NAME, search, build_prompt)
+    try:
+        run_session(session, replay=args.replay, pause=args.replay_pause, output=args.output,
+                    extra=[("Index Type", args.index_type.upper())])
+    finally:
+        client.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,103 @@
+"""Aggregate throughput of AsyncLLMClient with 1, 2 and 4 concurrent requests.
+
+By default a local stub server (stub_llm_server.py) with a fixed token rate
+and 4 parallel slots stands in for llama-server, so the numbers show how well
+the client overlaps requests rather than model speed. Pass --base-url to run
+against a real llama-server started with a matching `-np`.
+
+Example:
+    python async_client_benchmark.py --concurrency 1 2 4 --n-requests 8
+"""
+
+import time
+import asyncio
+import argparse
+import numpy as np
+from llm_client import AsyncLLMClient
+from stub_llm_server import StubServer
+
+
+async def run_request(client, model, max_tokens):
+    """Stream one completion; returns (ttft, duration, n_tokens)."""
+    start = time.perf_counter()
+    ttft = None
+    n_tokens = 0
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": "Count to fifty."}],
+        temperature=0.0,
+        max_tokens=max_tokens,
+        stream=True
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            n_tokens += 1
+    return ttft or 0.0, time.perf_counter() - start, n_tokens
+
+
+async def run_level(base_url, model, concurrency, n_requests, max_tokens):
+    """Send n_requests with at most `concurrency` in flight."""
+    async with AsyncLLMClient(base_url=base_url, max_concurrency=concurrency) as client:
+        # One request first so connection setup is not part of the measurement
+        await run_request(client, model, 1)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            run_request(client, model, max_tokens) for _ in range(n_requests)
+        ))
+        wall = time.perf_counter() - start
+
+    total_tokens = sum(n for _, _, n in results)
+    return {
+        "concurrency": concurrency,
+        "wall": wall,
+        "tokens_per_second": total_tokens / wall if wall > 0 else 0.0,
+        "requests_per_second": n_requests / wall if wall > 0 else 0.0,
+        "mean_ttft": float(np.mean([ttft for ttft, _, _ in results])),
+        "mean_latency": float(np.mean([duration for _, duration, _ in results])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure AsyncLLMClient throughput at several concurrency levels')
+    parser.add_argument('--base-url', type=str, default=None,
+                        help='Server to benchmark (default: start a local stub server)')
+    parser.add_argument('--model', type=str, default='dummy', help='Model name to send (default: dummy)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4],
+                        help='Concurrency levels to test (default: 1 2 4)')
+    parser.add_argument('--n-requests', type=int, default=8, help='Requests per level (default: 8)')
+    parser.add_argument('--max-tokens', type=int, default=50, help='Tokens per request (default: 50)')
+    parser.add_argument('--token-delay', type=float, default=0.01,
+                        help='Stub server seconds per token (default: 0.01)')
+    parser.add_argument('--slots', type=int, default=4, help='Stub server parallel slots (default: 4)')
+    args = parser.parse_args()
+
+    stub = None
+    base_url = args.base_url
+    if base_url is None:
+        stub = StubServer(token_delay=args.token_delay, n_tokens=args.max_tokens, slots=args.slots).start()
+        base_url = stub.base_url
+        print(f"Started stub server at {base_url} ({args.slots} slots, {args.token_delay * 1000:.1f} ms/token)")
+
+    try:
+        results = [
+            asyncio.run(run_level(base_url, args.model, c, args.n_requests, args.max_tokens))
+            for c in args.concurrency
+        ]
+    finally:
+        if stub is not None:
+            stub.stop()
+
+    baseline = results[0]["tokens_per_second"]
+    print("\n--- Async client throughput ---")
+    print(f"{'Concurrency':>11} | {'Wall (s)':>8} | {'Tokens/s':>9} | {'Req/s':>6} | {'TTFT (s)':>8} | {'Latency (s)':>11} | Speedup")
+    for r in results:
+        speedup = r["tokens_per_second"] / baseline if baseline else 0.0
+        print(f"{r['concurrency']:>11} | {r['wall']:>8.3f} | {r['tokens_per_second']:>9.1f} | "
+              f"{r['requests_per_second']:>6.2f} | {r['mean_ttft']:>8.4f} | {r['mean_latency']:>11.4f} | {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
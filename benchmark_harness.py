@@ -0,0 +1,280 @@
+"""Benchmark entry point: a query set through the full RAG pipeline, with percentiles.
+
+Every query of the query-set file goes through the same stages as
+rag_benchmark.py (query encoding, search, prompt building, LLM generation)
+with every stage timed by time.perf_counter(). The first --warmup queries are
+run but not recorded, so model loading, cold caches and the first LLM prompt
+do not end up in the numbers. Results are reported as p50/p90/p99 per stage
+and written as JSON (configuration, summary and raw samples) so runs can be
+compared later.
+
+Stages:
+    encode      query embedding
+    search      vector / BM25 search, fusion, topic filter, MMR and merging
+    prompt      building the chat messages
+    ttft        time from sending the request to the first streamed token
+    first_sentence
+                time from sending the request to the first complete sentence, what
+                a text-to-speech voice could start speaking (sentence_stream.py)
+    generation  time from sending the request to the end of the stream
+    total       all of the above
+
+Example:
+    python benchmark_harness.py --queries data/queries.txt --index-path index_optimized_sentence_3_1.faiss \
+        --warmup 2 --runs 3 --output results/baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import numpy as np
+from llm_client import LLMClient
+from prompts import build_messages, PROMPT_FORMATS
+from sentence_stream import SentenceSplitter
+from retrieval import RETRIEVAL_MODES, needs_embedding_model
+from benchmark_history import record_run, HISTORY_PATH
+import profiling
+from profiling import span
+from rag_benchmark import (
+    load_index, FAISS_INDEX_PATH, EMBEDDING_MODEL_NAME, LLAMA_SERVER_BASE_URL, DEFAULT_LLM_SERVER_MODEL,
+    LLM_GEN_TEMPERATURE, MAX_LLM_GEN_TOKENS, PROMPT_FORMAT, TOP_K, RETRIEVAL_MODE
+)
+
+
+STAGES = ("encode", "search", "prompt", "ttft", "first_sentence", "generation", "total")
+PERCENTILES = (50, 90, 99)
+
+
+def load_queries(path):
+    """Read a query set: one query per line, blank lines and '#' comments are skipped."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def summarize(samples):
+    """p50/p90/p99, mean, min and max of a list of durations (in seconds)."""
+    if not samples:
+        return {"n": 0}
+    values = np.asarray(samples, dtype=np.float64)
+    summary = {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+    summary.update(n=len(samples), mean=float(values.mean()), min=float(values.min()), max=float(values.max()))
+    return summary
+
+
+def stream_answer(client, messages, args):
+    """Stream one completion for prepared chat messages.
+
+    Returns:
+        Dict with "ttft", "first_sentence" and "generation" in seconds, "answer" and,
+        when the server reports them, "prefill_tokens_per_second" / "decode_tokens_per_second"
+    """
+    sample = {}
+    llm_start = time.perf_counter()
+    answer = []
+    splitter = SentenceSplitter()
+    with span("generate", max_tokens=args.max_tokens):
+        for chunk in client.chat.completions.create(
+            model=args.model,
+            messages=messages,
+            temperature=args.temperature,
+            max_tokens=args.max_tokens,
+            stream=True
+        ):
+            if chunk.choices and chunk.choices[0].delta.content:
+                if "ttft" not in sample:
+                    sample["ttft"] = time.perf_counter() - llm_start
+                answer.append(chunk.choices[0].delta.content)
+                if "first_sentence" not in sample and splitter.feed(chunk.choices[0].delta.content):
+                    sample["first_sentence"] = time.perf_counter() - llm_start
+            if chunk.timings is not None:
+                sample["prefill_tokens_per_second"] = chunk.timings.prompt_per_second
+                sample["decode_tokens_per_second"] = chunk.timings.predicted_per_second
+    sample["generation"] = time.perf_counter() - llm_start
+    if "first_sentence" not in sample and answer:
+        # A one-sentence answer is only complete when the stream ends
+        sample["first_sentence"] = sample["generation"]
+    sample["answer"] = "".join(answer).strip()
+    return sample
+
+
+def run_query(retriever, client, query, args):
+    """Run one query through the pipeline.
+
+    Returns:
+        Dict of stage durations in seconds, plus "answer" and, when the server
+        reports them, "prefill_tokens_per_second" / "decode_tokens_per_second"
+    """
+    sample = {}
+    start = time.perf_counter()
+
+    if retriever is not None:
+        result = retriever.search(query, top_k=args.top_k, mode=args.mode, topic=args.topic,
+                                  merge_adjacent=args.merge_adjacent, mmr=args.mmr)
+        sample["encode"] = result.timings.get("encode", 0.0)
+        sample["search"] = result.timings["total"] - sample["encode"]
+        documents = result.passages
+    else:
+        documents = None
+
+    prompt_start = time.perf_counter()
+    with span("prompt_build"):
+        messages = build_messages(query, documents, prompt_format=args.prompt_format)
+    sample["prompt"] = time.perf_counter() - prompt_start
+
+    if client is not None:
+        sample.update(stream_answer(client, messages, args))
+
+    sample["total"] = time.perf_counter() - start
+    return sample
+
+
+def run_benchmark(retriever, client, queries, args):
+    """Warm up, then run every query `args.runs` times.
+
+    Returns:
+        Tuple of (samples per stage, per-query records)
+    """
+    for query in queries[:args.warmup]:
+        run_query(retriever, client, query, args)
+
+    samples = {stage: [] for stage in STAGES + ("prefill_tokens_per_second", "decode_tokens_per_second")}
+    records = []
+    for query in queries:
+        for run in range(args.runs):
+            sample = run_query(retriever, client, query, args)
+            for key, value in sample.items():
+                if key in samples:
+                    samples[key].append(value)
+            records.append({"query": query, "run": run, **sample})
+    return samples, records
+
+
+def environment_info():
+    """Machine and software details stored with every result file."""
+    return {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": sys.version.split()[0],
+    }
+
+
+def add_pipeline_arguments(parser):
+    """Add the query-set, retrieval and LLM options of run_query() to an argument parser."""
+    parser.add_argument('--queries', type=str, default='data/queries.txt',
+                        help='Query set file, one query per line (default: data/queries.txt)')
+    parser.add_argument('--index-path', type=str, default=FAISS_INDEX_PATH,
+                        help=f'FAISS index; empty string for no retrieval (default: {FAISS_INDEX_PATH})')
+    parser.add_argument('--embedding-model', type=str, default=EMBEDDING_MODEL_NAME,
+                        help=f'Sentence-transformers model (default: {EMBEDDING_MODEL_NAME})')
+    parser.add_argument('--top-k', type=int, default=TOP_K, help=f'Chunks to retrieve (default: {TOP_K})')
+    parser.add_argument('--mode', type=str, default=RETRIEVAL_MODE, choices=RETRIEVAL_MODES,
+                        help=f'Retrieval mode (default: {RETRIEVAL_MODE})')
+    parser.add_argument('--topic', type=str, default=None, help='Only search this topic and its subtopics')
+    parser.add_argument('--mmr', action='store_true', help='Pick diverse chunks with MMR')
+    parser.add_argument('--merge-adjacent', action='store_true', help='Merge overlapping / adjacent chunks')
+    parser.add_argument('--base-url', type=str, default=LLAMA_SERVER_BASE_URL,
+                        help=f'llama-server base URL (default: {LLAMA_SERVER_BASE_URL})')
+    parser.add_argument('--model', type=str, default=DEFAULT_LLM_SERVER_MODEL,
+                        help=f'Model name to send (default: {DEFAULT_LLM_SERVER_MODEL})')
+    parser.add_argument('--no-llm', action='store_true', help='Skip generation; only time retrieval and prompts')
+    parser.add_argument('--prompt-format', type=str, default=PROMPT_FORMAT, choices=list(PROMPT_FORMATS),
+                        help=f'Prompt format (default: {PROMPT_FORMAT})')
+    parser.add_argument('--temperature', type=float, default=LLM_GEN_TEMPERATURE,
+                        help=f'Sampling temperature (default: {LLM_GEN_TEMPERATURE})')
+    parser.add_argument('--max-tokens', type=int, default=MAX_LLM_GEN_TOKENS,
+                        help=f'Maximum tokens to generate (default: {MAX_LLM_GEN_TOKENS})')
+    return parser
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Run a query set through the RAG pipeline and report percentiles')
+    add_pipeline_arguments(parser)
+    parser.add_argument('--warmup', type=int, default=1,
+                        help='Queries run before measuring, not recorded (default: 1)')
+    parser.add_argument('--runs', type=int, default=1, help='Runs per query (default: 1)')
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file')
+    parser.add_argument('--record', action='store_true',
+                        help=f'Append the results to the history in {HISTORY_PATH} (see benchmark_history.py)')
+    parser.add_argument('--label', type=str, default=None, help='Label for the recorded run')
+    profiling.add_profile_arguments(parser)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    profiling.enable_from_args(args)
+
+    queries = load_queries(args.queries)
+    if not queries:
+        print(f"Error: No queries in '{args.queries}'")
+        return 1
+
+    retriever = None
+    loading_duration = 0.0
+    if args.index_path:
+        if not os.path.exists(args.index_path):
+            print(f"Error: Index not found at '{args.index_path}'")
+            return 1
+        retriever, loading_duration = load_index(args.index_path, args.embedding_model,
+                                                 preload_model=needs_embedding_model(args.mode, args.mmr))
+
+    client = None if args.no_llm else LLMClient(base_url=args.base_url, api_key="dummy")
+
+    print(f"\nRunning {len(queries)} queries x {args.runs} run(s) after {min(args.warmup, len(queries))} warm-up quer"
+          f"{'y' if args.warmup == 1 else 'ies'}...")
+    try:
+        samples, records = run_benchmark(retriever, client, queries, args)
+    finally:
+        if client is not None:
+            client.close()
+        if retriever is not None:
+            retriever.close()
+
+    summary = {stage: summarize(values) for stage, values in samples.items() if values}
+
+    print("\n-----------------------------------------------------")
+    print(f"{'Stage':>14} | {'p50 (ms)':>9} | {'p90 (ms)':>9} | {'p99 (ms)':>9} | {'n':>4}")
+    for stage in STAGES:
+        if stage in summary:
+            s = summary[stage]
+            print(f"{stage:>14} | {s['p50'] * 1000:>9.2f} | {s['p90'] * 1000:>9.2f} | {s['p99'] * 1000:>9.2f} | {s['n']:>4}")
+    if "first_sentence" in summary:
+        print(f"BENCHMARK: Time to first sentence p50: {summary['first_sentence']['p50']:.4f} seconds")
+    for key, label in (("prefill_tokens_per_second", "Prefill"), ("decode_tokens_per_second", "Decode")):
+        if key in summary:
+            print(f"BENCHMARK: {label} p50: {summary[key]['p50']:.1f} tokens/s")
+    if retriever is not None:
+        print(f"BENCHMARK: Loading index took {loading_duration:.4f} seconds.")
+    print("-----------------------------------------------------")
+    profiling.report_from_args(args)
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "environment": environment_info(),
+        "loading_duration": loading_duration,
+        "summary": summary,
+        "samples": samples,
+        "queries": records,
+    }
+    if args.record:
+        run = record_run(results, label=args.label)
+        print(f"Recorded run {run['id']} in {HISTORY_PATH}")
+    if args.output:
+        output_dir = os.path.dirname(args.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
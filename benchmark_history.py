@@ -0,0 +1,289 @@
+"""Local history of benchmark results with regression detection.
+
+Every run of benchmark_harness.py (with --record, or recorded afterwards from
+its --output file) is appended to a JSON-lines store together with the git
+commit it ran on, a hash of its configuration and the hardware it ran on. A
+run can be saved as a named baseline and later runs compared against it: for
+every stage the raw samples of both runs are compared with a Mann-Whitney U
+test, and a stage is flagged as a regression when it is significantly slower
+(p < --alpha) by more than --min-change. `compare` exits with status 1 when
+any stage regressed, so it can gate upgrades (new faiss build, changed
+chunking, new model) in a script.
+
+Example:
+    python benchmark_harness.py --output results/latest.json --record
+    python benchmark_history.py baseline            # latest run becomes the baseline
+    ... upgrade something ...
+    python benchmark_harness.py --record
+    python benchmark_history.py compare || echo "Performance regression"
+
+    python benchmark_history.py record results/run.json --label "faiss 1.8"
+    python benchmark_history.py list
+"""
+
+import os
+import json
+import math
+import time
+import hashlib
+import argparse
+import platform
+import subprocess
+import numpy as np
+
+
+HISTORY_PATH = "results/history.jsonl"
+BASELINE_DIR = "results/baselines"
+
+# Options that do not change what is measured, left out of the config hash
+UNHASHED_OPTIONS = ("output", "record", "label", "history")
+
+
+def git_commit():
+    """Commit of the benchmark code, with a '-dirty' suffix when there are uncommitted changes (None outside git)."""
+    # The repository this file is in, not whatever directory the benchmark was started from
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                check=True, cwd=cwd).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True, cwd=cwd).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def config_hash(config):
+    """Short stable hash of a run configuration, so only like-for-like runs are compared."""
+    relevant = {key: value for key, value in config.items() if key not in UNHASHED_OPTIONS}
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def _read_key_value(path, keys):
+    values = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key.strip() in keys and key.strip() not in values:
+                    values[key.strip()] = value.strip()
+    except OSError:
+        pass
+    return values
+
+
+def hardware_info():
+    """CPU, memory and library versions; stored with every run."""
+    cpu = _read_key_value("/proc/cpuinfo", ("model name", "Model", "Hardware"))
+    memory = _read_key_value("/proc/meminfo", ("MemTotal",))
+    info = {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu": cpu.get("Model") or cpu.get("model name") or platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "memory_kb": int(memory["MemTotal"].split()[0]) if "MemTotal" in memory else None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+    try:
+        import faiss
+        info["faiss"] = faiss.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def record_run(results, history_path=HISTORY_PATH, label=None):
+    """Append a benchmark_harness.py result dict to the history.
+
+    Returns:
+        The stored run (with "id", "git_commit", "config_hash" and "hardware")
+    """
+    run = {
+        "id": time.strftime("%Y%m%d-%H%M%S-") + hashlib.sha256(os.urandom(8)).hexdigest()[:6],
+        "label": label,
+        "git_commit": git_commit(),
+        "config_hash": config_hash(results.get("config", {})),
+        "hardware": hardware_info(),
+        **{key: value for key, value in results.items() if key != "queries"},
+    }
+    directory = os.path.dirname(history_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(history_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run) + "\n")
+    return run
+
+
+def load_history(history_path=HISTORY_PATH):
+    """All recorded runs, oldest first."""
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_run(runs, run_id):
+    """Run by ID, label (the latest run with it) or unique ID prefix; "latest" is the last run."""
+    if not runs:
+        raise ValueError("No runs recorded yet")
+    if run_id in (None, "latest"):
+        return runs[-1]
+    for run in runs:
+        if run["id"] == run_id:
+            return run
+    # A label is usually reused across runs (e.g. "faiss 1.8"); runs are stored oldest first
+    labelled = [run for run in runs if run.get("label") == run_id]
+    if labelled:
+        return labelled[-1]
+    matches = [run for run in runs if run["id"].startswith(run_id)]
+    if len(matches) != 1:
+        raise ValueError(f"{len(matches)} runs match '{run_id}'")
+    return matches[0]
+
+
+def save_baseline(run, name="default", baseline_dir=BASELINE_DIR):
+    os.makedirs(baseline_dir, exist_ok=True)
+    path = os.path.join(baseline_dir, f"{name}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=2)
+    return path
+
+
+def load_baseline(name="default", baseline_dir=BASELINE_DIR):
+    with open(os.path.join(baseline_dir, f"{name}.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def mann_whitney_u(a, b):
+    """Two-sided Mann-Whitney U test (normal approximation with tie correction).
+
+    Returns:
+        p-value for the hypothesis that both samples come from the same distribution
+    """
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    values = np.concatenate([a, b])
+    order = values.argsort(kind='mergesort')
+    ranks = np.empty(len(values))
+    ranks[order] = np.arange(1, len(values) + 1)
+    # Average the ranks of tied values
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    ranks = np.bincount(inverse, weights=ranks)[inverse] / counts[inverse]
+
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    tie_term = ((counts ** 3 - counts).sum()) / (n * (n - 1)) if n > 1 else 0.0
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term)
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return math.erfc(max(z, 0.0) / math.sqrt(2))
+
+
+def compare_runs(baseline, run, alpha=0.05, min_change=0.05):
+    """Compare every stage two runs have samples for.
+
+    Stages measured in seconds regress when they get slower, "*_per_second" rates
+    when they get lower.
+
+    Returns:
+        List of dicts with "stage", "baseline" / "current" medians, "change" (relative,
+        positive = worse), "p_value" and "regression"
+    """
+    rows = []
+    for stage, baseline_samples in baseline.get("samples", {}).items():
+        current_samples = run.get("samples", {}).get(stage)
+        if not baseline_samples or not current_samples:
+            continue
+        a = np.asarray(baseline_samples, dtype=np.float64)
+        b = np.asarray(current_samples, dtype=np.float64)
+        baseline_median, current_median = float(np.median(a)), float(np.median(b))
+        change = (current_median - baseline_median) / baseline_median if baseline_median else 0.0
+        if stage.endswith("_per_second"):
+            change = -change
+        p_value = mann_whitney_u(a, b)
+        rows.append({"stage": stage, "baseline": baseline_median, "current": current_median,
+                     "change": change, "p_value": p_value,
+                     "regression": p_value < alpha and change > min_change})
+    return rows
+
+
+def describe_run(run):
+    commit = (run.get("git_commit") or "no-git")[:12]
+    label = f" [{run['label']}]" if run.get("label") else ""
+    return f"{run['id']}{label} commit {commit} config {run['config_hash']} on {run['hardware'].get('cpu')}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark result history and regression detection')
+    parser.add_argument('--history', type=str, default=HISTORY_PATH,
+                        help=f'Results store (default: {HISTORY_PATH})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='Append a benchmark_harness.py JSON result')
+    record_parser.add_argument('results', type=str, help='Result file written with --output')
+    record_parser.add_argument('--label', type=str, default=None, help='Label for the run')
+
+    subparsers.add_parser('list', help='List recorded runs')
+
+    baseline_parser = subparsers.add_parser('baseline', help='Save a run as a baseline')
+    baseline_parser.add_argument('run', type=str, nargs='?', default='latest', help='Run ID or label (default: latest)')
+    baseline_parser.add_argument('--name', type=str, default='default', help='Baseline name (default: default)')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare a run against a baseline; exit 1 on regression')
+    compare_parser.add_argument('run', type=str, nargs='?', default='latest', help='Run ID or label (default: latest)')
+    compare_parser.add_argument('--baseline', type=str, default='default', help='Baseline name (default: default)')
+    compare_parser.add_argument('--alpha', type=float, default=0.05, help='Significance level (default: 0.05)')
+    compare_parser.add_argument('--min-change', type=float, default=0.05,
+                                help='Smallest relative slowdown that counts as a regression (default: 0.05)')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'record':
+            with open(args.results, 'r', encoding='utf-8') as f:
+                run = record_run(json.load(f), args.history, label=args.label)
+            print(f"Recorded {describe_run(run)}")
+
+        elif args.command == 'list':
+            for run in load_history(args.history):
+                total = run.get("summary", {}).get("total", {})
+                p50 = f", total p50 {total['p50']:.3f}s" if total.get("n") else ""
+                print(f"{run.get('timestamp', '')}  {describe_run(run)}{p50}")
+
+        elif args.command == 'baseline':
+            run = find_run(load_history(args.history), args.run)
+            path = save_baseline(run, args.name)
+            print(f"Baseline '{args.name}' ({path}): {describe_run(run)}")
+
+        elif args.command == 'compare':
+            run = find_run(load_history(args.history), args.run)
+            baseline = load_baseline(args.baseline)
+            print(f"Baseline: {describe_run(baseline)}")
+            print(f"Current:  {describe_run(run)}")
+            if run["config_hash"] != baseline["config_hash"]:
+                print("Warning: the configurations differ")
+            if run["hardware"] != baseline["hardware"]:
+                print("Warning: the hardware or library versions differ")
+
+            rows = compare_runs(baseline, run, alpha=args.alpha, min_change=args.min_change)
+            print(f"\n{'Stage':>26} | {'Baseline':>10} | {'Current':>10} | {'Worse by':>8} | {'p-value':>7}")
+            for row in rows:
+                flag = "  REGRESSION" if row["regression"] else ""
+                print(f"{row['stage']:>26} | {row['baseline']:>10.4f} | {row['current']:>10.4f} | "
+                      f"{row['change']:>+8.1%} | {row['p_value']:>7.3f}{flag}")
+            regressions = [row["stage"] for row in rows if row["regression"]]
+            if regressions:
+                print(f"\nBENCHMARK: Regression in {', '.join(regressions)}")
+                return 1
+            print("\nBENCHMARK: No significant regressions")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
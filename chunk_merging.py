@@ -0,0 +1,124 @@
+"""Overlap-aware merging of adjacent retrieved chunks.
+
+Sentence chunks are built with an overlap (chunk_overlap=1 by default), so the
+top-k hits often contain neighbouring chunks from the same section. Sent as-is,
+the prompt repeats the overlapping sentences and the `[Topic: ...]` header.
+
+The indexer stores the position of every chunk (section ID plus start/end
+sentence or line offsets within the section):
+    <prefix>.positions.npy   int32 [n_chunks, 3] = (section_id, start, end)
+    <prefix>.positions.json  {"unit": "sentence" | "line"}
+
+merge_adjacent_chunks() uses these to turn hits that overlap or touch into a
+single de-duplicated passage with one topic header.
+"""
+
+import os
+import json
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+UNIT_SEPARATORS = {"sentence": ". ", "line": "\n"}
+
+
+def save_chunk_positions(prefix: str, chunk_metadata: List[Dict], chunking_strategy: str = "sentence"):
+    """Write the position of every chunk next to `prefix`.
+
+    Args:
+        prefix: Path of the FAISS index the chunks belong to
+        chunk_metadata: Metadata dicts from optimized_text_splitter(return_metadata=True)
+        chunking_strategy: "sentence" or "line", decides how passages are re-joined
+    """
+    positions = np.array(
+        [(meta["section_id"], meta["start"], meta["end"]) for meta in chunk_metadata],
+        dtype=np.int32
+    ).reshape(-1, 3)
+    np.save(prefix + ".positions.npy", positions)
+    with open(prefix + ".positions.json", 'w') as f:
+        json.dump({"unit": chunking_strategy}, f)
+
+
+def chunk_positions_exist(prefix: str) -> bool:
+    """Check whether chunk positions were saved under `prefix`."""
+    return os.path.exists(prefix + ".positions.npy")
+
+
+def load_chunk_positions(prefix: str):
+    """Load chunk positions saved with save_chunk_positions().
+
+    Returns:
+        Tuple of (positions, unit)
+    """
+    with open(prefix + ".positions.json", 'r') as f:
+        unit = json.load(f)["unit"]
+    return np.load(prefix + ".positions.npy"), unit
+
+
+def _split_chunk(chunk: str, unit: str):
+    """Split a chunk into its topic header line and its sentences (or lines)."""
+    header, _, body = chunk.partition("\n")
+    if unit == "line":
+        return header, [body]
+    # Undo simple_text_splitter(): sentences were joined with ". " and a final "." added
+    units = body.split(UNIT_SEPARATORS["sentence"])
+    units[-1] = units[-1][:-1] if units[-1].endswith(".") else units[-1]
+    return header, units
+
+
+def _join_units(header: str, units: List[str], unit: str) -> str:
+    body = UNIT_SEPARATORS[unit].join(units)
+    if unit == "sentence" and not body.endswith("."):
+        body += "."
+    return f"{header}\n{body}"
+
+
+def merge_adjacent_chunks(ids: Sequence[int], chunks: Sequence[str], positions: np.ndarray,
+                          unit: str = "sentence") -> List[str]:
+    """Merge retrieved chunks that overlap or are adjacent within the same section.
+
+    Args:
+        ids: Retrieved chunk IDs, best first
+        chunks: Texts of the retrieved chunks (same order as ids)
+        positions: Chunk position array from load_chunk_positions()
+        unit: "sentence" or "line"
+
+    Returns:
+        List of passages, ordered by the rank of their best-ranked chunk. Chunks
+        that do not touch any other hit are returned unchanged.
+    """
+    # Group hits by section, remembering their rank
+    by_section: Dict[int, List] = {}
+    for rank, (chunk_id, chunk) in enumerate(zip(ids, chunks)):
+        section_id, start, end = (int(v) for v in positions[chunk_id])
+        by_section.setdefault(section_id, []).append((start, end, rank, chunk))
+
+    passages = []  # (best rank, text)
+    for hits in by_section.values():
+        hits.sort()
+        # Each group: [start, end, best_rank, header, units, original chunks]
+        groups = []
+        for start, end, rank, chunk in hits:
+            header, units = _split_chunk(chunk, unit)
+            if len(units) != end - start:
+                # Text does not line up with the stored offsets; keep the chunk as-is
+                passages.append((rank, chunk))
+                continue
+            if groups and start <= groups[-1][1]:
+                group = groups[-1]
+                # Only append the sentences beyond what the passage already holds
+                if end > group[1]:
+                    group[4].extend(units[group[1] - start:])
+                    group[1] = end
+                group[2] = min(group[2], rank)
+                group[5].append(chunk)
+            else:
+                groups.append([start, end, rank, header, units, [chunk]])
+
+        for _, _, rank, header, units, originals in groups:
+            text = originals[0] if len(originals) == 1 else _join_units(header, units, unit)
+            passages.append((rank, text))
+
+    passages.sort(key=lambda item: item[0])
+    return [text for _, text in passages]
@@ -0,0 +1,145 @@
+"""Measure what merging adjacent / overlapping chunks saves on a query set.
+
+For every query the same top-k hits are turned into a prompt twice, once with
+the raw chunks and once with merged passages (see chunk_merging.py). The script
+reports prompt tokens (counted by llama-server's /tokenize endpoint, or words if
+the server is not running) and, optionally, LLM generation time for both.
+
+Example:
+    python chunk_merging_benchmark.py --index-path index_optimized_sentence_3_1.faiss \
+        --queries data/queries.txt --top-k 5 --n-runs 3
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+from llm_client import LLMClient
+from prompts import build_messages
+from chunk_merging import merge_adjacent_chunks
+from benchmark_harness import load_queries
+from rag_benchmark import (
+    load_index, EMBEDDING_MODEL_NAME, LLAMA_SERVER_BASE_URL, DEFAULT_LLM_SERVER_MODEL,
+    LLM_GEN_TEMPERATURE, MAX_LLM_GEN_TOKENS, PROMPT_FORMAT
+)
+
+
+def count_prompt_tokens(client, messages):
+    """
+    Count the tokens of all message contents with llama-server's /tokenize endpoint.
+
+    Returns:
+        Tuple of (count, unit) where unit is "tokens", or "words" when the server
+        cannot be reached
+    """
+    text = "\n".join(msg['content'] for msg in messages)
+    if client is not None:
+        server_root = client.base_url[:-len("/v1")] if client.base_url.endswith("/v1") else client.base_url
+        try:
+            response = client.http_client.post(f"{server_root}/tokenize", json={"content": text})
+            response.raise_for_status()
+            return len(response.json()["tokens"]), "tokens"
+        except Exception:
+            pass
+    return len(text.split()), "words"
+
+
+def time_generation(client, messages, n_runs):
+    """Average LLM generation time for a prompt over n_runs."""
+    durations = []
+    for _ in range(n_runs):
+        start = time.perf_counter()
+        client.chat.completions.create(
+            model=DEFAULT_LLM_SERVER_MODEL,
+            messages=messages,
+            temperature=LLM_GEN_TEMPERATURE,
+            max_tokens=MAX_LLM_GEN_TOKENS,
+            stream=False
+        )
+        durations.append(time.perf_counter() - start)
+    return float(np.mean(durations))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Report prompt-token and generation-time savings of merging adjacent chunks'
+    )
+    parser.add_argument('--index-path', type=str, default='index_optimized_sentence_3_1.faiss',
+                        help='Path to the FAISS index built by index_generation_optimized.py')
+    parser.add_argument('--queries', type=str, default='data/queries.txt',
+                        help='Query set file, one query per line (default: data/queries.txt)')
+    parser.add_argument('--top-k', type=int, default=5, help='Number of chunks to retrieve (default: 5)')
+    parser.add_argument('--mode', type=str, default='vector', choices=['vector', 'bm25', 'hybrid'],
+                        help='Retrieval mode (default: vector)')
+    parser.add_argument('--n-runs', type=int, default=0,
+                        help='LLM generations per prompt variant; 0 only counts tokens (default: 0)')
+    parser.add_argument('--base-url', type=str, default=LLAMA_SERVER_BASE_URL,
+                        help=f'llama-server base URL (default: {LLAMA_SERVER_BASE_URL})')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.index_path):
+        print(f"Error: Index not found at '{args.index_path}'")
+        return 1
+
+    retriever, _ = load_index(args.index_path, EMBEDDING_MODEL_NAME)
+    if retriever.positions is None:
+        print("Error: Index has no chunk positions; rebuild it with index_generation_optimized.py")
+        return 1
+
+    queries = load_queries(args.queries)
+    client = LLMClient(base_url=args.base_url, api_key="dummy")
+
+    rows = []
+    unit = "tokens"
+    for query in queries:
+        result = retriever.search(query, top_k=args.top_k, mode=args.mode)
+        passages = merge_adjacent_chunks(result.ids, result.chunks, retriever.positions,
+                                         retriever.position_unit)
+
+        raw_messages = build_messages(query, result.chunks, prompt_format=PROMPT_FORMAT)
+        merged_messages = build_messages(query, passages, prompt_format=PROMPT_FORMAT)
+        raw_tokens, unit = count_prompt_tokens(client, raw_messages)
+        merged_tokens, _ = count_prompt_tokens(client, merged_messages)
+
+        raw_time = merged_time = None
+        if args.n_runs > 0:
+            try:
+                raw_time = time_generation(client, raw_messages, args.n_runs)
+                merged_time = time_generation(client, merged_messages, args.n_runs)
+            except Exception as e:
+                print(f"Warning: LLM generation failed ({e}); only reporting prompt sizes.")
+                args.n_runs = 0
+
+        rows.append((query, len(result.chunks), len(passages), raw_tokens, merged_tokens, raw_time, merged_time))
+
+    client.close()
+    retriever.close()
+
+    print("\n" + "=" * 60)
+    print(f"Chunk merging on {len(queries)} queries (top_k={args.top_k}, mode={args.mode})")
+    print("=" * 60)
+    for query, n_chunks, n_passages, raw_tokens, merged_tokens, raw_time, merged_time in rows:
+        print(f"\n{query}")
+        print(f"  Passages:      {n_chunks} -> {n_passages}")
+        print(f"  Prompt {unit}: {raw_tokens} -> {merged_tokens}")
+        if raw_time is not None:
+            print(f"  Generation:    {raw_time:.4f}s -> {merged_time:.4f}s")
+
+    total_raw = sum(row[3] for row in rows)
+    total_merged = sum(row[4] for row in rows)
+    print("\n-----------------------------------------------------")
+    if total_raw:
+        print(f"BENCHMARK: Prompt {unit} reduced by {total_raw - total_merged} "
+              f"({100.0 * (total_raw - total_merged) / total_raw:.1f}%) over the query set.")
+    timed = [row for row in rows if row[5] is not None]
+    if timed:
+        raw_mean = np.mean([row[5] for row in timed])
+        merged_mean = np.mean([row[6] for row in timed])
+        print(f"BENCHMARK: LLM Generation {raw_mean:.4f}s -> {merged_mean:.4f}s per query "
+              f"(saved {raw_mean - merged_mean:.4f}s)")
+    print("-----------------------------------------------------")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,102 @@
+"""Effect of single-flight request coalescing when many clients ask the same question.
+
+A number of threads (standing in for voice clients) send the same streaming
+request at temperature 0 at the same moment, against a local stub server with
+only a couple of slots (like llama-server's `-np 2`). The run is repeated with
+and without coalescing (`LLMClient(..., coalesce=True)`), and time to first
+token, latency and the number of generations that were saved are reported.
+Pass --base-url to run against a real llama-server instead.
+
+Example:
+    python coalescing_benchmark.py --n-clients 8 --slots 2
+"""
+
+import time
+import argparse
+import threading
+import numpy as np
+from llm_client import LLMClient
+from stub_llm_server import StubServer
+
+
+def run_clients(client, model, n_clients, max_tokens):
+    """Start n_clients identical streams at once; returns [(ttft, latency, text)]."""
+    barrier = threading.Barrier(n_clients)
+    results = [None] * n_clients
+
+    def worker(i):
+        barrier.wait()
+        start = time.perf_counter()
+        ttft = None
+        text = ""
+        for content in client.chat.completions.stream_content(
+            model=model,
+            messages=[{"role": "user", "content": "What is the tallest mountain in Wales?"}],
+            temperature=0.0,
+            max_tokens=max_tokens
+        ):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            text += content
+        results[i] = (ttft or 0.0, time.perf_counter() - start, text)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare identical concurrent requests with and without coalescing')
+    parser.add_argument('--base-url', type=str, default=None,
+                        help='Server to benchmark (default: start a local stub server)')
+    parser.add_argument('--model', type=str, default='dummy', help='Model name to send (default: dummy)')
+    parser.add_argument('--n-clients', type=int, default=8, help='Concurrent identical requests (default: 8)')
+    parser.add_argument('--max-tokens', type=int, default=50, help='Tokens per request (default: 50)')
+    parser.add_argument('--slots', type=int, default=2, help='Stub server parallel slots (default: 2)')
+    parser.add_argument('--token-delay', type=float, default=0.01,
+                        help='Stub server seconds per token (default: 0.01)')
+    args = parser.parse_args()
+
+    stub = None
+    base_url = args.base_url
+    if base_url is None:
+        stub = StubServer(token_delay=args.token_delay, n_tokens=args.max_tokens, slots=args.slots,
+                          ttft=0.05).start()
+        base_url = stub.base_url
+        print(f"Started stub server at {base_url} ({args.slots} slots, {args.token_delay * 1000:.1f} ms/token)")
+
+    rows = []
+    try:
+        for coalesce in (False, True):
+            with LLMClient(base_url=base_url, coalesce=coalesce) as client:
+                start = time.perf_counter()
+                results = run_clients(client, args.model, args.n_clients, args.max_tokens)
+                wall = time.perf_counter() - start
+                stats = client.coalescer.stats() if client.coalescer else None
+            answers = {text for _, _, text in results}
+            rows.append((coalesce, wall, results, stats, len(answers)))
+    finally:
+        if stub is not None:
+            stub.stop()
+
+    print(f"\n--- {args.n_clients} identical concurrent requests ---")
+    print(f"{'Coalescing':>10} | {'Wall (s)':>8} | {'TTFT p50':>8} | {'TTFT max':>8} | "
+          f"{'Latency p50':>11} | {'Latency max':>11} | Generations")
+    for coalesce, wall, results, stats, _ in rows:
+        ttfts = [ttft for ttft, _, _ in results]
+        latencies = [latency for _, latency, _ in results]
+        generations = stats["generations"] if stats else len(results)
+        print(f"{'on' if coalesce else 'off':>10} | {wall:>8.3f} | {np.median(ttfts):>8.4f} | {max(ttfts):>8.4f} | "
+              f"{np.median(latencies):>11.4f} | {max(latencies):>11.4f} | {generations}")
+
+    for coalesce, _, _, stats, n_answers in rows:
+        if stats:
+            print(f"\nBENCHMARK: Saved {stats['saved_generations']} of {stats['requests']} generations "
+                  f"({n_answers} distinct answer(s) delivered)")
+
+
+if __name__ == "__main__":
+    main()
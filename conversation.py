@@ -0,0 +1,395 @@
+"""Multi-turn conversation mode: message history on one llama-server slot.
+
+A single-turn query re-sends and re-prefills the whole prompt every time. In
+a conversation most of the prompt is the same as in the previous request:
+the system message and every earlier question and answer. A Conversation
+sends every request to the same slot (`id_slot`) with `cache_prompt`, so
+llama-server keeps that prefix in the slot's KV cache and only prefills the
+newest question (plus the last answer's final token). The prefix only stays
+valid as long as the earlier messages do not change, which is why the
+documents of a turn travel in its user message
+(prompts.build_conversation_turn) rather than in the system message.
+
+When the next turn would not fit into the slot's context (`ctx_size`, i.e.
+llama-server's -c divided by -np), the oldest turns are dropped, or replaced
+by a short summary (`evict="summarize"`), until the history is back under
+`low_water` of the context. Eviction changes the start of the prompt, so the
+turn after it prefills the whole remaining history again; evicting well
+below the limit means that happens once every few turns instead of on every
+turn. Turn sizes come from the server's token counts (`prompt_n` + `cache_n`
++ `predicted_n`); without them they are estimated from the text.
+
+Run as a script, a transcript of follow-up questions is played twice, with
+slot reuse and with `cache_prompt` off, and prefill tokens and TTFT per turn
+are compared:
+
+    python conversation.py --queries data/conversation.txt --ctx-size 4096
+    python conversation.py --stub --index-path '' --evict summarize --ctx-size 1024
+"""
+
+import os
+import json
+import time
+import argparse
+import httpx
+import numpy as np
+from typing import Dict, List, Optional
+
+from llm_client import LLMClient
+from stub_llm_server import StubServer
+from prompts import CONVERSATION_SYSTEM_MESSAGE, CONVERSATION_SUMMARY_REQUEST, build_conversation_turn
+from benchmark_harness import add_pipeline_arguments, load_queries, summarize, environment_info
+from rag_benchmark import load_index
+from retrieval import needs_embedding_model
+
+
+EVICTION_MODES = ("drop", "summarize")
+CHARS_PER_TOKEN = 4  # Rough size of a token in English text, for turns the server did not count
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class Conversation:
+    """Chat history pinned to one llama-server slot.
+
+    Args:
+        client: LLMClient for the server
+        model: Model name sent with every request
+        system_message: Fixed system message at the start of every prompt
+        slot: Slot every request is sent to (`id_slot`); None lets the server choose
+        cache_prompt: Let the server reuse the slot's KV cache for the common prompt prefix
+        ctx_size: Context tokens of one slot
+        max_tokens: Maximum tokens per answer (reserved in the context)
+        temperature: Sampling temperature
+        evict: "drop" the oldest turns when the context is full, or "summarize" them
+        low_water: Fraction of ctx_size the history is reduced to when evicting
+        summary_tokens: Maximum tokens of a summary
+    """
+
+    def __init__(self, client: LLMClient, model: str, system_message: str = CONVERSATION_SYSTEM_MESSAGE,
+                 slot: Optional[int] = 0, cache_prompt: bool = True, ctx_size: int = 4096,
+                 max_tokens: int = 200, temperature: float = 0.1, evict: str = "drop",
+                 low_water: float = 0.5, summary_tokens: int = 100):
+        if evict not in EVICTION_MODES:
+            raise ValueError(f"Unknown eviction mode '{evict}'. Available: {EVICTION_MODES}")
+        self.client = client
+        self.model = model
+        self.system_message = system_message
+        self.slot = slot
+        self.cache_prompt = cache_prompt
+        self.ctx_size = ctx_size
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.evict = evict
+        self.low_water = low_water
+        self.summary_tokens = summary_tokens
+        self.summary: Optional[str] = None
+        # Every turn: {"user": message, "assistant": message, "tokens": context tokens it takes}
+        self.turns: List[Dict] = []
+        self._system_tokens = estimate_tokens(system_message)
+        # Whether context_tokens is the server's count, i.e. no estimate went into it
+        self._measured = False
+
+    @property
+    def context_tokens(self) -> int:
+        """Tokens the history takes in the slot's context."""
+        return self._system_tokens + sum(turn["tokens"] for turn in self.turns)
+
+    def _system(self) -> Dict[str, str]:
+        content = self.system_message
+        if self.summary:
+            content += f"\n\nEarlier in this conversation: {self.summary}"
+        return {"role": "system", "content": content}
+
+    def messages(self, turns: Optional[List[Dict]] = None) -> List[Dict[str, str]]:
+        """System message and the user / assistant messages of `turns` (default: the history)."""
+        messages = [self._system()]
+        for turn in self.turns if turns is None else turns:
+            messages += [turn["user"], turn["assistant"]]
+        return messages
+
+    def _slot_options(self) -> Dict:
+        options = {"cache_prompt": self.cache_prompt}
+        if self.slot is not None:
+            options["id_slot"] = self.slot
+        return options
+
+    def _summarize(self, evicted: List[Dict]) -> Dict:
+        """Replace the summary with one of the previous summary and `evicted`.
+
+        Returns:
+            "summary_time" (seconds) and, when the server reports them,
+            "summary_prefill_tokens", "summary_cached_tokens", "summary_prefill_ms"
+            and "summary_generated_tokens"
+        """
+        start = time.perf_counter()
+        # Same slot and the same opening messages as the cached prompt, so only the request is prefilled
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=self.messages(evicted) + [{"role": "user", "content": CONVERSATION_SUMMARY_REQUEST}],
+            temperature=0.0,
+            max_tokens=self.summary_tokens,
+            **self._slot_options()
+        )
+        stats = {"summary_time": time.perf_counter() - start}
+        if response.timings is not None:
+            stats.update(summary_prefill_tokens=response.timings.prompt_n,
+                         summary_cached_tokens=response.timings.cache_n,
+                         summary_prefill_ms=response.timings.prompt_ms,
+                         summary_generated_tokens=response.timings.predicted_n)
+        self.summary = (response.choices[0].message.content or "").strip() or None
+        self._system_tokens = estimate_tokens(self._system()["content"])
+        self._measured = False
+        return stats
+
+    def make_room(self, needed: int, turn: Optional[Dict] = None) -> int:
+        """Evict the oldest turns if `needed` more tokens would overflow the context.
+
+        Args:
+            needed: Tokens the next request adds to the context
+            turn: Turn to add the summary request's timings to (see _summarize)
+
+        Returns:
+            Number of turns evicted
+        """
+        if self.context_tokens + needed <= self.ctx_size:
+            return 0
+        target = self.low_water * self.ctx_size
+        n = 0
+        remaining = self.context_tokens
+        while n < len(self.turns) and remaining + needed > target:
+            remaining -= self.turns[n]["tokens"]
+            n += 1
+        evicted, self.turns = self.turns[:n], self.turns[n:]
+        self._measured = False
+        if evicted and self.evict == "summarize":
+            stats = self._summarize(evicted)
+            if turn is not None:
+                turn.update(stats)
+        return n
+
+    def ask(self, query: str, documents: Optional[List[str]] = None, prompt_format: str = "lfm2-rag") -> Dict:
+        """Ask the next question and add it and its answer to the history.
+
+        Returns:
+            The turn: "query", "answer", "ttft" and "generation" (seconds), "evicted"
+            turns (and "evict_time"), "context_tokens" after the turn and, when the
+            server reports them, "prefill_tokens", "cached_tokens" and "prefill_ms".
+            A turn that triggered a summary also has the summary request's timings
+            (see _summarize); they are not part of its ttft or prefill_tokens.
+        """
+        user = build_conversation_turn(query, documents, prompt_format=prompt_format)
+        turn = {"query": query}
+        start = time.perf_counter()
+        turn["evicted"] = self.make_room(estimate_tokens(user["content"]) + self.max_tokens, turn)
+        if turn["evicted"]:
+            turn["evict_time"] = time.perf_counter() - start
+
+        answer = []
+        timings = None
+        llm_start = time.perf_counter()
+        for chunk in self.client.chat.completions.create(
+            model=self.model,
+            messages=self.messages() + [user],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=True,
+            **self._slot_options()
+        ):
+            if chunk.choices and chunk.choices[0].delta.content:
+                if "ttft" not in turn:
+                    turn["ttft"] = time.perf_counter() - llm_start
+                answer.append(chunk.choices[0].delta.content)
+            if chunk.timings is not None:
+                timings = chunk.timings
+        turn["generation"] = time.perf_counter() - llm_start
+        turn["answer"] = "".join(answer).strip()
+
+        estimate = estimate_tokens(user["content"]) + estimate_tokens(turn["answer"])
+        if timings is not None:
+            turn["prefill_tokens"] = timings.prompt_n
+            turn["cached_tokens"] = timings.cache_n
+            turn["prefill_ms"] = timings.prompt_ms
+            total = timings.prompt_n + timings.cache_n + timings.predicted_n
+            if self._measured:
+                tokens = max(total - self.context_tokens, 1)
+            else:
+                # The estimated part of the history is corrected to the server's count
+                tokens = estimate_tokens(user["content"]) + timings.predicted_n
+                self._system_tokens = max(total - tokens - sum(t["tokens"] for t in self.turns), 1)
+            self._measured = True
+        else:
+            tokens = estimate
+        self.turns.append({"user": user, "assistant": {"role": "assistant", "content": turn["answer"]},
+                           "tokens": tokens})
+        turn["context_tokens"] = self.context_tokens
+        return turn
+
+
+def retrieve_turns(retriever, queries, args):
+    """Documents for every turn, retrieved once so both runs send the same prompts.
+
+    A follow-up question often only makes sense with the ones before it, so the
+    last `args.history_queries` questions are searched together with it.
+    """
+    documents = []
+    for i, query in enumerate(queries):
+        if retriever is None:
+            documents.append(None)
+            continue
+        search_text = " ".join(queries[max(i - args.history_queries, 0):i + 1])
+        result = retriever.search(search_text, top_k=args.top_k, mode=args.mode, topic=args.topic,
+                                  merge_adjacent=args.merge_adjacent, mmr=args.mmr)
+        documents.append(result.passages)
+    return documents
+
+
+def run_conversation(client, queries, documents, args, cache_prompt):
+    """Play the transcript as one conversation.
+
+    Returns:
+        List of turns (see Conversation.ask); stops early at a server error
+    """
+    conversation = Conversation(client, args.model, slot=args.slot, cache_prompt=cache_prompt,
+                                ctx_size=args.ctx_size, max_tokens=args.max_tokens,
+                                temperature=args.temperature, evict=args.evict, low_water=args.low_water,
+                                summary_tokens=args.summary_tokens)
+    label = "slot reuse" if cache_prompt else "no reuse"
+    print(f"\n--- Conversation ({label}, slot {args.slot if args.slot is not None else 'any'}) ---")
+    print(f"{'Turn':>4} | {'Prefill':>7} | {'Cached':>7} | {'Context':>7} | {'TTFT (ms)':>9} | Evicted")
+    turns = []
+    for i, (query, docs) in enumerate(zip(queries, documents), 1):
+        try:
+            turn = conversation.ask(query, docs, prompt_format=args.prompt_format)
+        except httpx.HTTPError as e:
+            print(f"Error communicating with the LLM server: {e}")
+            break
+        turns.append(turn)
+        ttft = f"{turn['ttft'] * 1000:9.1f}" if "ttft" in turn else f"{'-':>9}"
+        evicted = turn["evicted"] or ""
+        if "summary_prefill_tokens" in turn:
+            evicted = f"{evicted} (summary: {turn['summary_prefill_tokens']} prefill, " \
+                      f"{turn['summary_time'] * 1000:.1f} ms)"
+        print(f"{i:>4} | {turn.get('prefill_tokens', '-'):>7} | {turn.get('cached_tokens', '-'):>7} | "
+              f"{turn['context_tokens']:>7} | {ttft} | {evicted}")
+    return turns
+
+
+def summarize_run(turns):
+    """Prefill token totals and TTFT percentiles of one run.
+
+    The token totals include the summary requests, which are also counted on
+    their own as "summary_prefill_tokens" (and their time as "summary_time").
+    """
+    summary_prefill = sum(turn.get("summary_prefill_tokens", 0) for turn in turns)
+    return {
+        "turns": len(turns),
+        "prefill_tokens": sum(turn.get("prefill_tokens", 0) for turn in turns) + summary_prefill,
+        "cached_tokens": sum(turn.get("cached_tokens", 0) + turn.get("summary_cached_tokens", 0)
+                             for turn in turns),
+        "summary_prefill_tokens": summary_prefill,
+        "summary_time": sum(turn.get("summary_time", 0.0) for turn in turns),
+        "evictions": sum(1 for turn in turns if turn["evicted"]),
+        "ttft": summarize([turn["ttft"] for turn in turns if "ttft" in turn]),
+        "generation": summarize([turn["generation"] for turn in turns]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-turn RAG conversation with llama-server slot reuse')
+    add_pipeline_arguments(parser)
+    parser.set_defaults(queries='data/conversation.txt')
+    parser.add_argument('--slot', type=int, default=0, help='llama-server slot to pin the conversation to (default: 0)')
+    parser.add_argument('--any-slot', dest='slot', action='store_const', const=None,
+                        help='Do not pin a slot; let the server choose')
+    parser.add_argument('--ctx-size', type=int, default=4096,
+                        help='Context tokens per slot: llama-server -c divided by -np (default: 4096)')
+    parser.add_argument('--evict', type=str, default='drop', choices=EVICTION_MODES,
+                        help='What to do with the oldest turns when the context is full (default: drop)')
+    parser.add_argument('--low-water', type=float, default=0.5,
+                        help='Fraction of the context the history is reduced to when full (default: 0.5)')
+    parser.add_argument('--summary-tokens', type=int, default=100, help='Maximum tokens of a summary (default: 100)')
+    parser.add_argument('--history-queries', type=int, default=1,
+                        help='Earlier questions searched together with a follow-up (default: 1)')
+    parser.add_argument('--no-compare', action='store_true', help='Only run with slot reuse')
+    parser.add_argument('--stub', action='store_true', help='Start a local stub LLM server instead of --base-url')
+    parser.add_argument('--stub-ttft', type=float, default=0.05, help='Stub server seconds to first token (default: 0.05)')
+    parser.add_argument('--stub-token-rate', type=float, default=20.0,
+                        help='Stub server generated tokens per second (default: 20)')
+    parser.add_argument('--stub-prompt-rate', type=float, default=200.0,
+                        help='Stub server prefilled prompt tokens per second (default: 200)')
+    parser.add_argument('--output', type=str, default=None, help='Write the turns and summaries as JSON to this file')
+    args = parser.parse_args()
+
+    if args.no_llm:
+        print("Error: --no-llm leaves no conversation to run")
+        return 1
+    queries = load_queries(args.queries)
+    if not queries:
+        print(f"Error: No queries in '{args.queries}'")
+        return 1
+
+    retriever = None
+    if args.index_path:
+        retriever, _ = load_index(args.index_path, args.embedding_model,
+                                  preload_model=needs_embedding_model(args.mode, args.mmr))
+    try:
+        documents = retrieve_turns(retriever, queries, args)
+    finally:
+        if retriever is not None:
+            retriever.close()
+
+    stub = None
+    if args.stub:
+        stub = StubServer(token_delay=1 / args.stub_token_rate, n_tokens=args.max_tokens, ttft=args.stub_ttft,
+                          prompt_token_delay=1 / args.stub_prompt_rate).start()
+        args.base_url = stub.base_url
+        print(f"Started stub server at {stub.base_url} ({args.stub_prompt_rate:.0f} prompt tokens/s, "
+              f"{args.stub_token_rate:.0f} tokens/s)")
+
+    client = LLMClient(base_url=args.base_url, api_key="dummy")
+    runs = {}
+    try:
+        for cache_prompt in (True,) if args.no_compare else (True, False):
+            turns = run_conversation(client, queries, documents, args, cache_prompt)
+            runs["reuse" if cache_prompt else "no_reuse"] = {"turns": turns, "summary": summarize_run(turns)}
+    finally:
+        client.close()
+        if stub is not None:
+            stub.stop()
+
+    print("\n-----------------------------------------------------")
+    for name, run in runs.items():
+        s = run["summary"]
+        if not s["turns"]:
+            continue
+        ttft = f", TTFT p50 {s['ttft']['p50']:.4f}s" if s["ttft"]["n"] else ""
+        summaries = f" ({s['summary_prefill_tokens']} for summaries)" if s["summary_prefill_tokens"] else ""
+        print(f"BENCHMARK: {name}: {s['prefill_tokens']} prefill tokens{summaries} over {s['turns']} turns "
+              f"({s['prefill_tokens'] / s['turns']:.0f} per turn, {s['cached_tokens']} reused){ttft}")
+    if "no_reuse" in runs and runs["no_reuse"]["summary"]["prefill_tokens"]:
+        reuse, no_reuse = runs["reuse"]["summary"], runs["no_reuse"]["summary"]
+        saved = 1 - reuse["prefill_tokens"] / no_reuse["prefill_tokens"]
+        print(f"BENCHMARK: Slot reuse saves {saved:.0%} of prefill tokens")
+        if reuse["ttft"]["n"] and no_reuse["ttft"]["n"]:
+            # The first turn has nothing to reuse; compare the follow-ups
+            follow_ups = [np.median([t["ttft"] for t in run["turns"][1:] if "ttft" in t] or [np.nan])
+                          for run in (runs["reuse"], runs["no_reuse"])]
+            print(f"BENCHMARK: Follow-up TTFT p50: {follow_ups[0]:.4f}s with reuse, "
+                  f"{follow_ups[1]:.4f}s without")
+    print("-----------------------------------------------------")
+
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": vars(args),
+                       "environment": environment_info(), "runs": runs}, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0 if any(run["turns"] for run in runs.values()) else 1
+
+
+if __name__ == "__main__":
+    exit(main())
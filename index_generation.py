@@ -3,7 +3,6 @@ import json
 import argparse
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 
 
 def simple_text_splitter(text, chunk_size=3, chunk_overlap=1):
@@ -48,6 +47,7 @@ def create_index(
 
     # Load the embedding model
     print(f"Loading embedding model: {embedding_model_name}...")
+    from sentence_transformers import SentenceTransformer
     model = SentenceTransformer(embedding_model_name)
     embedding_dim = model.get_sentence_embedding_dimension()
     print(f"Model loaded. Embedding dimension: {embedding_dim}")
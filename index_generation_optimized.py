@@ -4,7 +4,11 @@ import argparse
 import re
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
+from inverted_index import InvertedIndex
+from topic_index import TopicIndex
+from chunk_merging import save_chunk_positions
+import profiling
+from profiling import span
 
 
 def parse_wiki_topics(text):
@@ -80,7 +84,7 @@ def parse_wiki_topics(text):
     return sections
 
 
-def simple_text_splitter(text, chunk_size=3, chunk_overlap=1):
+def simple_text_splitter(text, chunk_size=3, chunk_overlap=1, return_spans=False):
     """
     A simple text splitter that splits by sentences.
 
@@ -88,15 +92,17 @@ def simple_text_splitter(text, chunk_size=3, chunk_overlap=1):
         text: Text to split
         chunk_size: Number of sentences per chunk
         chunk_overlap: Number of overlapping sentences between chunks
+        return_spans: If True, also return the (start, end) sentence offsets of each chunk
 
     Returns:
-        List of text chunks
+        List of text chunks, or tuple of (chunks, spans) if return_spans is True
     """
     # Split by sentence boundaries
     sentences = text.replace("\n", " ").split('. ')
     sentences = [s.strip() for s in sentences if s.strip()]
 
     chunks = []
+    spans = []
     for i in range(0, len(sentences), chunk_size - chunk_overlap):
         chunk = ". ".join(sentences[i:i + chunk_size])
         if chunk:
@@ -104,26 +110,33 @@ def simple_text_splitter(text, chunk_size=3, chunk_overlap=1):
             if not chunk.endswith('.'):
                 chunk += "."
             chunks.append(chunk)
+            spans.append((i, min(i + chunk_size, len(sentences))))
 
+    if return_spans:
+        return chunks, spans
     return chunks
 
 
-def line_based_splitter(text):
+def line_based_splitter(text, return_spans=False):
     """
     Simple line-based splitter - each non-empty line becomes a chunk.
 
     Args:
         text: Text to split
+        return_spans: If True, also return the (start, end) line offsets of each chunk
 
     Returns:
-        List of non-empty lines
+        List of non-empty lines, or tuple of (chunks, spans) if return_spans is True
     """
     lines = text.split('\n')
     chunks = [line.strip() for line in lines if line.strip()]
+    if return_spans:
+        return chunks, [(i, i + 1) for i in range(len(chunks))]
     return chunks
 
 
-def optimized_text_splitter(text, chunk_size=5, chunk_overlap=1, chunking_strategy="sentence", verbose=False):
+def optimized_text_splitter(text, chunk_size=5, chunk_overlap=1, chunking_strategy="sentence", verbose=False,
+                            return_metadata=False):
     """
     Optimized text splitter that parses Wikipedia topics and prepends
     topic context to each chunk.
@@ -134,9 +147,13 @@ def optimized_text_splitter(text, chunk_size=5, chunk_overlap=1, chunking_strate
         chunk_overlap: Number of overlapping sentences between chunks (only used for 'sentence' strategy)
         chunking_strategy: "line" (each line is a chunk) or "sentence" (sentence-based with overlap)
         verbose: If True, print each chunk as it's generated
+        return_metadata: If True, also return a list with one metadata dict per chunk
+            ({"topic": topic_path, "section_id": ..., "start": ..., "end": ...}, where
+            start/end are sentence (or line) offsets within the topic section)
 
     Returns:
-        List of chunks with topic context prepended
+        List of chunks with topic context prepended,
+        or tuple of (chunks, metadata) if return_metadata is True
     """
     # Parse the text into topic sections
     sections = parse_wiki_topics(text)
@@ -148,24 +165,28 @@ def optimized_text_splitter(text, chunk_size=5, chunk_overlap=1, chunking_strate
         print(f"{'='*60}\n")
 
     all_chunks = []
+    all_metadata = []
 
-    for topic_path, content in sections:
+    for section_id, (topic_path, content) in enumerate(sections):
         # Split the content based on chosen strategy
         if chunking_strategy == "line":
-            content_chunks = line_based_splitter(content)
+            content_chunks, spans = line_based_splitter(content, return_spans=True)
         else:  # sentence-based
-            content_chunks = simple_text_splitter(content, chunk_size, chunk_overlap)
+            content_chunks, spans = simple_text_splitter(content, chunk_size, chunk_overlap, return_spans=True)
 
         # Prepend topic context to each chunk
-        for chunk in content_chunks:
+        for chunk, (start, end) in zip(content_chunks, spans):
             contextualized_chunk = f"[Topic: {topic_path}]\n{chunk}"
             all_chunks.append(contextualized_chunk)
+            all_metadata.append({"topic": topic_path, "section_id": section_id, "start": start, "end": end})
 
             if verbose:
                 print(f"Full chunk (as it will be indexed):")
                 print(contextualized_chunk)
                 print(f"{'-'*60}\n")
 
+    if return_metadata:
+        return all_chunks, all_metadata
     return all_chunks
 
 
@@ -175,7 +196,8 @@ def create_index_optimized(
     embedding_model_name,
     chunk_size=5,
     chunk_overlap=1,
-    verbose=False
+    verbose=False,
+    chunking_strategy="sentence"
 ):
     """
     Create a new FAISS index from a text file using optimized chunking.
@@ -187,6 +209,7 @@ def create_index_optimized(
         chunk_size: Number of sentences per chunk
         chunk_overlap: Number of overlapping sentences between chunks
         verbose: If True, print chunks as they're generated
+        chunking_strategy: "sentence" (sentence-based with overlap) or "line" (each line is a chunk)
 
     Returns:
         Tuple of (index, chunks, model, indexing_duration)
@@ -196,25 +219,30 @@ def create_index_optimized(
 
     # Load the embedding model
     print(f"Loading embedding model: {embedding_model_name}...")
-    model = SentenceTransformer(embedding_model_name)
+    with span("load_model"):
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(embedding_model_name)
     embedding_dim = model.get_sentence_embedding_dimension()
     print(f"Model loaded. Embedding dimension: {embedding_dim}")
 
     # Load the document
     try:
-        with open(text_file_path, 'r', encoding='utf-8') as f:
+        with span("load"), open(text_file_path, 'r', encoding='utf-8') as f:
             text_content = f.read()
     except FileNotFoundError:
         raise FileNotFoundError(f"Error: The file '{text_file_path}' was not found.")
 
     # Use optimized chunking strategy with topic context
     print(f"Processing document with optimized chunking...")
-    chunks = optimized_text_splitter(
-        text_content,
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        verbose=verbose
-    )
+    with span("chunk"):
+        chunks, chunk_metadata = optimized_text_splitter(
+            text_content,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            chunking_strategy=chunking_strategy,
+            verbose=verbose,
+            return_metadata=True
+        )
 
     if len(chunks) == 0:
         raise ValueError("No chunks were generated from the document. Check if the file has content.")
@@ -223,7 +251,8 @@ def create_index_optimized(
 
     # Generate embeddings for each chunk
     print("Generating embeddings for all chunks...")
-    chunk_embeddings = model.encode(chunks, show_progress_bar=True)
+    with span("embed", n_chunks=len(chunks)):
+        chunk_embeddings = model.encode(chunks, show_progress_bar=True)
 
     # Ensure embeddings are properly shaped (should be 2D: [n_chunks, embedding_dim])
     chunk_embeddings = np.array(chunk_embeddings).astype('float32')
@@ -235,12 +264,32 @@ def create_index_optimized(
     print("Creating FAISS index...")
     # Using IndexFlatL2 - a simple L2 distance (Euclidean) index
     index = faiss.IndexFlatL2(embedding_dim)
-    index.add(chunk_embeddings)
+    with span("index_add", n_vectors=len(chunk_embeddings)):
+        index.add(chunk_embeddings)
 
     # Save the index and the chunks
-    faiss.write_index(index, faiss_index_path)
-    with open(faiss_index_path + ".json", 'w') as f:
-        json.dump(chunks, f)
+    with span("save"):
+        faiss.write_index(index, faiss_index_path)
+        with open(faiss_index_path + ".json", 'w') as f:
+            json.dump(chunks, f)
+
+    # Build the BM25 inverted index over the same chunks for lexical / hybrid search
+    print("Building BM25 inverted index...")
+    start_time_bm25 = time.time()
+    with span("bm25_build"):
+        inverted_index = InvertedIndex.build(chunks)
+        inverted_index.save(faiss_index_path)
+    bm25_duration = time.time() - start_time_bm25
+    print(f"Inverted index: {len(inverted_index.terms)} terms, {len(inverted_index.doc_ids)} postings "
+          f"({bm25_duration:.4f} seconds)")
+
+    # Keep the topic path of every chunk as structured data for topic-filtered search
+    topic_index = TopicIndex.build([meta["topic"] for meta in chunk_metadata])
+    topic_index.save(faiss_index_path)
+    print(f"Topic index: {len(topic_index.topics)} topics")
+
+    # Keep chunk positions so overlapping / adjacent hits can be merged before prompting
+    save_chunk_positions(faiss_index_path, chunk_metadata, chunking_strategy=chunking_strategy)
 
     end_time_indexing = time.time()
     indexing_duration = end_time_indexing - start_time_indexing
@@ -295,8 +344,10 @@ def main():
         action='store_true',
         help='Print each chunk as it is generated (useful for debugging)'
     )
+    profiling.add_profile_arguments(parser)
 
     args = parser.parse_args()
+    profiling.enable_from_args(args)
 
     print("=" * 60)
     print("FAISS Index Generation (Optimized with Topic Context)")
@@ -326,7 +377,11 @@ def main():
         print(f"Total duration:  {duration:.2f} seconds")
         print(f"Index saved to:  {args.index_path}")
         print(f"Chunks saved to: {args.index_path}.json")
+        print(f"BM25 index:      {args.index_path}.bm25.*")
+        print(f"Topic index:     {args.index_path}.topics.*")
+        print(f"Positions:       {args.index_path}.positions.*")
         print("=" * 60)
+        profiling.report_from_args(args)
 
         # Show a sample chunk
         if chunks:
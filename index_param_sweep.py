@@ -0,0 +1,262 @@
+"""Recall-vs-latency sweep of IVF and HNSW parameters against exact flat search.
+
+The vectors of an existing index (e.g. the IndexFlatL2 built by
+index_generation_optimized.py) are re-indexed as IndexIVFFlat for a grid of
+nlist / nprobe values and as IndexHNSWFlat for a grid of M / efSearch values.
+Every configuration is measured for recall@k against exact IndexFlatL2 search
+(the ground truth) and for single-query search latency, as in the RAG query
+path. The Pareto frontier (no other configuration is both faster and more
+accurate) is printed, and the most accurate configuration within a latency
+target is recommended.
+
+By default a random sample of the stored vectors is held out as queries;
+--queries encodes a query-set file with the embedding model instead.
+
+With --write-metadata the recommendation is stored in <index>.meta.json:
+load_retriever() and advanced_rag_benchmark.py apply its search parameters
+(nprobe / efSearch) to IVF / HNSW indexes, and advanced_rag_benchmark.py builds
+its IVF index with the recommended nlist.
+
+Example:
+    python index_param_sweep.py --index-path index_optimized_sentence_3_1.faiss --latency-target-ms 0.5
+    python index_param_sweep.py --index-path my_document_flat.faiss --write-metadata my_document_ivf.faiss
+"""
+
+import time
+import json
+import argparse
+import numpy as np
+import faiss
+from retrieval import save_index_metadata
+
+
+DEFAULT_NLIST = "16,32,64,128,256"
+DEFAULT_NPROBE = "1,2,4,8,16,32"
+DEFAULT_HNSW_M = "8,16,32"
+DEFAULT_EF_SEARCH = "16,32,64,128"
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def load_vectors(index_path):
+    """All vectors stored in a FAISS index, as float32 [ntotal, dim]."""
+    index = faiss.read_index(index_path)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def split_queries(vectors, n_queries, seed):
+    """Hold out n_queries random vectors as queries; returns (database, queries)."""
+    rng = np.random.default_rng(seed)
+    n_queries = min(n_queries, len(vectors) // 10)
+    held_out = rng.choice(len(vectors), size=n_queries, replace=False)
+    mask = np.ones(len(vectors), dtype=bool)
+    mask[held_out] = False
+    return np.ascontiguousarray(vectors[mask]), np.ascontiguousarray(vectors[held_out])
+
+
+def encode_queries(path, embedding_model_name):
+    """Embed the queries of a query-set file."""
+    # Only needed for --queries; held-out vectors work without the embedding model
+    from sentence_transformers import SentenceTransformer
+    from benchmark_harness import load_queries
+    model = SentenceTransformer(embedding_model_name)
+    return np.array(model.encode(load_queries(path))).astype('float32')
+
+
+def recall_at_k(found, truth):
+    """Mean fraction of the true k nearest neighbours that were found."""
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[f >= 0]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def measure(index, queries, k, n_runs):
+    """Search every query on its own, as the query path does.
+
+    Returns:
+        Tuple of (ids [n_queries, k], p50 latency, p99 latency) with latencies in seconds
+    """
+    latencies = np.empty((n_runs, len(queries)))
+    ids = None
+    for run in range(n_runs):
+        found = []
+        for i in range(len(queries)):
+            start = time.perf_counter()
+            _, I = index.search(queries[i:i + 1], k)
+            latencies[run, i] = time.perf_counter() - start
+            found.append(I[0])
+        ids = np.array(found)
+    # Best run per query, so scheduler noise does not masquerade as index cost
+    best = latencies.min(axis=0)
+    return ids, float(np.percentile(best, 50)), float(np.percentile(best, 99))
+
+
+def sweep(database, queries, k, nlists, nprobes, hnsw_ms, ef_searches, ef_construction, n_runs, seed):
+    """Measure the flat baseline and every IVF / HNSW configuration.
+
+    Returns:
+        List of result dicts with "index_type", "build_parameters", "search_parameters",
+        "recall", "latency_p50", "latency_p99" and "build_time"
+    """
+    dim = database.shape[1]
+    results = []
+
+    start = time.perf_counter()
+    flat = faiss.IndexFlatL2(dim)
+    flat.add(database)
+    build_time = time.perf_counter() - start
+    truth, p50, p99 = measure(flat, queries, k, n_runs)
+    results.append({"index_type": "flat", "build_parameters": {}, "search_parameters": {},
+                    "recall": 1.0, "latency_p50": p50, "latency_p99": p99, "build_time": build_time})
+
+    for nlist in nlists:
+        if nlist > len(database):
+            print(f"Skipping nlist={nlist}: more clusters than vectors ({len(database)})")
+            continue
+        start = time.perf_counter()
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        index.cp.seed = seed
+        index.train(database)
+        index.add(database)
+        build_time = time.perf_counter() - start
+        for nprobe in nprobes:
+            if nprobe > nlist:
+                continue
+            index.nprobe = nprobe
+            found, p50, p99 = measure(index, queries, k, n_runs)
+            results.append({"index_type": "ivf", "build_parameters": {"nlist": nlist},
+                            "search_parameters": {"nprobe": nprobe}, "recall": recall_at_k(found, truth),
+                            "latency_p50": p50, "latency_p99": p99, "build_time": build_time})
+
+    for m in hnsw_ms:
+        start = time.perf_counter()
+        index = faiss.IndexHNSWFlat(dim, m)
+        index.hnsw.efConstruction = ef_construction
+        index.add(database)
+        build_time = time.perf_counter() - start
+        for ef_search in ef_searches:
+            index.hnsw.efSearch = max(ef_search, k)
+            found, p50, p99 = measure(index, queries, k, n_runs)
+            results.append({"index_type": "hnsw", "build_parameters": {"M": m, "efConstruction": ef_construction},
+                            "search_parameters": {"efSearch": index.hnsw.efSearch},
+                            "recall": recall_at_k(found, truth),
+                            "latency_p50": p50, "latency_p99": p99, "build_time": build_time})
+    return results
+
+
+def pareto_frontier(results):
+    """Configurations for which no other one is both at least as fast and more accurate."""
+    frontier = []
+    best_recall = -1.0
+    for result in sorted(results, key=lambda r: (r["latency_p50"], -r["recall"])):
+        if result["recall"] > best_recall:
+            frontier.append(result)
+            best_recall = result["recall"]
+    return frontier
+
+
+def recommend(results, latency_target):
+    """Most accurate configuration with p50 latency within the target (then the fastest of those).
+
+    Falls back to the fastest configuration if none meets the target.
+    """
+    within = [r for r in results if r["latency_p50"] <= latency_target]
+    if not within:
+        return min(results, key=lambda r: r["latency_p50"])
+    return max(within, key=lambda r: (r["recall"], -r["latency_p50"]))
+
+
+def describe(result):
+    parameters = {**result["build_parameters"], **result["search_parameters"]}
+    return " ".join([result["index_type"]] + [f"{name}={value}" for name, value in parameters.items()])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep IVF / HNSW parameters for recall@k vs search latency')
+    parser.add_argument('--index-path', type=str, default='index_optimized_sentence_3_1.faiss',
+                        help='Index whose vectors are swept (default: index_optimized_sentence_3_1.faiss)')
+    parser.add_argument('--queries', type=str, default=None,
+                        help='Query-set file to encode (default: hold out stored vectors as queries)')
+    parser.add_argument('--embedding-model', type=str, default='sentence-transformers/all-MiniLM-L6-v2',
+                        help='Sentence transformer model for --queries')
+    parser.add_argument('--n-queries', type=int, default=200, help='Held-out query vectors (default: 200)')
+    parser.add_argument('--top-k', type=int, default=3, help='k of recall@k (default: 3)')
+    parser.add_argument('--nlist', type=str, default=DEFAULT_NLIST, help=f'IVF nlist values (default: {DEFAULT_NLIST})')
+    parser.add_argument('--nprobe', type=str, default=DEFAULT_NPROBE,
+                        help=f'IVF nprobe values (default: {DEFAULT_NPROBE})')
+    parser.add_argument('--hnsw-m', type=str, default=DEFAULT_HNSW_M,
+                        help=f'HNSW M values, empty to skip HNSW (default: {DEFAULT_HNSW_M})')
+    parser.add_argument('--ef-search', type=str, default=DEFAULT_EF_SEARCH,
+                        help=f'HNSW efSearch values (default: {DEFAULT_EF_SEARCH})')
+    parser.add_argument('--ef-construction', type=int, default=40, help='HNSW efConstruction (default: 40)')
+    parser.add_argument('--latency-target-ms', type=float, default=1.0,
+                        help='p50 search latency target for the recommendation (default: 1.0)')
+    parser.add_argument('--n-runs', type=int, default=3, help='Runs per configuration, best is kept (default: 3)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for query sampling and k-means (default: 0)')
+    parser.add_argument('--output', type=str, default=None, help='Write all results as JSON to this file')
+    parser.add_argument('--write-metadata', type=str, nargs='?', const='', default=None, metavar='INDEX_PATH',
+                        help='Store the recommendation in <INDEX_PATH>.meta.json (default: --index-path)')
+    args = parser.parse_args()
+
+    print(f"Loading vectors from '{args.index_path}'...")
+    vectors = load_vectors(args.index_path)
+    if args.queries:
+        database, queries = vectors, encode_queries(args.queries, args.embedding_model)
+    else:
+        database, queries = split_queries(vectors, args.n_queries, args.seed)
+    print(f"{len(database)} vectors of dimension {database.shape[1]}, {len(queries)} queries, k={args.top_k}")
+
+    results = sweep(database, queries, args.top_k, parse_int_list(args.nlist), parse_int_list(args.nprobe),
+                    parse_int_list(args.hnsw_m), parse_int_list(args.ef_search), args.ef_construction,
+                    args.n_runs, args.seed)
+    frontier = pareto_frontier(results)
+    latency_target = args.latency_target_ms / 1000
+    best = recommend(results, latency_target)
+
+    print("\n-----------------------------------------------------")
+    print(f"{'Configuration':>40} | {'Recall@' + str(args.top_k):>8} | {'p50 (ms)':>8} | {'p99 (ms)':>8} | "
+          f"{'Build (s)':>9} | Pareto")
+    for result in results:
+        print(f"{describe(result):>40} | {result['recall']:>8.3f} | {result['latency_p50'] * 1000:>8.3f} | "
+              f"{result['latency_p99'] * 1000:>8.3f} | {result['build_time']:>9.2f} | "
+              f"{'*' if result in frontier else ''}")
+
+    print("\nPareto frontier:")
+    for result in frontier:
+        print(f"  {describe(result)}: recall@{args.top_k} {result['recall']:.3f}, "
+              f"p50 {result['latency_p50'] * 1000:.3f} ms")
+    if best["latency_p50"] > latency_target:
+        print(f"\nNo configuration meets the {args.latency_target_ms} ms target; the fastest is recommended.")
+    print(f"BENCHMARK: Recommended {describe(best)} (recall@{args.top_k} {best['recall']:.3f}, "
+          f"p50 {best['latency_p50'] * 1000:.3f} ms, target {args.latency_target_ms} ms)")
+    print("-----------------------------------------------------")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"k": args.top_k, "n_vectors": len(database), "n_queries": len(queries),
+                       "latency_target": latency_target, "results": results, "pareto": frontier,
+                       "recommended": best}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.write_metadata is not None:
+        prefix = args.write_metadata or args.index_path
+        save_index_metadata(prefix, {
+            "index_type": best["index_type"],
+            "build_parameters": best["build_parameters"],
+            "search_parameters": best["search_parameters"],
+            "recall_at_k": best["recall"],
+            "k": args.top_k,
+            "latency_p50": best["latency_p50"],
+            "latency_target": latency_target,
+            "swept_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+        print(f"Recommendation written to {prefix}.meta.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
 import os
 import time
 import numpy as np
-import faiss
-import requests
 import json
-from sentence_transformers import SentenceTransformer
+import argparse
+from llm_client import LLMClient
+from interactive_session import InteractiveSession, run_session, add_session_arguments
 
 # --- Configuration ---
 TEXT_FILE_PATH = "my_document.txt"
@@ -14,7 +14,8 @@ CHUNKS_PATH = "my_document_chunks.json" # Separate file for the text chunks
 
 TOP_K = 3 # Number of relevant chunks to retrieve
 OLLAMA_MODEL_NAME = "gemma3:12b" # The model you pulled with "ollama pull"
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
+OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_KEEP_ALIVE = "30m" # Keep the model loaded between queries
 
 # --- Helper Functions for Indexing and Loading ---
 
@@ -32,6 +33,7 @@ def simple_text_splitter(text, chunk_size=5, chunk_overlap=1):
 
 def create_and_save_index(text_file, index_path, chunks_path, model):
     """Reads a text file, creates embeddings, and saves the FAISS index and chunks."""
+    import faiss
     print("--- Creating new FAISS index ---")
     start_time = time.time()
 
@@ -69,6 +71,7 @@ def create_and_save_index(text_file, index_path, chunks_path, model):
 
 def load_existing_index(index_path, chunks_path):
     """Loads a pre-existing FAISS index and its corresponding chunks."""
+    import faiss
     print("--- Loading existing FAISS index ---")
     try:
         index = faiss.read_index(index_path)
@@ -81,14 +84,35 @@ def load_existing_index(index_path, chunks_path):
         print("Will attempt to create a new index.")
         return None, None
 
+def build_prompt(query, retrieved_chunks):
+    """The prompt sent to Ollama: the retrieved context and the question."""
+    context_str = "\n\n".join(retrieved_chunks)
+    return f"""
+Based on the following context, please answer the user's question.
+If the context does not contain the answer, state that the information is not available in the provided context.
+
+Context:
+{context_str}
+
+Question:
+{query}
+
+Answer:
+"""
+
 # --- Main Application ---
 
 def main():
+    parser = argparse.ArgumentParser(description="Interactive RAG benchmark with streamed answers.")
+    add_session_arguments(parser)
+    args = parser.parse_args()
+
     print("--- Interactive RAG Benchmark on Raspberry Pi ---")
 
     # Load the embedding model (needed for both indexing and querying)
     print(f"Loading embedding model: {EMBEDDING_MODEL_NAME}...")
     try:
+        from sentence_transformers import SentenceTransformer
         model = SentenceTransformer(EMBEDDING_MODEL_NAME)
     except Exception as e:
         print(f"Could not load Sentence Transformer model. Error: {e}")
@@ -108,64 +132,19 @@ def main():
         print("Failed to load or create an index. Exiting.")
         return
 
-    # --- Interactive Query Loop ---
-    print("\n--- Ready to Chat! ---")
-    print("Enter your query below. Type 'quit' or 'exit' to stop.")
-    
-    while True:
-        query = input("\nQuery: ")
-        if query.lower() in ['quit', 'exit']:
-            print("Exiting...")
-            break
-
-        # STAGE 1: SEARCH & RETRIEVAL (BENCHMARKED)
-        start_retrieval_time = time.time()
-        
+    # One client for the whole session, so the connection to Ollama is reused
+    client = LLMClient(base_url=OLLAMA_BASE_URL, api="ollama", keep_alive=OLLAMA_KEEP_ALIVE)
+
+    def search(query):
         query_embedding = model.encode([query])
         D, I = index.search(np.array(query_embedding).astype('float32'), TOP_K)
-        retrieved_chunks = [chunks[i] for i in I[0]]
-        
-        end_retrieval_time = time.time()
-        retrieval_duration = end_retrieval_time - start_retrieval_time
-        
-        context_str = "\n\n".join(retrieved_chunks)
-
-        # STAGE 2: LLM RESPONSE GENERATION (BENCHMARKED)
-        prompt = f"""
-Based on the following context, please answer the user's question.
-If the context does not contain the answer, state that the information is not available in the provided context.
-
-Context:
-{context_str}
+        return [chunks[i] for i in I[0]]
 
-Question:
-{query}
-
-Answer:
-"""
-        start_llm_time = time.time()
-        try:
-            response = requests.post(
-                OLLAMA_API_URL,
-                json={"model": OLLAMA_MODEL_NAME, "prompt": prompt, "stream": False},
-                timeout=120
-            )
-            response.raise_for_status()
-            generated_text = response.json().get('response', '').strip()
-        except requests.exceptions.RequestException as e:
-            generated_text = f"Error communicating with Ollama: {e}"
-
-        end_llm_time = time.time()
-        llm_duration = end_llm_time - start_llm_time
-
-        # --- Display Results ---
-        print("\n--- Answer ---")
-        print(generated_text)
-        print("\n--- Benchmarks ---")
-        print(f"  Search & Retrieval: {retrieval_duration:.4f} seconds")
-        print(f"  LLM Generation:     {llm_duration:.4f} seconds")
-        print(f"  Total Time:         {retrieval_duration + llm_duration:.4f} seconds")
-        print("--------------------")
+    session = InteractiveSession(client, OLLAMA_MODEL_NAME, search, build_prompt)
+    try:
+        run_session(session, replay=args.replay, pause=args.replay_pause, output=args.output)
+    finally:
+        client.close()
 
 if __name__ == "__main__":
     main()
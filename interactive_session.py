@@ -0,0 +1,236 @@
+"""Persistent interactive RAG session: streamed answers and per-turn stage timings.
+
+Shared by interactive_rag_benchmark.py, recursive_rag_benchmark.py and
+advanced_rag_benchmark.py. One pooled LLMClient serves the whole session.
+Every answer is streamed to the terminal token by token.
+
+When a query is submitted, encoding and search start right away on a worker
+thread. Meanwhile the main thread re-opens the connection to the LLM server:
+keep-alive connections expire after a few seconds idle (httpx and
+llama-server both default to 5s), and a person typing a question takes
+longer than that. The answer request then goes out on a warm connection.
+
+Per turn the stages are shown:
+
+    search      query encoding + index search (worker thread)
+    connect     connection warm-up (overlaps with search)
+    prompt      prompt building
+    ttft        request sent -> first token
+    first token query submitted -> first token, what the user waits for
+    first sentence
+                query submitted -> first complete sentence, where a voice
+                (text-to-speech) answer would start
+    generation  request sent -> last token
+    total       query submitted -> last token
+
+--replay TRANSCRIPT feeds the queries of a file (one per line, '#' comments
+skipped) instead of reading the keyboard. Interactive latency can then be
+benchmarked without typing; --replay-pause simulates the user's typing time
+between turns. At the end of a session the stages are summarized as
+percentiles.
+
+Example:
+    python interactive_rag_benchmark.py
+    python interactive_rag_benchmark.py --replay data/queries.txt --replay-pause 8 --output results/interactive.json
+"""
+
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+from llm_client import LLMClient
+from benchmark_harness import load_queries, summarize
+from sentence_stream import SentenceSplitter
+
+
+STAGES = ("search", "connect", "prompt", "ttft", "first_token", "first_sentence", "generation", "total")
+QUIT_COMMANDS = ("quit", "exit")
+
+
+class InteractiveSession:
+    """A question-answering session on one persistent LLM client.
+
+    Args:
+        client: LLMClient used for every turn
+        model: Model name sent with every request
+        search: Function query -> retrieved chunks (encoding included)
+        build_prompt: Function (query, chunks) -> prompt text
+        out: Stream the answer is printed to
+    """
+
+    def __init__(self, client: LLMClient, model: str, search: Callable[[str], List[str]],
+                 build_prompt: Callable[[str, List[str]], str], out=sys.stdout):
+        self.client = client
+        self.model = model
+        self.search = search
+        self.build_prompt = build_prompt
+        self.out = out
+        self.turns: List[Dict] = []
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _timed_search(self, query: str) -> Tuple[List[str], float]:
+        start = time.perf_counter()
+        chunks = self.search(query)
+        return chunks, time.perf_counter() - start
+
+    def ask(self, query: str, submitted: Optional[float] = None) -> Dict:
+        """Answer one query, streaming the answer to `out`.
+
+        Args:
+            query: The question
+            submitted: perf_counter() time the query was submitted (default: now)
+
+        Returns:
+            The turn: "query", "chunks", "answer" and the stage durations in seconds
+        """
+        submitted = time.perf_counter() if submitted is None else submitted
+        search_future = self._executor.submit(self._timed_search, query)
+
+        start = time.perf_counter()
+        self.client.check_health()
+        turn = {"query": query, "connect": time.perf_counter() - start}
+
+        chunks, turn["search"] = search_future.result()
+        start = time.perf_counter()
+        prompt = self.build_prompt(query, chunks)
+        turn["prompt"] = time.perf_counter() - start
+        turn["chunks"] = chunks
+
+        answer = []
+        splitter = SentenceSplitter()
+        llm_start = time.perf_counter()
+        try:
+            for text in self.client.completions.stream_content(model=self.model, prompt=prompt):
+                if "ttft" not in turn:
+                    now = time.perf_counter()
+                    turn["ttft"] = now - llm_start
+                    turn["first_token"] = now - submitted
+                    text = text.lstrip()
+                answer.append(text)
+                if "first_sentence" not in turn and splitter.feed(text):
+                    turn["first_sentence"] = time.perf_counter() - submitted
+                self.out.write(text)
+                self.out.flush()
+            self.out.write("\n")
+        except httpx.HTTPError as e:
+            turn["error"] = f"Error communicating with the LLM server: {e}"
+            self.out.write(turn["error"] + "\n")
+        end = time.perf_counter()
+        if "first_sentence" not in turn and answer:
+            turn["first_sentence"] = end - submitted
+        turn["generation"] = end - llm_start
+        turn["total"] = end - submitted
+        turn["answer"] = "".join(answer)
+        self.turns.append(turn)
+        return turn
+
+    def summary(self) -> Dict[str, Dict]:
+        """Percentiles of every stage over the turns so far."""
+        return {stage: summarize([turn[stage] for turn in self.turns if stage in turn]) for stage in STAGES}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def read_queries(replay: Optional[str] = None, pause: float = 0.0,
+                 prompt: str = "\nQuery: ") -> Iterator[Tuple[str, float]]:
+    """Queries from the keyboard, or from a transcript with `replay`.
+
+    Yields:
+        Tuples of (query, perf_counter() time it was submitted); stops at
+        'quit' / 'exit', end of input or the end of the transcript
+    """
+    if replay:
+        for query in load_queries(replay):
+            if pause:
+                time.sleep(pause)
+            print(f"{prompt}{query}")
+            if query.lower() in QUIT_COMMANDS:
+                return
+            yield query, time.perf_counter()
+        return
+    while True:
+        try:
+            query = input(prompt)
+        except EOFError:
+            return
+        submitted = time.perf_counter()
+        if query.lower() in QUIT_COMMANDS:
+            return
+        if query.strip():
+            yield query, submitted
+
+
+def print_turn(turn: Dict, extra: Sequence[Tuple[str, str]] = ()):
+    """Per-turn stage timings."""
+    print("\n--- Benchmarks ---")
+    for label, value in extra:
+        print(f"  {label + ':':<21}{value}")
+    print(f"  {'Encode & Search:':<21}{turn['search']:.4f} seconds")
+    print(f"  {'Connection warm-up:':<21}{turn['connect']:.4f} seconds (while searching)")
+    if "ttft" in turn:
+        print(f"  {'Time to First Token:':<21}{turn['ttft']:.4f} seconds "
+              f"({turn['first_token']:.4f} from submitting)")
+    if "first_sentence" in turn:
+        print(f"  {'First Sentence:':<21}{turn['first_sentence']:.4f} seconds from submitting")
+    print(f"  {'LLM Generation:':<21}{turn['generation']:.4f} seconds")
+    print(f"  {'Total Time:':<21}{turn['total']:.4f} seconds")
+    print("--------------------")
+
+
+def run_session(session: InteractiveSession, replay: Optional[str] = None, pause: float = 0.0,
+                output: Optional[str] = None, extra: Sequence[Tuple[str, str]] = ()):
+    """Answer queries until the user quits (or the transcript ends), then summarize.
+
+    Args:
+        session: The session to run
+        replay: Transcript file to read queries from instead of the keyboard
+        pause: Seconds to wait before every replayed query
+        output: Write the turns and the summary as JSON to this file
+        extra: (label, value) rows printed with every turn's timings
+    """
+    print("\n--- Ready to Chat! ---")
+    if not replay:
+        print("Enter your query below. Type 'quit' or 'exit' to stop.")
+    try:
+        for query, submitted in read_queries(replay, pause):
+            print("\n--- Answer ---")
+            turn = session.ask(query, submitted)
+            print_turn(turn, extra)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        session.close()
+    print("Exiting...")
+
+    if not session.turns:
+        return
+    summary = session.summary()
+    print(f"\n--- Session: {len(session.turns)} turn(s) ---")
+    print(f"{'Stage':>14} | {'p50 (ms)':>9} | {'p90 (ms)':>9} | {'max (ms)':>9}")
+    for stage in STAGES:
+        s = summary[stage]
+        if s["n"]:
+            print(f"{stage:>14} | {s['p50'] * 1000:>9.1f} | {s['p90'] * 1000:>9.1f} | {s['max'] * 1000:>9.1f}")
+    if summary["first_token"]["n"]:
+        print(f"BENCHMARK: Submit to first token p50: {summary['first_token']['p50']:.4f} seconds")
+    if summary["first_sentence"]["n"]:
+        print(f"BENCHMARK: Submit to first sentence p50: {summary['first_sentence']['p50']:.4f} seconds")
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "turns": session.turns,
+                       "summary": summary}, f, indent=2)
+        print(f"Session written to {output}")
+
+
+def add_session_arguments(parser):
+    """Add --replay, --replay-pause and --output to an argument parser."""
+    parser.add_argument('--replay', type=str, default=None, metavar='TRANSCRIPT',
+                        help='Read queries from this file (one per line) instead of the keyboard')
+    parser.add_argument('--replay-pause', type=float, default=0.0,
+                        help='Seconds to wait before every replayed query, like typing time (default: 0)')
+    parser.add_argument('--output', type=str, default=None, help='Write the turns and timings as JSON to this file')
+    return parser
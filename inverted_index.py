@@ -0,0 +1,174 @@
+"""Compact on-disk inverted index with BM25 scoring.
+
+The index is built once at indexing time (see index_generation_optimized.py) and
+stored next to the FAISS index as a small JSON term dictionary plus flat NumPy
+postings arrays, so the postings can be memory-mapped instead of read into RAM.
+
+Files written for an index saved under `<prefix>`:
+    <prefix>.bm25.json              term dictionary (sorted) and BM25 parameters
+    <prefix>.bm25.offsets.npy       int64 [n_terms + 1], start of each term's postings
+    <prefix>.bm25.doc_ids.npy       int32 [n_postings], chunk IDs
+    <prefix>.bm25.impacts.npy       float32 [n_postings], precomputed BM25 term weights
+
+BM25 weights are precomputed per posting, so a query only has to add up the
+impacts of its terms.
+"""
+
+import os
+import re
+import json
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Very common words carry almost no BM25 weight but have the longest postings lists
+STOPWORDS = frozenset("""
+a an and are as at be but by for from had has have he her his in is it its of on
+or she that the their there they this to was were which who will with
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase `text` and split it into alphanumeric terms, dropping stopwords.
+
+    Wikitext markup such as " @-@ " only contains punctuation and is dropped.
+    """
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class InvertedIndex:
+    """BM25 inverted index over a list of chunks.
+
+    Example:
+        inv = InvertedIndex.build(chunks)
+        inv.save("index_optimized.faiss")
+
+        inv = InvertedIndex.load("index_optimized.faiss")  # memory-mapped
+        scores, ids = inv.search("What is the song Bossy about?", top_k=3)
+    """
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, doc_ids: np.ndarray,
+                 impacts: np.ndarray, n_docs: int, k1: float = 1.2, b: float = 0.75):
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.impacts = impacts
+        self.n_docs = n_docs
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, chunks: List[str], k1: float = 1.2, b: float = 0.75) -> "InvertedIndex":
+        """Tokenize all chunks and build the postings arrays."""
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lens = np.zeros(len(chunks), dtype=np.float32)
+
+        for doc_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            doc_lens[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        n_docs = len(chunks)
+        avg_doc_len = float(doc_lens.mean()) if n_docs else 0.0
+        terms = sorted(postings)
+
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.float32)
+        idfs = np.empty(offsets[-1], dtype=np.float32)
+        for i, term in enumerate(terms):
+            start, end = offsets[i], offsets[i + 1]
+            term_postings = postings[term]
+            doc_ids[start:end] = [doc_id for doc_id, _ in term_postings]
+            tfs[start:end] = [tf for _, tf in term_postings]
+            df = len(term_postings)
+            idfs[start:end] = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+
+        # Standard BM25 term weight, computed once here instead of per query
+        norm = k1 * (1.0 - b + b * doc_lens[doc_ids] / max(avg_doc_len, 1e-9))
+        impacts = (idfs * tfs * (k1 + 1.0) / (tfs + norm)).astype(np.float32)
+
+        return cls(terms, offsets, doc_ids, impacts, n_docs, k1=k1, b=b)
+
+    @staticmethod
+    def exists(prefix: str) -> bool:
+        """Check whether an inverted index was saved under `prefix`."""
+        return os.path.exists(prefix + ".bm25.json")
+
+    def save(self, prefix: str):
+        """Write the term dictionary and postings arrays next to `prefix`."""
+        with open(prefix + ".bm25.json", 'w') as f:
+            json.dump({
+                "n_docs": self.n_docs,
+                "k1": self.k1,
+                "b": self.b,
+                "terms": self.terms,
+            }, f)
+        np.save(prefix + ".bm25.offsets.npy", self.offsets)
+        np.save(prefix + ".bm25.doc_ids.npy", self.doc_ids)
+        np.save(prefix + ".bm25.impacts.npy", self.impacts)
+
+    @classmethod
+    def load(cls, prefix: str, mmap: bool = True) -> "InvertedIndex":
+        """Load an inverted index; postings are memory-mapped unless `mmap` is False."""
+        with open(prefix + ".bm25.json", 'r') as f:
+            header = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        return cls(
+            terms=header["terms"],
+            offsets=np.load(prefix + ".bm25.offsets.npy", mmap_mode=mmap_mode),
+            doc_ids=np.load(prefix + ".bm25.doc_ids.npy", mmap_mode=mmap_mode),
+            impacts=np.load(prefix + ".bm25.impacts.npy", mmap_mode=mmap_mode),
+            n_docs=header["n_docs"],
+            k1=header["k1"],
+            b=header["b"],
+        )
+
+    def search(self, query: str, top_k: int = 3,
+               allowed_ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Score chunks against `query` with BM25.
+
+        Only the postings of the query terms are touched, so the cost does not
+        depend on the number of chunks.
+
+        Args:
+            query: Query text
+            top_k: Number of chunks to return
+            allowed_ids: Optional sorted array of chunk IDs to restrict the search to
+
+        Returns:
+            Tuple of (scores, ids), best first; may hold fewer than top_k entries
+        """
+        term_ids = {self.term_ids[t] for t in tokenize(query) if t in self.term_ids}
+        if not term_ids or (allowed_ids is not None and len(allowed_ids) == 0):
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        slices = [slice(self.offsets[t], self.offsets[t + 1]) for t in term_ids]
+        doc_ids = np.concatenate([self.doc_ids[s] for s in slices])
+        impacts = np.concatenate([self.impacts[s] for s in slices])
+
+        if allowed_ids is not None:
+            pos = np.searchsorted(allowed_ids, doc_ids)
+            keep = (pos < len(allowed_ids)) & (allowed_ids[np.minimum(pos, len(allowed_ids) - 1)] == doc_ids)
+            doc_ids, impacts = doc_ids[keep], impacts[keep]
+            if len(doc_ids) == 0:
+                return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        # Sum impacts per candidate chunk
+        candidates, inverse = np.unique(doc_ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=impacts).astype(np.float32)
+
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return scores[top], candidates[top].astype(np.int64)
@@ -0,0 +1,288 @@
+"""Start, health-check, restart and stop llama-server processes from Python.
+
+Replaces the fire-and-forget `nohup llama-server ...` of start_llama_server.sh:
+a server is only handed out once its /health endpoint reports the model as
+loaded, so benchmarks no longer pay (or fail on) model loading in their first
+query, and the load time is reported on its own. A supervisor thread restarts
+servers that crash.
+
+Any executable that takes llama-server's arguments and serves /health can be
+managed, e.g. the stub server for testing:
+
+    python llama_server_manager.py models/LFM2-1.2B-RAG-Q4_K_M.gguf --parallel 2
+    python llama_server_manager.py fake.gguf --executable "python stub_llm_server.py --load-delay 2"
+
+From Python:
+
+    with LlamaServerManager("models/model.gguf", n_servers=2, threads=4, parallel=2) as manager:
+        client = LLMClient(base_url=manager.base_urls)
+"""
+
+import os
+import sys
+import time
+import shlex
+import signal
+import argparse
+import threading
+import subprocess
+from typing import List, Optional, Sequence
+import httpx
+
+
+DEFAULT_EXECUTABLE = "llama-server"
+DEFAULT_LOG_PATH = "llama_server_{port}.log"
+
+
+class LlamaServer:
+    """One llama-server process.
+
+    Args:
+        model_path: Path to the GGUF model
+        port: Port to listen on
+        host: Interface to bind
+        threads: Generation threads (-t); None uses llama-server's default
+        ctx_size: Context size in tokens (-c); None uses the model's default
+        parallel: Number of slots (-np)
+        executable: Command to run, split like a shell would (default: llama-server)
+        extra_args: Further command-line arguments
+        log_path: File for the server's output; "{port}" is replaced by the port
+            (default: llama_server_{port}.log)
+    """
+
+    def __init__(self, model_path: str, port: int = 8080, host: str = "127.0.0.1",
+                 threads: Optional[int] = None, ctx_size: Optional[int] = None, parallel: int = 1,
+                 executable: str = DEFAULT_EXECUTABLE, extra_args: Sequence[str] = (),
+                 log_path: Optional[str] = None):
+        self.model_path = model_path
+        self.port = port
+        self.host = host
+        self.threads = threads
+        self.ctx_size = ctx_size
+        self.parallel = parallel
+        self.executable = executable
+        self.extra_args = list(extra_args)
+        self.log_path = (log_path or DEFAULT_LOG_PATH).format(port=port)
+        self.process = None
+        self.started_at = None
+        self.load_time = None
+        self.restarts = 0
+        self._log_file = None
+
+    @property
+    def base_url(self) -> str:
+        """OpenAI-compatible API URL, as used by LLMClient."""
+        return f"http://{self.host}:{self.port}/v1"
+
+    @property
+    def health_url(self) -> str:
+        return f"http://{self.host}:{self.port}/health"
+
+    def command(self) -> List[str]:
+        """The command line the server is started with."""
+        command = shlex.split(self.executable) + [
+            "-m", self.model_path,
+            "--host", self.host,
+            "--port", str(self.port),
+            "-np", str(self.parallel),
+        ]
+        if self.threads is not None:
+            command += ["-t", str(self.threads)]
+        if self.ctx_size is not None:
+            command += ["-c", str(self.ctx_size)]
+        return command + self.extra_args
+
+    def start(self):
+        """Launch the process (does not wait for the model to load)."""
+        if self.is_running():
+            return self
+        self._log_file = open(self.log_path, 'ab')
+        self.process = subprocess.Popen(self.command(), stdout=self._log_file, stderr=subprocess.STDOUT)
+        self.started_at = time.perf_counter()
+        self.load_time = None
+        return self
+
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def is_healthy(self, timeout: float = 1.0) -> bool:
+        """Whether /health reports the model as loaded (llama-server answers 503 while loading)."""
+        try:
+            return httpx.get(self.health_url, timeout=timeout).status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    def wait_until_ready(self, timeout: float = 300.0, poll_interval: float = 0.1) -> float:
+        """Poll /health until the model is loaded.
+
+        Returns:
+            Seconds from process start until the server was ready (model-load time)
+
+        Raises:
+            RuntimeError: If the process exits or the timeout expires first
+        """
+        if self.load_time is not None:
+            return self.load_time
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if not self.is_running():
+                raise RuntimeError(f"llama-server on port {self.port} exited with code "
+                                   f"{self.process.returncode if self.process else None}; see {self.log_path}")
+            if self.is_healthy():
+                self.load_time = time.perf_counter() - self.started_at
+                return self.load_time
+            time.sleep(poll_interval)
+        raise RuntimeError(f"llama-server on port {self.port} not ready after {timeout:.0f}s; see {self.log_path}")
+
+    def stop(self, timeout: float = 10.0):
+        """Terminate the process, killing it if it does not exit within `timeout` seconds."""
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+    def restart(self):
+        """Stop and start again; wait_until_ready() measures the new load time."""
+        self.stop()
+        self.restarts += 1
+        return self.start()
+
+
+class LlamaServerManager:
+    """A group of llama-server processes on consecutive ports, with crash recovery.
+
+    Args:
+        model_path: Path to the GGUF model
+        n_servers: Number of servers to run (ports base_port, base_port + 1, ...)
+        base_port: Port of the first server
+        restart_on_crash: Restart servers whose process exits unexpectedly
+        max_restarts: Give up on a server after this many restarts
+        check_interval: Seconds between supervisor checks
+        **server_options: Passed on to LlamaServer (host, threads, ctx_size, parallel,
+            executable, extra_args, log_path)
+    """
+
+    def __init__(self, model_path: str, n_servers: int = 1, base_port: int = 8080,
+                 restart_on_crash: bool = True, max_restarts: int = 3, check_interval: float = 1.0,
+                 **server_options):
+        self.servers = [LlamaServer(model_path, port=base_port + i, **server_options)
+                        for i in range(n_servers)]
+        self.restart_on_crash = restart_on_crash
+        self.max_restarts = max_restarts
+        self.check_interval = check_interval
+        self._stopping = threading.Event()
+        self._supervisor = None
+
+    @property
+    def base_urls(self) -> List[str]:
+        return [server.base_url for server in self.servers]
+
+    def start(self, wait: bool = True, timeout: float = 300.0):
+        """Start all servers (they load their models in parallel) and the supervisor.
+
+        With `wait`, blocks until every server is ready.
+        """
+        self._stopping.clear()
+        for server in self.servers:
+            server.start()
+        if wait:
+            self.wait_until_ready(timeout)
+        if self.restart_on_crash and self._supervisor is None:
+            self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+            self._supervisor.start()
+        return self
+
+    def wait_until_ready(self, timeout: float = 300.0) -> List[float]:
+        """Wait for every server; returns their model-load times in seconds."""
+        return [server.wait_until_ready(timeout) for server in self.servers]
+
+    def _supervise(self):
+        while not self._stopping.wait(self.check_interval):
+            for server in self.servers:
+                if self._stopping.is_set():
+                    return
+                if server.process is not None and not server.is_running() \
+                        and server.restarts < self.max_restarts:
+                    print(f"llama-server on port {server.port} exited with code "
+                          f"{server.process.returncode}; restarting")
+                    server.restart()
+
+    def stop(self):
+        """Stop the supervisor and every server."""
+        self._stopping.set()
+        if self._supervisor is not None:
+            self._supervisor.join()
+            self._supervisor = None
+        for server in self.servers:
+            server.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Start and supervise llama-server instances')
+    parser.add_argument('model_path', type=str, help='Path to the GGUF model')
+    parser.add_argument('--n-servers', type=int, default=1, help='Number of servers (default: 1)')
+    parser.add_argument('--port', type=int, default=8080, help='Port of the first server (default: 8080)')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to bind (default: 127.0.0.1)')
+    parser.add_argument('--threads', type=int, default=None, help='Threads per server, -t (default: llama-server)')
+    parser.add_argument('--ctx-size', type=int, default=None, help='Context size, -c (default: model)')
+    parser.add_argument('--parallel', type=int, default=1, help='Slots per server, -np (default: 1)')
+    parser.add_argument('--executable', type=str, default=DEFAULT_EXECUTABLE,
+                        help=f'Server command (default: {DEFAULT_EXECUTABLE})')
+    parser.add_argument('--timeout', type=float, default=300.0,
+                        help='Seconds to wait for the model to load (default: 300)')
+    parser.add_argument('--no-restart', action='store_true', help='Do not restart servers that crash')
+    parser.add_argument('--server-log', type=str, default=DEFAULT_LOG_PATH,
+                        help='File for each server\'s own output; {port} is replaced by its port '
+                             f'(default: {DEFAULT_LOG_PATH})')
+    args, extra_args = parser.parse_known_args()
+
+    if not os.path.exists(args.model_path) and args.executable == DEFAULT_EXECUTABLE:
+        print(f"Error: Model not found at '{args.model_path}'")
+        return 1
+
+    manager = LlamaServerManager(
+        args.model_path, n_servers=args.n_servers, base_port=args.port,
+        restart_on_crash=not args.no_restart, host=args.host, threads=args.threads,
+        ctx_size=args.ctx_size, parallel=args.parallel, executable=args.executable,
+        extra_args=extra_args, log_path=args.server_log
+    )
+
+    # Shut the servers down on `kill` as well as on Ctrl+C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    try:
+        for server in manager.servers:
+            print(f"Starting: {' '.join(server.command())}")
+            print(f"Server log: {os.path.abspath(server.log_path)}")
+        manager.start(timeout=args.timeout)
+        for server in manager.servers:
+            print(f"BENCHMARK: Model loading took {server.load_time:.4f} seconds ({server.base_url}).")
+        print("llama-server ready", flush=True)
+        while True:
+            time.sleep(1)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop()
+        print("llama-server stopped", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,14 +1,39 @@
 """Lightweight HTTP client for OpenAI-compatible LLM APIs using httpx.
 Supports streaming responses via Server-Sent Events (SSE).
+
+`LLMClient` is synchronous and can spread requests over a pool of servers;
+`AsyncLLMClient` offers the same API on top of `httpx.AsyncClient` so several
+generations can be in flight at once.
+
+Streams are decoded straight from the raw response bytes, and `orjson` is used
+for the per-token JSON when it is installed. `chat.completions.stream_content()`
+skips building chunk objects altogether and yields the content strings only.
+
+`LLMClient(..., api="ollama")` speaks Ollama's native `/api/chat` and
+`/api/generate` NDJSON protocol behind the same interface, so the Ollama
+scripts get connection reuse, streaming and `keep_alive`.
 """
 
 import json
+import time
+import queue
+import asyncio
+import socket
+import threading
 import httpx
-from typing import Iterator, Optional, List, Dict, Any
+from typing import AsyncIterator, Callable, Iterable, Iterator, Optional, List, Dict, Any, Sequence, Union
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 
 class Message:
     """Simple message object to match OpenAI API format."""
+    __slots__ = ("role", "content")
+
     def __init__(self, role: str, content: str):
         self.role = role
         self.content = content
@@ -16,6 +41,8 @@ class Message:
 
 class Delta:
     """Represents a delta in streaming responses."""
+    __slots__ = ("content", "role")
+
     def __init__(self, content: Optional[str] = None, role: Optional[str] = None):
         self.content = content
         self.role = role
@@ -23,6 +50,8 @@ class Delta:
 
 class Choice:
     """Represents a choice in the completion response."""
+    __slots__ = ("delta", "message", "index", "finish_reason")
+
     def __init__(self, delta: Optional[Dict] = None, message: Optional[Message] = None,
                  index: int = 0, finish_reason: Optional[str] = None):
         if delta is not None:
@@ -37,26 +66,81 @@ class Choice:
         self.finish_reason = finish_reason
 
 
+class Usage:
+    """Token counts of a completion (OpenAI `usage` block)."""
+    __slots__ = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+    def __init__(self, prompt_tokens: int = 0, completion_tokens: int = 0, total_tokens: int = 0):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = total_tokens
+
+
+class Timings:
+    """Server-side timings reported by llama-server (`timings` block).
+
+    `prompt_*` covers prompt processing (prefill), `predicted_*` token
+    generation (decode). `cache_n` is the number of prompt tokens reused from
+    the KV cache and therefore not processed again.
+    """
+    __slots__ = ("prompt_n", "prompt_ms", "prompt_per_token_ms", "prompt_per_second",
+                 "predicted_n", "predicted_ms", "predicted_per_token_ms", "predicted_per_second",
+                 "cache_n")
+
+    def __init__(self, prompt_n: int = 0, prompt_ms: float = 0.0, prompt_per_token_ms: float = 0.0,
+                 prompt_per_second: float = 0.0, predicted_n: int = 0, predicted_ms: float = 0.0,
+                 predicted_per_token_ms: float = 0.0, predicted_per_second: float = 0.0,
+                 cache_n: int = 0):
+        self.prompt_n = prompt_n
+        self.prompt_ms = prompt_ms
+        self.prompt_per_token_ms = prompt_per_token_ms
+        self.prompt_per_second = prompt_per_second
+        self.predicted_n = predicted_n
+        self.predicted_ms = predicted_ms
+        self.predicted_per_token_ms = predicted_per_token_ms
+        self.predicted_per_second = predicted_per_second
+        self.cache_n = cache_n
+
+
 class ChatCompletionChunk:
-    """Represents a streaming chunk from chat completion."""
-    def __init__(self, id: str, choices: List[Choice], created: int, model: str):
+    """Represents a streaming chunk from chat completion.
+
+    `usage` and `timings` are only set on the final chunk, and only by servers
+    that report them (llama-server does).
+    """
+    __slots__ = ("id", "choices", "created", "model", "usage", "timings")
+
+    def __init__(self, id: str, choices: List[Choice], created: int, model: str,
+                 usage: Optional[Usage] = None, timings: Optional[Timings] = None):
         self.id = id
         self.choices = choices
         self.created = created
         self.model = model
+        self.usage = usage
+        self.timings = timings
 
 
 class ChatCompletion:
-    """Represents a complete chat completion response."""
-    def __init__(self, id: str, choices: List[Choice], created: int, model: str):
+    """Represents a complete chat completion response.
+
+    `usage` and `timings` are None when the server does not report them.
+    """
+    __slots__ = ("id", "choices", "created", "model", "usage", "timings")
+
+    def __init__(self, id: str, choices: List[Choice], created: int, model: str,
+                 usage: Optional[Usage] = None, timings: Optional[Timings] = None):
         self.id = id
         self.choices = choices
         self.created = created
         self.model = model
+        self.usage = usage
+        self.timings = timings
 
 
 class Model:
     """Represents a model from the models list."""
+    __slots__ = ("id", "owned_by")
+
     def __init__(self, id: str, owned_by: str = ""):
         self.id = id
         self.owned_by = owned_by
@@ -64,36 +148,696 @@ class Model:
 
 class ModelList:
     """Container for list of models."""
+    __slots__ = ("data",)
+
     def __init__(self, data: List[Model]):
         self.data = data
 
 
+def _parse_model_list(data: Dict) -> ModelList:
+    """Build a ModelList from a /models response body."""
+    models = [Model(id=m.get('id', ''), owned_by=m.get('owned_by', ''))
+              for m in data.get('data', [])]
+    return ModelList(data=models)
+
+
+def _parse_usage(data: Dict) -> Optional[Usage]:
+    usage = data.get('usage')
+    if not usage:
+        return None
+    return Usage(
+        prompt_tokens=usage.get('prompt_tokens', 0),
+        completion_tokens=usage.get('completion_tokens', 0),
+        total_tokens=usage.get('total_tokens', 0)
+    )
+
+
+def _parse_timings(data: Dict) -> Optional[Timings]:
+    timings = data.get('timings')
+    if not timings:
+        return None
+    return Timings(
+        prompt_n=timings.get('prompt_n', 0),
+        prompt_ms=timings.get('prompt_ms', 0.0),
+        prompt_per_token_ms=timings.get('prompt_per_token_ms', 0.0),
+        prompt_per_second=timings.get('prompt_per_second', 0.0),
+        predicted_n=timings.get('predicted_n', 0),
+        predicted_ms=timings.get('predicted_ms', 0.0),
+        predicted_per_token_ms=timings.get('predicted_per_token_ms', 0.0),
+        predicted_per_second=timings.get('predicted_per_second', 0.0),
+        cache_n=timings.get('cache_n', 0)
+    )
+
+
+def _parse_completion(data: Dict) -> ChatCompletion:
+    """Build a ChatCompletion from a non-streaming response body."""
+    choices = []
+    for choice_data in data.get('choices', []):
+        msg = choice_data.get('message', {})
+        message = Message(role=msg.get('role', ''), content=msg.get('content', ''))
+        choice = Choice(
+            message=message,
+            index=choice_data.get('index', 0),
+            finish_reason=choice_data.get('finish_reason')
+        )
+        choices.append(choice)
+
+    return ChatCompletion(
+        id=data.get('id', ''),
+        choices=choices,
+        created=data.get('created', 0),
+        model=data.get('model', ''),
+        usage=_parse_usage(data),
+        timings=_parse_timings(data)
+    )
+
+
+def _parse_chunk(data: Dict) -> ChatCompletionChunk:
+    """Build a ChatCompletionChunk from one SSE event payload."""
+    choices = []
+    for choice_data in data.get('choices', []):
+        delta = choice_data.get('delta', {})
+        choice = Choice(
+            delta=delta,
+            index=choice_data.get('index', 0),
+            finish_reason=choice_data.get('finish_reason')
+        )
+        choices.append(choice)
+
+    return ChatCompletionChunk(
+        id=data.get('id', ''),
+        choices=choices,
+        created=data.get('created', 0),
+        model=data.get('model', ''),
+        usage=_parse_usage(data) if 'usage' in data else None,
+        timings=_parse_timings(data) if 'timings' in data else None
+    )
+
+
+def _parse_content(data: Dict) -> Optional[str]:
+    """Extract only the content delta from one SSE event payload."""
+    choices = data.get('choices')
+    if choices:
+        return choices[0].get('delta', {}).get('content')
+    return None
+
+
+def _has_output(item: Any) -> bool:
+    """Whether a streamed item (chunk or content string) carries a token or a finish reason."""
+    if isinstance(item, str):
+        return bool(item)
+    return bool(item.choices and (item.choices[0].delta.content or item.choices[0].finish_reason))
+
+
+def _parse_text_completion(data: Dict) -> ChatCompletion:
+    """Build a ChatCompletion from a /completions (prompt) response; the text goes in message.content."""
+    completion = _parse_completion(data)
+    completion.choices = [
+        Choice(message=Message(role='assistant', content=choice_data.get('text', '')),
+               index=choice_data.get('index', 0), finish_reason=choice_data.get('finish_reason'))
+        for choice_data in data.get('choices', [])
+    ]
+    return completion
+
+
+def _parse_text_chunk(data: Dict) -> ChatCompletionChunk:
+    """Build a ChatCompletionChunk from a streamed /completions event; the text goes in delta.content."""
+    chunk = _parse_chunk(data)
+    chunk.choices = [
+        Choice(delta={'content': choice_data.get('text')}, index=choice_data.get('index', 0),
+               finish_reason=choice_data.get('finish_reason'))
+        for choice_data in data.get('choices', [])
+    ]
+    return chunk
+
+
+def _parse_text_content(data: Dict) -> Optional[str]:
+    choices = data.get('choices')
+    if choices:
+        return choices[0].get('text')
+    return None
+
+
+def _ollama_text(data: Dict) -> str:
+    """Generated text of an Ollama /api/chat or /api/generate object."""
+    message = data.get('message')
+    if message is not None:
+        return message.get('content', '')
+    return data.get('response', '')
+
+
+def _parse_ollama_stats(data: Dict):
+    """Usage and Timings from the final Ollama object (durations are in nanoseconds)."""
+    if not data.get('done'):
+        return None, None
+    prompt_n = data.get('prompt_eval_count', 0)
+    predicted_n = data.get('eval_count', 0)
+    prompt_ms = data.get('prompt_eval_duration', 0) / 1e6
+    predicted_ms = data.get('eval_duration', 0) / 1e6
+    usage = Usage(prompt_tokens=prompt_n, completion_tokens=predicted_n, total_tokens=prompt_n + predicted_n)
+    timings = Timings(
+        prompt_n=prompt_n,
+        prompt_ms=prompt_ms,
+        prompt_per_token_ms=prompt_ms / prompt_n if prompt_n else 0.0,
+        prompt_per_second=prompt_n * 1000 / prompt_ms if prompt_ms else 0.0,
+        predicted_n=predicted_n,
+        predicted_ms=predicted_ms,
+        predicted_per_token_ms=predicted_ms / predicted_n if predicted_n else 0.0,
+        predicted_per_second=predicted_n * 1000 / predicted_ms if predicted_ms else 0.0
+    )
+    return usage, timings
+
+
+def _parse_ollama_completion(data: Dict) -> ChatCompletion:
+    """Build a ChatCompletion from a non-streaming Ollama response."""
+    usage, timings = _parse_ollama_stats(data)
+    return ChatCompletion(
+        id='',
+        choices=[Choice(message=Message(role='assistant', content=_ollama_text(data)),
+                        finish_reason=data.get('done_reason'))],
+        created=0,
+        model=data.get('model', ''),
+        usage=usage,
+        timings=timings
+    )
+
+
+def _parse_ollama_chunk(data: Dict) -> ChatCompletionChunk:
+    """Build a ChatCompletionChunk from one streamed Ollama object."""
+    usage, timings = _parse_ollama_stats(data)
+    role = (data.get('message') or {}).get('role')
+    return ChatCompletionChunk(
+        id='',
+        choices=[Choice(delta={'content': _ollama_text(data) or None, 'role': role},
+                        finish_reason=data.get('done_reason') if data.get('done') else None)],
+        created=0,
+        model=data.get('model', ''),
+        usage=usage,
+        timings=timings
+    )
+
+
+def _parse_ollama_content(data: Dict) -> Optional[str]:
+    return _ollama_text(data) or None
+
+
+def _parse_ollama_models(data: Dict) -> ModelList:
+    """Build a ModelList from an Ollama /api/tags response."""
+    return ModelList(data=[Model(id=m.get('name', '')) for m in data.get('models', [])])
+
+
+class _Route:
+    """Endpoint and parsers for one request type (chat or prompt) of a protocol."""
+    def __init__(self, path: str, body_key: str, parse_completion: Callable, parse_chunk: Callable,
+                 parse_content: Callable):
+        self.path = path
+        self.body_key = body_key
+        self.parse_completion = parse_completion
+        self.parse_chunk = parse_chunk
+        self.parse_content = parse_content
+
+
+class _Protocol:
+    """Wire protocol of a server type: routes, models endpoint and stream framing."""
+    def __init__(self, routes: Dict[str, _Route], models_path: str, parse_models: Callable,
+                 decoder: type, options: Optional[Dict[str, str]] = None):
+        self.routes = routes
+        self.models_path = models_path
+        self.parse_models = parse_models
+        self.decoder = decoder
+        # OpenAI-style parameter -> name inside Ollama's "options"; None sends kwargs as-is
+        self.options = options
+
+    def build_payload(self, route: _Route, model: str, body: Any, stream: bool,
+                      kwargs: Dict, keep_alive: Optional[Union[str, int]]) -> Dict:
+        payload = {"model": model, route.body_key: body, "stream": stream}
+        if self.options is None:
+            payload.update(kwargs)
+            return payload
+        options = dict(kwargs.pop("options", None) or {})
+        for key, value in kwargs.items():
+            if key in self.options:
+                options[self.options[key]] = value
+            else:
+                payload[key] = value
+        if options:
+            payload["options"] = options
+        if keep_alive is not None:
+            payload.setdefault("keep_alive", keep_alive)
+        return payload
+
+
+class _SSEDecoder:
+    """Incremental decoder turning raw response bytes into SSE `data:` payloads.
+
+    Works on bytes so no text decoding or line objects are needed per event;
+    the payloads are handed to the JSON parser as-is.
+    """
+    __slots__ = ("_buffer", "done")
+
+    def __init__(self):
+        self._buffer = b""
+        self.done = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Add received bytes; returns the payloads of all complete events.
+
+        Sets `done` once the "data: [DONE]" end-of-stream marker is seen.
+        """
+        if self._buffer:
+            data = self._buffer + data
+        lines = data.split(b"\n")
+        self._buffer = lines.pop()
+        payloads = []
+        for line in lines:
+            # SSE format: "data: {...}" or "data: [DONE]"
+            if line[:5] == b"data:":
+                payload = line[5:].strip()
+                if payload == b"[DONE]":
+                    self.done = True
+                    break
+                payloads.append(payload)
+        return payloads
+
+
+class _NDJSONDecoder:
+    """Incremental decoder for newline-delimited JSON streams (Ollama).
+
+    The stream simply ends after the object with `"done": true`, so `done` is
+    never set here.
+    """
+    __slots__ = ("_buffer", "done")
+
+    def __init__(self):
+        self._buffer = b""
+        self.done = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Add received bytes; returns all complete, non-empty lines."""
+        if self._buffer:
+            data = self._buffer + data
+        lines = data.split(b"\n")
+        self._buffer = lines.pop()
+        return [line for line in lines if line.strip()]
+
+
+def _iter_events(chunks: Iterable[bytes], parse: Callable[[Dict], Any], decoder) -> Iterator[Any]:
+    """Parse every event of a byte stream with `parse`, skipping None results."""
+    for data in chunks:
+        for payload in decoder.feed(data):
+            try:
+                item = parse(_json_loads(payload))
+            except ValueError:
+                # Skip malformed JSON
+                continue
+            if item is not None:
+                yield item
+        if decoder.done:
+            return
+
+
+_PROTOCOLS = {
+    "openai": _Protocol(
+        routes={
+            "chat": _Route("/chat/completions", "messages", _parse_completion, _parse_chunk, _parse_content),
+            "generate": _Route("/completions", "prompt", _parse_text_completion, _parse_text_chunk,
+                               _parse_text_content),
+        },
+        models_path="/models",
+        parse_models=_parse_model_list,
+        decoder=_SSEDecoder
+    ),
+    "ollama": _Protocol(
+        routes={
+            "chat": _Route("/api/chat", "messages", _parse_ollama_completion, _parse_ollama_chunk,
+                           _parse_ollama_content),
+            "generate": _Route("/api/generate", "prompt", _parse_ollama_completion, _parse_ollama_chunk,
+                               _parse_ollama_content),
+        },
+        models_path="/api/tags",
+        parse_models=_parse_ollama_models,
+        decoder=_NDJSONDecoder,
+        options={"max_tokens": "num_predict", "temperature": "temperature", "top_p": "top_p",
+                 "top_k": "top_k", "seed": "seed", "stop": "stop", "min_p": "min_p",
+                 "presence_penalty": "presence_penalty", "frequency_penalty": "frequency_penalty",
+                 "repeat_penalty": "repeat_penalty", "num_ctx": "num_ctx"}
+    ),
+}
+
+
+class Backend:
+    """One server in a BackendPool, with its routing and health state."""
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+        self.outstanding = 0
+        self.healthy = True
+        self.unhealthy_since = 0.0
+        self.requests = 0
+        self.failures = 0
+
+
+class BackendPool:
+    """Set of interchangeable servers with least-outstanding-requests routing.
+
+    Backends that fail with a connection error are marked unhealthy and skipped
+    for `recheck_interval` seconds, after which they are tried again (or
+    re-enabled earlier by a successful check_health()).
+    """
+    def __init__(self, base_urls: List[str], recheck_interval: float = 5.0):
+        if not base_urls:
+            raise ValueError("At least one base URL is required")
+        self.backends = [Backend(url) for url in base_urls]
+        self.recheck_interval = recheck_interval
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.backends)
+
+    def _available(self, backend: Backend, now: float) -> bool:
+        return backend.healthy or now - backend.unhealthy_since >= self.recheck_interval
+
+    def acquire(self, exclude: Sequence[Backend] = ()) -> Optional[Backend]:
+        """Pick the available backend with the fewest outstanding requests.
+
+        Returns None if every backend is excluded.
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [b for b in self.backends if b not in exclude]
+            if not candidates:
+                return None
+            # Fall back to unhealthy backends rather than failing outright
+            available = [b for b in candidates if self._available(b, now)] or candidates
+            # Ties go to the backend that has served the fewest requests
+            backend = min(available, key=lambda b: (b.outstanding, b.requests))
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def release(self, backend: Backend, ok: bool = True):
+        """Return a backend after a request; a failed request marks it unhealthy."""
+        with self._lock:
+            backend.outstanding -= 1
+            if ok:
+                backend.healthy = True
+            else:
+                backend.failures += 1
+                backend.healthy = False
+                backend.unhealthy_since = time.monotonic()
+
+    def record_hedge(self, won: bool = False):
+        """Count a fired hedge, or a hedge that beat the original request."""
+        with self._lock:
+            if won:
+                self.hedges_won += 1
+            else:
+                self.hedges_fired += 1
+
+    def set_health(self, backend: Backend, healthy: bool):
+        """Set a backend's health, e.g. after an explicit health check."""
+        with self._lock:
+            backend.healthy = healthy
+            if not healthy:
+                backend.unhealthy_since = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-backend request counts and hedging counters."""
+        with self._lock:
+            return {
+                "backends": {b.base_url: {"requests": b.requests, "failures": b.failures,
+                                          "outstanding": b.outstanding, "healthy": b.healthy}
+                             for b in self.backends},
+                "hedges_fired": self.hedges_fired,
+                "hedges_won": self.hedges_won,
+            }
+
+
+class _Cancellation:
+    """Stops a stream that another thread is reading.
+
+    That thread is usually blocked reading the response, so setting a flag alone
+    would leave it (and its server slot) busy until the next chunk. cancel()
+    shuts the socket down instead, which makes the blocked read return at once;
+    the httpx objects themselves are only touched by the reading thread.
+    """
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._socket = None
+        self._callbacks = []
+
+    def attach(self, response: httpx.Response) -> bool:
+        """Remember the response's socket; False if already cancelled."""
+        stream = response.extensions.get("network_stream")
+        with self._lock:
+            self._socket = stream.get_extra_info("socket") if stream is not None else None
+            return not self.cancelled.is_set()
+
+    def detach(self):
+        """Forget the socket before its connection goes back to the pool."""
+        with self._lock:
+            self._socket = None
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Call `callback` on cancel(), or now if already cancelled."""
+        with self._lock:
+            if not self.cancelled.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        """Interrupt the read (and run the on_cancel callbacks)."""
+        with self._lock:
+            self.cancelled.set()
+            if self._socket is not None:
+                try:
+                    self._socket.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class _Flight:
+    """One in-flight generation shared by all identical requests."""
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.cancelled = False
+        self.subscribers = 1
+        self.cancellation = _Cancellation()
+        self.condition = threading.Condition()
+
+
+class RequestCoalescer:
+    """Single-flight coalescing of identical in-flight requests.
+
+    The first request for a key starts the generation in a background thread;
+    every identical request that arrives while it runs subscribes to the same
+    generation. Subscribers get the items produced so far and then the live
+    stream, so each of them sees the complete answer. Streamed chunks are
+    shared between subscribers and must be treated as read-only. A request
+    subscribes when it is first iterated; once every subscriber has stopped
+    reading, the generation is cancelled right away through the _Cancellation
+    passed to `start`, even if it is stalled.
+
+    Only deterministic requests (temperature 0) may be coalesced; the caller
+    decides the key.
+    """
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.generations = 0
+        self.saved_generations = 0
+
+    def stream(self, key: str, start: Callable[[_Cancellation], Iterable[Any]]) -> Iterator[Any]:
+        """Items of the generation for `key`, starting it with `start(cancellation)` if none is running."""
+        return self._subscribe(key, start)
+
+    def call(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Result of `fn()`, shared with identical calls that are in flight."""
+        for item in self.stream(key, lambda _cancellation: [fn()]):
+            return item
+
+    def stats(self) -> Dict[str, int]:
+        """Request, generation and saved-generation counters."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "generations": self.generations,
+                "saved_generations": self.saved_generations,
+                "in_flight": len(self._flights),
+            }
+
+    def _join(self, key: str, start: Callable[[_Cancellation], Iterable[Any]]) -> _Flight:
+        with self._lock:
+            self.requests += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                with flight.condition:
+                    if not flight.cancelled:
+                        flight.subscribers += 1
+                        self.saved_generations += 1
+                        return flight
+            flight = _Flight()
+            self._flights[key] = flight
+            self.generations += 1
+        threading.Thread(target=self._drive, args=(key, flight, start), daemon=True).start()
+        return flight
+
+    def _drive(self, key: str, flight: _Flight, start: Callable[[_Cancellation], Iterable[Any]]):
+        items = None
+        try:
+            items = iter(start(flight.cancellation))
+            for item in items:
+                with flight.condition:
+                    if flight.cancelled:
+                        break
+                    flight.items.append(item)
+                    flight.condition.notify_all()
+        except Exception as e:
+            if not flight.cancelled:
+                flight.error = e
+        finally:
+            # Close the underlying stream (frees the server slot on cancellation)
+            close = getattr(items, 'close', None)
+            if close is not None:
+                close()
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+
+    def _subscribe(self, key: str, start: Callable[[_Cancellation], Iterable[Any]]) -> Iterator[Any]:
+        # Joining here, on the first next(), means a request that is never iterated
+        # never becomes a subscriber that would keep the generation alive
+        flight = self._join(key, start)
+        index = 0
+        try:
+            while True:
+                with flight.condition:
+                    while index >= len(flight.items) and not flight.done:
+                        flight.condition.wait()
+                    batch = flight.items[index:]
+                    if not batch:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                index += len(batch)
+                yield from batch
+        finally:
+            with flight.condition:
+                flight.subscribers -= 1
+                cancel = flight.subscribers == 0 and not flight.done
+                if cancel:
+                    flight.cancelled = True
+            if cancel:
+                flight.cancellation.cancel()
+
+
+# Errors where the request never reached a server, so retrying elsewhere is safe
+_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+# RemoteProtocolError means the server dropped the connection, possibly after it
+# received the request and started generating. A stream that has not yielded
+# anything yet is still retried: the caller has seen no output, so it gets one
+# answer, though the server may have done part of a generation for nothing.
+# A non-stream request is not, since its generation may already have completed.
+_STREAM_RETRYABLE_ERRORS = _CONNECT_ERRORS + (httpx.RemoteProtocolError,)
+
+# Marks the end of a hedged attempt's stream in the shared queue
+_STREAM_END = object()
+
+
+class _HedgeAttempt(_Cancellation):
+    """One attempt of a hedged stream; cancel() also frees its backend slot.
+
+    The backend is released by whichever of cancel() and the attempt's thread
+    comes first.
+    """
+    def __init__(self, pool: BackendPool, backend: Backend):
+        super().__init__()
+        self.pool = pool
+        self.backend = backend
+        self._released = False
+
+    def release(self, ok: bool = True):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self.pool.release(self.backend, ok)
+
+    def cancel(self):
+        super().cancel()
+        self.release()
+
+
 class ModelsAPI:
     """API for model-related operations."""
-    def __init__(self, base_url: str, api_key: str, client: httpx.Client):
-        self.base_url = base_url
+    def __init__(self, pool: BackendPool, api_key: str, client: httpx.Client,
+                 protocol: _Protocol = _PROTOCOLS["openai"]):
+        self.pool = pool
         self.api_key = api_key
         self.client = client
+        self.protocol = protocol
 
     def list(self) -> ModelList:
-        """List available models."""
-        response = self.client.get(
-            f"{self.base_url}/models",
-            headers={"Authorization": f"Bearer {self.api_key}"}
-        )
+        """List available models (from the least busy backend)."""
+        backend = self.pool.acquire()
+        ok = False
+        try:
+            response = self.client.get(
+                f"{backend.base_url}{self.protocol.models_path}",
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+            ok = True
+        finally:
+            self.pool.release(backend, ok)
         response.raise_for_status()
-        data = response.json()
-        models = [Model(id=m.get('id', ''), owned_by=m.get('owned_by', ''))
-                  for m in data.get('data', [])]
-        return ModelList(data=models)
+        return self.protocol.parse_models(_json_loads(response.content))
 
 
 class ChatCompletionsAPI:
-    """API for chat completion operations."""
-    def __init__(self, base_url: str, api_key: str, client: httpx.Client):
-        self.base_url = base_url
+    """API for chat completion operations.
+
+    Requests are routed to the least busy backend of the pool. Connection
+    errors are retried on another backend with exponential backoff; so is a
+    stream dropped by the server before its first chunk. With
+    `hedge_after` set, a streaming request that has produced no token after
+    that many seconds is duplicated on a second backend and the first stream
+    to produce a token wins.
+
+    With the Ollama protocol, OpenAI-style parameters such as `temperature` and
+    `max_tokens` are moved into Ollama's `options` (`max_tokens` becomes
+    `num_predict`) and `keep_alive` is sent with every request.
+
+    With a `coalescer`, identical requests at temperature 0 that are in flight
+    at the same time share one generation.
+    """
+    route_name = "chat"
+
+    def __init__(self, pool: BackendPool, api_key: str, client: httpx.Client,
+                 protocol: _Protocol = _PROTOCOLS["openai"], keep_alive: Optional[Union[str, int]] = None,
+                 max_retries: int = 2, retry_backoff: float = 0.1,
+                 hedge_after: Optional[float] = None, coalescer: Optional[RequestCoalescer] = None):
+        self.pool = pool
         self.api_key = api_key
         self.client = client
+        self.protocol = protocol
+        self.route = protocol.routes[self.route_name]
+        self.keep_alive = keep_alive
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.hedge_after = hedge_after
+        self.coalescer = coalescer
 
     def create(self, model: str, messages: List[Dict[str, str]],
                stream: bool = False, **kwargs) -> Any:
@@ -105,109 +849,285 @@ class ChatCompletionsAPI:
             stream: If True, returns an iterator of chunks; if False, returns complete response
             **kwargs: Additional parameters to pass to the API
         """
-        payload = {
-            "model": model,
-            "messages": messages,
-            "stream": stream,
-            **kwargs
-        }
+        payload = self.protocol.build_payload(self.route, model, messages, stream, kwargs, self.keep_alive)
+        if stream:
+            return self._stream(payload, self.route.parse_chunk)
+        key = self._coalesce_key(payload, "completion")
+        if key is not None:
+            return self.coalescer.call(key, lambda: self._create_non_stream(payload, self._headers()))
+        return self._create_non_stream(payload, self._headers())
+
+    def stream_content(self, model: str, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """Stream a chat completion as plain content strings.
+
+        Cheaper per token than create(stream=True): no chunk objects are built,
+        and events without content (role, finish reason) are dropped.
+
+        Args:
+            model: Model identifier
+            messages: List of message dicts with 'role' and 'content'
+            **kwargs: Additional parameters to pass to the API
+        """
+        payload = self.protocol.build_payload(self.route, model, messages, True, kwargs, self.keep_alive)
+        return self._stream(payload, self.route.parse_content)
 
-        headers = {
+    def _headers(self) -> Dict[str, str]:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
 
-        if stream:
-            return self._create_stream(payload, headers)
-        else:
-            return self._create_non_stream(payload, headers)
+    def _coalesce_key(self, payload: Dict, kind: str) -> Optional[str]:
+        """Key identifying identical requests, or None if the request must not be shared."""
+        if self.coalescer is None:
+            return None
+        temperature = payload.get("temperature", (payload.get("options") or {}).get("temperature"))
+        if temperature != 0:
+            # Sampled answers differ per request, so they cannot be shared
+            return None
+        return f"{self.route.path} {kind} {json.dumps(payload, sort_keys=True)}"
 
-    def _create_non_stream(self, payload: Dict, headers: Dict) -> ChatCompletion:
-        """Create a non-streaming chat completion."""
-        response = self.client.post(
-            f"{self.base_url}/chat/completions",
-            json=payload,
-            headers=headers,
-            timeout=60.0
-        )
-        response.raise_for_status()
-        data = response.json()
-
-        choices = []
-        for choice_data in data.get('choices', []):
-            msg = choice_data.get('message', {})
-            message = Message(role=msg.get('role', ''), content=msg.get('content', ''))
-            choice = Choice(
-                message=message,
-                index=choice_data.get('index', 0),
-                finish_reason=choice_data.get('finish_reason')
-            )
-            choices.append(choice)
+    def _stream(self, payload: Dict, parse: Callable[[Dict], Any]) -> Iterator[Any]:
+        key = self._coalesce_key(payload, parse.__name__)
+        if key is not None:
+            return self.coalescer.stream(key, lambda cancellation: self._stream_uncoalesced(payload, parse,
+                                                                                            cancellation))
+        return self._stream_uncoalesced(payload, parse)
 
-        return ChatCompletion(
-            id=data.get('id', ''),
-            choices=choices,
-            created=data.get('created', 0),
-            model=data.get('model', '')
-        )
+    def _stream_uncoalesced(self, payload: Dict, parse: Callable[[Dict], Any],
+                            cancellation: Optional[_Cancellation] = None) -> Iterator[Any]:
+        if self.hedge_after is not None and len(self.pool) > 1:
+            return self._create_hedged_stream(payload, self._headers(), parse, cancellation)
+        return self._create_stream(payload, self._headers(), parse, cancellation)
 
-    def _create_stream(self, payload: Dict, headers: Dict) -> Iterator[ChatCompletionChunk]:
-        """Create a streaming chat completion.
+    def _backoff(self, attempt: int):
+        time.sleep(self.retry_backoff * (2 ** attempt))
 
-        Yields ChatCompletionChunk objects as they arrive via SSE.
-        """
+    def _create_non_stream(self, payload: Dict, headers: Dict) -> ChatCompletion:
+        """Create a non-streaming chat completion."""
+        tried = []
+        for attempt in range(self.max_retries + 1):
+            backend = self.pool.acquire(exclude=tried) or self.pool.acquire()
+            tried.append(backend)
+            transport_failed = False
+            try:
+                response = self.client.post(
+                    f"{backend.base_url}{self.route.path}",
+                    json=payload,
+                    headers=headers,
+                    timeout=60.0
+                )
+            except httpx.TransportError as e:
+                transport_failed = True
+                if not isinstance(e, _CONNECT_ERRORS) or attempt == self.max_retries:
+                    raise
+            finally:
+                self.pool.release(backend, ok=not transport_failed)
+            if transport_failed:
+                self._backoff(attempt)
+                continue
+            response.raise_for_status()
+            return self.route.parse_completion(_json_loads(response.content))
+
+    def _stream_from(self, backend: Backend, payload: Dict, headers: Dict,
+                     parse: Callable[[Dict], Any] = _parse_chunk,
+                     cancellation: Optional[_Cancellation] = None) -> Iterator[Any]:
+        """Stream a chat completion from one backend (no retries)."""
         with self.client.stream(
             'POST',
-            f"{self.base_url}/chat/completions",
+            f"{backend.base_url}{self.route.path}",
             json=payload,
             headers=headers,
             timeout=None  # No timeout for streaming
         ) as response:
-            response.raise_for_status()
+            if cancellation is None:
+                response.raise_for_status()
+                yield from _iter_events(response.iter_bytes(), parse, self.protocol.decoder())
+                return
+            # Lets another thread interrupt the stream (losing hedge, abandoned coalesced flight)
+            if not cancellation.attach(response):
+                return
+            try:
+                response.raise_for_status()
+                yield from _iter_events(response.iter_bytes(), parse, self.protocol.decoder())
+            finally:
+                cancellation.detach()
+
+    def _create_stream(self, payload: Dict, headers: Dict,
+                       parse: Callable[[Dict], Any] = _parse_chunk,
+                       cancellation: Optional[_Cancellation] = None) -> Iterator[Any]:
+        """Create a streaming chat completion.
+
+        Yields the parsed SSE events (ChatCompletionChunk objects by default) as
+        they arrive. Connection errors are retried on another backend as long as
+        nothing was yielded yet, unless `cancellation` interrupted the stream.
+        """
+        tried = []
+        for attempt in range(self.max_retries + 1):
+            backend = self.pool.acquire(exclude=tried) or self.pool.acquire()
+            tried.append(backend)
+            started = False
+            connection_failed = False
+            try:
+                events = self._stream_from(backend, payload, headers, parse, cancellation)
+                for chunk in events:
+                    started = True
+                    yield chunk
+                    # Past the first chunk there are no retries; hand over the rest directly
+                    yield from events
+                return
+            except _STREAM_RETRYABLE_ERRORS:
+                if cancellation is not None and cancellation.cancelled.is_set():
+                    raise
+                connection_failed = not started
+                if started or attempt == self.max_retries:
+                    raise
+            finally:
+                self.pool.release(backend, ok=not connection_failed)
+            self._backoff(attempt)
+
+    def _create_hedged_stream(self, payload: Dict, headers: Dict,
+                              parse: Callable[[Dict], Any] = _parse_chunk,
+                              cancellation: Optional[_Cancellation] = None) -> Iterator[Any]:
+        """Streaming completion with a hedged duplicate on a second backend.
+
+        Each attempt runs in its own thread and feeds a shared queue. Chunks are
+        buffered per attempt until one of them produces a token (or finishes);
+        that attempt wins and the other is cancelled (see _HedgeAttempt).
+        Cancelling `cancellation` cancels every attempt.
+        """
+        events = queue.Queue()
+        attempts: List[_HedgeAttempt] = []
+
+        def run_attempt(attempt_id: int, attempt: _HedgeAttempt):
+            connection_failed = False
+            try:
+                for chunk in self._stream_from(attempt.backend, payload, headers, parse, attempt):
+                    if attempt.cancelled.is_set():
+                        break
+                    events.put((attempt_id, chunk))
+                events.put((attempt_id, _STREAM_END))
+            except Exception as e:
+                connection_failed = isinstance(e, _STREAM_RETRYABLE_ERRORS) and not attempt.cancelled.is_set()
+                events.put((attempt_id, e))
+            finally:
+                attempt.release(ok=not connection_failed)
+
+        def start_attempt() -> bool:
+            if cancellation is not None and cancellation.cancelled.is_set():
+                return False
+            backend = self.pool.acquire(exclude=[a.backend for a in attempts])
+            if backend is None:
+                return False
+            attempts.append(_HedgeAttempt(self.pool, backend))
+            if cancellation is not None:
+                cancellation.on_cancel(attempts[-1].cancel)
+            threading.Thread(target=run_attempt, args=(len(attempts) - 1, attempts[-1]), daemon=True).start()
+            return True
 
-            for line in response.iter_lines():
-                line = line.strip()
+        if not start_attempt():
+            # Cancelled before it started
+            return
+        buffers: Dict[int, List[Any]] = {0: []}
+        finished = set()
+        winner = None
+        hedged = False
+        deadline = time.monotonic() + self.hedge_after
+        # Cleared when no hedge can be started; then the primary is simply waited for
+        hedge_possible = True
 
-                # SSE format: "data: {...}" or "data: [DONE]"
-                if not line or not line.startswith('data: '):
+        try:
+            while winner is None:
+                timeout = None
+                if len(attempts) == 1 and hedge_possible:
+                    timeout = max(deadline - time.monotonic(), 0.0)
+                try:
+                    attempt_id, item = events.get(timeout=timeout)
+                except queue.Empty:
+                    # No token within the deadline: fire the hedge
+                    if start_attempt():
+                        self.pool.record_hedge()
+                        hedged = True
+                        buffers[len(attempts) - 1] = []
+                    else:
+                        hedge_possible = False
                     continue
 
-                data_str = line[6:]  # Remove "data: " prefix
+                if isinstance(item, Exception):
+                    finished.add(attempt_id)
+                    if len(finished) == len(attempts):
+                        if len(attempts) == 1 and start_attempt():
+                            # Primary failed before the deadline: fail over right away
+                            buffers[len(attempts) - 1] = []
+                            continue
+                        raise item
+                    continue
 
-                # Check for end of stream
-                if data_str == '[DONE]':
+                if item is _STREAM_END:
+                    finished.add(attempt_id)
+                    winner = attempt_id
                     break
 
-                try:
-                    data = json.loads(data_str)
-
-                    choices = []
-                    for choice_data in data.get('choices', []):
-                        delta = choice_data.get('delta', {})
-                        choice = Choice(
-                            delta=delta,
-                            index=choice_data.get('index', 0),
-                            finish_reason=choice_data.get('finish_reason')
-                        )
-                        choices.append(choice)
-
-                    chunk = ChatCompletionChunk(
-                        id=data.get('id', ''),
-                        choices=choices,
-                        created=data.get('created', 0),
-                        model=data.get('model', '')
-                    )
-                    yield chunk
+                buffers[attempt_id].append(item)
+                if _has_output(item):
+                    winner = attempt_id
+
+            if hedged and winner > 0:
+                self.pool.record_hedge(won=True)
 
-                except json.JSONDecodeError:
-                    # Skip malformed JSON
+            # Cancel the losing attempts so their server slots are freed now
+            for attempt_id, attempt in enumerate(attempts):
+                if attempt_id != winner:
+                    attempt.cancel()
+
+            for chunk in buffers[winner]:
+                yield chunk
+            if winner in finished:
+                return
+
+            while True:
+                attempt_id, item = events.get()
+                if attempt_id != winner:
                     continue
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Also stops the winner if the caller stopped reading early
+            for attempt in attempts:
+                attempt.cancel()
+
+
+class CompletionsAPI(ChatCompletionsAPI):
+    """API for prompt completions (OpenAI /completions, Ollama /api/generate).
+
+    Same as ChatCompletionsAPI but takes a raw prompt; the generated text is
+    returned in `choices[0].message.content` (or `delta.content` when streaming).
+    """
+    route_name = "generate"
+
+    def create(self, model: str, prompt: str, stream: bool = False, **kwargs) -> Any:
+        """Create a completion for a prompt.
+
+        Args:
+            model: Model identifier
+            prompt: Prompt text
+            stream: If True, returns an iterator of chunks; if False, returns complete response
+            **kwargs: Additional parameters to pass to the API
+        """
+        return super().create(model, prompt, stream=stream, **kwargs)
+
+    def stream_content(self, model: str, prompt: str, **kwargs) -> Iterator[str]:
+        """Stream a completion for a prompt as plain content strings."""
+        return super().stream_content(model, prompt, **kwargs)
 
 
 class ChatAPI:
     """API for chat-related operations."""
-    def __init__(self, base_url: str, api_key: str, client: httpx.Client):
-        self.completions = ChatCompletionsAPI(base_url, api_key, client)
+    def __init__(self, pool: BackendPool, api_key: str, client: httpx.Client, **options):
+        self.completions = ChatCompletionsAPI(pool, api_key, client, **options)
 
 
 class LLMClient:
@@ -244,24 +1164,84 @@ class LLMClient:
         # Or use as context manager (recommended)
         with LLMClient(base_url="http://localhost:8080/v1") as client:
             response = client.chat.completions.create(...)
+
+        # Pool of servers: least-outstanding routing, retries, hedged streams
+        with LLMClient(base_url=["http://pi1:8080/v1", "http://pi2:8080/v1"],
+                       hedge_after=0.5) as client:
+            print(client.check_health())
+            for chunk in client.chat.completions.create(..., stream=True):
+                ...
+
+        # Ollama's native API; the model stays loaded for 30 minutes
+        with LLMClient(base_url="http://localhost:11434", api="ollama", keep_alive="30m") as client:
+            for text in client.completions.stream_content(model="gemma3:1b", prompt="Hello"):
+                print(text, end='')
     """
 
-    def __init__(self, base_url: str, api_key: str = "dummy"):
+    def __init__(self, base_url: Union[str, Sequence[str]], api_key: str = "dummy",
+                 max_retries: int = 2, retry_backoff: float = 0.1,
+                 hedge_after: Optional[float] = None,
+                 transport: Optional[httpx.BaseTransport] = None,
+                 api: str = "openai", keep_alive: Optional[Union[str, int]] = None,
+                 coalesce: bool = False):
         """Initialize the client.
 
         Args:
-            base_url: Base URL of the API (e.g., "http://localhost:8080/v1")
+            base_url: Base URL of the API (e.g., "http://localhost:8080/v1"), or a list
+                of base URLs of interchangeable servers
             api_key: API key (can be dummy for local servers)
+            max_retries: Retries on another backend after a connection error
+            retry_backoff: Seconds before the first retry; doubles on every retry
+            hedge_after: If set (and several base URLs are given), duplicate a streaming
+                request on a second backend when no token arrived after this many seconds
+            transport: Optional httpx transport, e.g. httpx.MockTransport to replay
+                recorded responses
+            api: "openai" for OpenAI-compatible servers (llama-server), or "ollama" for
+                Ollama's native API (base_url is then the server root, e.g. "http://localhost:11434")
+            keep_alive: Ollama only: how long the model stays loaded after a request
+                (e.g. "30m", or -1 for forever)
+            coalesce: Share one generation between identical in-flight requests at
+                temperature 0 (see RequestCoalescer); counters are in `coalescer.stats()`
         """
-        self.base_url = base_url.rstrip('/')
+        if api not in _PROTOCOLS:
+            raise ValueError(f"Unknown api '{api}'. Available: {list(_PROTOCOLS)}")
+        self.protocol = _PROTOCOLS[api]
+        base_urls = [base_url] if isinstance(base_url, str) else list(base_url)
+        self.pool = BackendPool(base_urls)
+        self.base_url = self.pool.backends[0].base_url
         self.api_key = api_key
 
         # Create a persistent HTTP client for connection reuse
-        self.http_client = httpx.Client(timeout=60.0)
+        self.http_client = httpx.Client(timeout=60.0, transport=transport)
 
         # Initialize API endpoints
-        self.models = ModelsAPI(self.base_url, self.api_key, self.http_client)
-        self.chat = ChatAPI(self.base_url, self.api_key, self.http_client)
+        self.coalescer = RequestCoalescer() if coalesce else None
+        options = dict(protocol=self.protocol, keep_alive=keep_alive, max_retries=max_retries,
+                       retry_backoff=retry_backoff, hedge_after=hedge_after, coalescer=self.coalescer)
+        self.models = ModelsAPI(self.pool, self.api_key, self.http_client, self.protocol)
+        self.chat = ChatAPI(self.pool, self.api_key, self.http_client, **options)
+        self.completions = CompletionsAPI(self.pool, self.api_key, self.http_client, **options)
+
+    def check_health(self, timeout: float = 2.0) -> Dict[str, bool]:
+        """Probe every backend's models endpoint and update its health state.
+
+        Returns:
+            Dict mapping base URL to whether the backend answered successfully
+        """
+        health = {}
+        for backend in self.pool.backends:
+            try:
+                response = self.http_client.get(
+                    f"{backend.base_url}{self.protocol.models_path}",
+                    headers={"Authorization": f"Bearer {self.api_key}"},
+                    timeout=timeout
+                )
+                healthy = response.status_code == 200
+            except httpx.HTTPError:
+                healthy = False
+            self.pool.set_health(backend, healthy)
+            health[backend.base_url] = healthy
+        return health
 
     def close(self):
         """Explicitly close the HTTP client and clean up resources."""
@@ -280,3 +1260,189 @@ class LLMClient:
     def __del__(self):
         """Clean up HTTP client on deletion (fallback)."""
         self.close()
+
+
+class AsyncModelsAPI:
+    """Async API for model-related operations."""
+    def __init__(self, base_url: str, api_key: str, client: httpx.AsyncClient):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.client = client
+
+    async def list(self) -> ModelList:
+        """List available models."""
+        response = await self.client.get(
+            f"{self.base_url}/models",
+            headers={"Authorization": f"Bearer {self.api_key}"}
+        )
+        response.raise_for_status()
+        return _parse_model_list(_json_loads(response.content))
+
+
+class AsyncChatCompletionsAPI:
+    """Async API for chat completion operations.
+
+    Every generation holds the client's concurrency limiter while it runs, so
+    at most `max_concurrency` requests reach the server at once; the others
+    wait on the client instead of queueing inside llama-server.
+    """
+    def __init__(self, base_url: str, api_key: str, client: httpx.AsyncClient,
+                 limiter: asyncio.Semaphore):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.client = client
+        self.limiter = limiter
+
+    async def create(self, model: str, messages: List[Dict[str, str]],
+                     stream: bool = False, **kwargs) -> Any:
+        """Create a chat completion.
+
+        Args:
+            model: Model identifier
+            messages: List of message dicts with 'role' and 'content'
+            stream: If True, returns an async iterator of chunks; if False, returns complete response
+            **kwargs: Additional parameters to pass to the API
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": stream,
+            **kwargs
+        }
+
+        if stream:
+            return self._create_stream(payload, self._headers())
+        else:
+            return await self._create_non_stream(payload, self._headers())
+
+    def stream_content(self, model: str, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """Stream a chat completion as plain content strings (see ChatCompletionsAPI.stream_content)."""
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            **kwargs
+        }
+        return self._create_stream(payload, self._headers(), _parse_content)
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    async def _create_non_stream(self, payload: Dict, headers: Dict) -> ChatCompletion:
+        """Create a non-streaming chat completion."""
+        async with self.limiter:
+            response = await self.client.post(
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                headers=headers,
+                timeout=60.0
+            )
+        response.raise_for_status()
+        return _parse_completion(_json_loads(response.content))
+
+    async def _create_stream(self, payload: Dict, headers: Dict,
+                             parse: Callable[[Dict], Any] = _parse_chunk) -> AsyncIterator[Any]:
+        """Create a streaming chat completion.
+
+        Yields the parsed SSE events (ChatCompletionChunk objects by default) as
+        they arrive. The limiter slot is held until the stream is exhausted or closed.
+        """
+        async with self.limiter:
+            async with self.client.stream(
+                'POST',
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                headers=headers,
+                timeout=None  # No timeout for streaming
+            ) as response:
+                response.raise_for_status()
+
+                decoder = _SSEDecoder()
+                async for data in response.aiter_bytes():
+                    for payload_bytes in decoder.feed(data):
+                        try:
+                            item = parse(_json_loads(payload_bytes))
+                        except ValueError:
+                            # Skip malformed JSON
+                            continue
+                        if item is not None:
+                            yield item
+                    if decoder.done:
+                        break
+
+
+class AsyncChatAPI:
+    """Async API for chat-related operations."""
+    def __init__(self, base_url: str, api_key: str, client: httpx.AsyncClient,
+                 limiter: asyncio.Semaphore):
+        self.completions = AsyncChatCompletionsAPI(base_url, api_key, client, limiter)
+
+
+class AsyncLLMClient:
+    """Async counterpart of LLMClient built on httpx.AsyncClient.
+
+    All requests share one connection pool. A semaphore limits the number of
+    concurrent generations; size it to llama-server's `-np` parallel slots.
+
+    Example:
+        async with AsyncLLMClient(base_url="http://localhost:8080/v1", max_concurrency=2) as client:
+            # Non-streaming
+            response = await client.chat.completions.create(
+                model="mymodel",
+                messages=[{"role": "user", "content": "Hello"}]
+            )
+
+            # Streaming
+            stream = await client.chat.completions.create(
+                model="mymodel",
+                messages=[{"role": "user", "content": "Hello"}],
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    print(chunk.choices[0].delta.content, end='')
+
+            # Several generations in flight at once
+            results = await asyncio.gather(*(
+                client.chat.completions.create(model="mymodel", messages=m) for m in batch
+            ))
+    """
+
+    def __init__(self, base_url: str, api_key: str = "dummy", max_concurrency: int = 1):
+        """Initialize the client.
+
+        Args:
+            base_url: Base URL of the API (e.g., "http://localhost:8080/v1")
+            api_key: API key (can be dummy for local servers)
+            max_concurrency: Maximum generations in flight; match llama-server's `-np`
+        """
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+
+        # One pooled async HTTP client; keep a warm connection per slot
+        self.http_client = httpx.AsyncClient(
+            timeout=60.0,
+            limits=httpx.Limits(max_keepalive_connections=max_concurrency)
+        )
+        self.limiter = asyncio.Semaphore(max_concurrency)
+
+        # Initialize API endpoints
+        self.models = AsyncModelsAPI(self.base_url, self.api_key, self.http_client)
+        self.chat = AsyncChatAPI(self.base_url, self.api_key, self.http_client, self.limiter)
+
+    async def aclose(self):
+        """Close the HTTP client and its connection pool."""
+        await self.http_client.aclose()
+
+    async def __aenter__(self):
+        """Async context manager entry."""
+        return self
+
+    async def __aexit__(self, _exc_type, _exc_val, _exc_tb):
+        """Async context manager exit - ensures cleanup."""
+        await self.aclose()
+        return False
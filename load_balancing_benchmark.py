@@ -0,0 +1,129 @@
+"""Tail latency of LLMClient with one backend, a backend pool, and hedged streams.
+
+Two local stub servers (stub_llm_server.py) stand in for llama-server
+instances; a fraction of their requests stall before the first token, like a
+server that is busy with another prompt. The same sequential workload is run
+against a single backend, the pool without hedging, and the pool with hedged
+streams, and p50/p90/p99 latencies are compared. Pass --base-url more than once
+to run against real llama-server instances instead.
+
+With the stub servers, a backend that drops every connection is also checked:
+failed requests must give its slot back (outstanding returns to 0), or
+least-outstanding routing would avoid it for good.
+
+Example:
+    python load_balancing_benchmark.py --n-requests 50 --stall-rate 0.1 --hedge-after 0.2
+"""
+
+import time
+import argparse
+import httpx
+import numpy as np
+from llm_client import LLMClient
+from stub_llm_server import StubServer
+
+
+def run_workload(client, model, n_requests, max_tokens):
+    """Stream n_requests completions one after another; returns their latencies."""
+    latencies = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        stream = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": "Count to fifty."}],
+            temperature=0.0,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        for _ in stream:
+            pass
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def check_dropped_connections(model, max_tokens):
+    """Send requests to a stub that drops every connection; returns the backend's outstanding count."""
+    with StubServer(token_delay=0.001, n_tokens=max_tokens, fault="disconnect", fault_after=1) as stub:
+        with LLMClient(base_url=stub.base_url, max_retries=0) as client:
+            for stream in (False, True, False, True):
+                try:
+                    response = client.chat.completions.create(
+                        model=model,
+                        messages=[{"role": "user", "content": "Count to fifty."}],
+                        max_tokens=max_tokens,
+                        stream=stream
+                    )
+                    if stream:
+                        for _ in response:
+                            pass
+                except httpx.HTTPError:
+                    pass
+            return client.pool.stats()["backends"][stub.base_url]["outstanding"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare latency percentiles with and without hedged requests')
+    parser.add_argument('--base-url', type=str, action='append', default=None,
+                        help='Backend to use; repeat for several (default: start two local stub servers)')
+    parser.add_argument('--model', type=str, default='dummy', help='Model name to send (default: dummy)')
+    parser.add_argument('--n-requests', type=int, default=50, help='Requests per configuration (default: 50)')
+    parser.add_argument('--max-tokens', type=int, default=20, help='Tokens per request (default: 20)')
+    parser.add_argument('--hedge-after', type=float, default=0.2,
+                        help='Seconds without a first token before hedging (default: 0.2)')
+    parser.add_argument('--stall-rate', type=float, default=0.1,
+                        help='Stub server fraction of stalled requests (default: 0.1)')
+    parser.add_argument('--stall-delay', type=float, default=1.0,
+                        help='Stub server stall length in seconds (default: 1.0)')
+    args = parser.parse_args()
+
+    stubs = []
+    base_urls = args.base_url
+    if not base_urls:
+        stubs = [
+            StubServer(token_delay=0.005, n_tokens=args.max_tokens, slots=4, ttft=0.02,
+                       stall_rate=args.stall_rate, stall_delay=args.stall_delay, seed=seed).start()
+            for seed in (1, 2)
+        ]
+        base_urls = [stub.base_url for stub in stubs]
+        print(f"Started {len(stubs)} stub servers ({args.stall_rate:.0%} of requests stall "
+              f"for {args.stall_delay:.1f}s)")
+
+    configurations = [
+        ("single backend", base_urls[0], None),
+        ("pool", base_urls, None),
+        (f"pool + hedge@{args.hedge_after:.2f}s", base_urls, args.hedge_after),
+    ]
+
+    results = []
+    try:
+        for name, urls, hedge_after in configurations:
+            with LLMClient(base_url=urls, hedge_after=hedge_after) as client:
+                # One request first so connection setup is not part of the measurement
+                run_workload(client, args.model, 1, 1)
+                latencies = run_workload(client, args.model, args.n_requests, args.max_tokens)
+                results.append((name, latencies, client.pool.stats()))
+    finally:
+        for stub in stubs:
+            stub.stop()
+
+    print("\n--- Streaming latency ---")
+    print(f"{'Configuration':>22} | {'p50 (s)':>8} | {'p90 (s)':>8} | {'p99 (s)':>8} | {'Max (s)':>8}")
+    for name, latencies, _ in results:
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        print(f"{name:>22} | {p50:>8.4f} | {p90:>8.4f} | {p99:>8.4f} | {max(latencies):>8.4f}")
+
+    print("\n--- Pool stats ---")
+    for name, _, stats in results:
+        print(f"{name}: {stats}")
+
+    if stubs:
+        outstanding = check_dropped_connections(args.model, args.max_tokens)
+        if outstanding:
+            print(f"Error: {outstanding} request(s) still outstanding on a backend after dropped connections")
+            return 1
+        print("BENCHMARK: Dropped connections released their backend (outstanding back to 0)")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,224 @@
+"""Concurrent multi-user load on the full RAG pipeline.
+
+Simulated users send queries from a query set through encode -> search ->
+prompt -> streamed generation (benchmark_harness.run_query) at the same time,
+sharing one retriever and one pooled LLMClient, as a voice-assistant server
+would. The number of users is stepped up (--users 1,2,4,8) and for every level
+throughput, errors and per-stage latency percentiles are reported, followed by
+the saturation point: the level after which adding users no longer raises
+throughput, and the largest level that still meets an optional TTFT target.
+
+Arrival models:
+    closed  every user sends a query, waits for the answer, thinks for an
+            exponentially distributed time (mean --think-time), and repeats
+    open    every user sends queries at Poisson arrival times (mean gap
+            --think-time) whether or not earlier answers have arrived, so
+            requests queue up once the backend is saturated
+
+Runs against llama-server (--base-url) or a local stub server (--stub).
+
+Example:
+    python load_generator.py --stub --stub-slots 2 --users 1,2,4,8 --duration 20
+    python load_generator.py --users 1,2,3,4 --arrival open --think-time 10 --ttft-target 1.5
+"""
+
+import time
+import json
+import random
+import argparse
+import threading
+from llm_client import LLMClient
+from stub_llm_server import StubServer
+from benchmark_harness import add_pipeline_arguments, load_queries, run_query, summarize, environment_info
+from rag_benchmark import load_index
+from retrieval import needs_embedding_model
+
+
+REPORTED_STAGES = ("encode", "search", "ttft", "generation", "total")
+
+
+def run_level(retriever, client, queries, n_users, args):
+    """Drive n_users simulated users for args.duration seconds.
+
+    Returns:
+        Tuple of (samples, n_errors, elapsed seconds); every sample is run_query()'s
+        dict plus "user" and "started" (seconds since the level started)
+    """
+    samples = []
+    errors = [0]
+    lock = threading.Lock()
+    level_start = time.perf_counter()
+    deadline = level_start + args.duration
+
+    def request(user, query):
+        started = time.perf_counter() - level_start
+        try:
+            sample = run_query(retriever, client, query, args)
+        except Exception as e:
+            with lock:
+                errors[0] += 1
+            if args.verbose:
+                print(f"User {user}: {type(e).__name__}: {e}")
+            return
+        sample.update(user=user, started=started)
+        with lock:
+            samples.append(sample)
+
+    def user_loop(user):
+        rng = random.Random(args.seed * 1000 + user)
+        position = rng.randrange(len(queries))
+        # Spread the first requests instead of starting every user at the same instant
+        time.sleep(rng.uniform(0, args.think_time) if args.think_time else 0)
+        in_flight = []
+        while time.perf_counter() < deadline:
+            query = queries[position % len(queries)]
+            position += 1
+            if args.arrival == "closed":
+                request(user, query)
+            else:
+                thread = threading.Thread(target=request, args=(user, query))
+                thread.start()
+                in_flight.append(thread)
+            if args.think_time:
+                time.sleep(min(rng.expovariate(1 / args.think_time), max(deadline - time.perf_counter(), 0)))
+        for thread in in_flight:
+            thread.join()
+
+    users = [threading.Thread(target=user_loop, args=(user,)) for user in range(n_users)]
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    return samples, errors[0], time.perf_counter() - level_start
+
+
+def find_saturation(levels, min_gain, ttft_target):
+    """Saturation point of a list of level results (ascending user counts).
+
+    Returns:
+        Tuple of (saturated_at, max_users_within_target): the user count after which
+        the next level raises throughput by less than min_gain (None if throughput
+        kept growing), and the largest user count whose p90 TTFT meets ttft_target
+        (None without a target or if no level meets it)
+    """
+    saturated_at = None
+    for previous, level in zip(levels, levels[1:]):
+        if level["throughput"] < previous["throughput"] * (1 + min_gain):
+            saturated_at = previous["users"]
+            break
+
+    max_users = None
+    if ttft_target is not None:
+        for level in levels:
+            ttft = level["summary"].get("ttft")
+            if ttft and ttft["n"] and ttft["p90"] <= ttft_target:
+                max_users = level["users"]
+    return saturated_at, max_users
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent multi-user load on the RAG pipeline')
+    add_pipeline_arguments(parser)
+    parser.add_argument('--users', type=str, default='1,2,4,8',
+                        help='Comma-separated numbers of concurrent users to step through (default: 1,2,4,8)')
+    parser.add_argument('--arrival', type=str, default='closed', choices=['closed', 'open'],
+                        help='closed: wait for the answer before thinking; open: Poisson arrivals (default: closed)')
+    parser.add_argument('--think-time', type=float, default=2.0,
+                        help='Mean seconds between a user\'s queries (default: 2.0)')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds per concurrency level (default: 30)')
+    parser.add_argument('--warmup', type=int, default=1,
+                        help='Queries run once before the first level, not recorded (default: 1)')
+    parser.add_argument('--saturation-gain', type=float, default=0.1,
+                        help='Throughput gain below which a level counts as saturated (default: 0.1 = 10%%)')
+    parser.add_argument('--ttft-target', type=float, default=None,
+                        help='p90 time-to-first-token target in seconds for the maximum user count')
+    parser.add_argument('--stub', action='store_true', help='Start a local stub LLM server instead of --base-url')
+    parser.add_argument('--stub-slots', type=int, default=1, help='Stub server parallel slots (default: 1)')
+    parser.add_argument('--stub-ttft', type=float, default=0.2, help='Stub server seconds to first token (default: 0.2)')
+    parser.add_argument('--stub-token-rate', type=float, default=20.0,
+                        help='Stub server tokens per second per slot (default: 20)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for query order and think times (default: 0)')
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Print failed requests')
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    if not queries:
+        print(f"Error: No queries in '{args.queries}'")
+        return 1
+    if args.arrival == "open" and args.think_time <= 0:
+        print("Error: Open-loop arrivals need a positive --think-time")
+        return 1
+    user_levels = sorted({int(n) for n in args.users.split(',') if n.strip()})
+
+    retriever = None
+    if args.index_path:
+        retriever, _ = load_index(args.index_path, args.embedding_model,
+                                  preload_model=needs_embedding_model(args.mode, args.mmr))
+
+    stub = None
+    if args.stub and not args.no_llm:
+        stub = StubServer(token_delay=1 / args.stub_token_rate, n_tokens=args.max_tokens,
+                          slots=args.stub_slots, ttft=args.stub_ttft, seed=args.seed).start()
+        args.base_url = stub.base_url
+        print(f"Started stub server at {stub.base_url} ({args.stub_slots} slot(s), "
+              f"{args.stub_token_rate:.0f} tokens/s)")
+    client = None if args.no_llm else LLMClient(base_url=args.base_url, api_key="dummy")
+
+    levels = []
+    try:
+        for query in queries[:args.warmup]:
+            run_query(retriever, client, query, args)
+
+        for n_users in user_levels:
+            print(f"\n{n_users} user(s), {args.arrival} loop, {args.think_time:.1f}s think time, "
+                  f"{args.duration:.0f}s...")
+            samples, n_errors, elapsed = run_level(retriever, client, queries, n_users, args)
+            summary = {stage: summarize([s[stage] for s in samples if stage in s]) for stage in REPORTED_STAGES}
+            throughput = len(samples) / elapsed
+            levels.append({"users": n_users, "completed": len(samples), "errors": n_errors,
+                           "elapsed": elapsed, "throughput": throughput, "summary": summary})
+            total = summary["total"]
+            print(f"  {len(samples)} completed, {n_errors} errors, {throughput:.2f} queries/s"
+                  + (f", total p50 {total['p50']:.3f}s p99 {total['p99']:.3f}s" if total["n"] else ""))
+    finally:
+        if client is not None:
+            client.close()
+        if stub is not None:
+            stub.stop()
+        if retriever is not None:
+            retriever.close()
+
+    print("\n-----------------------------------------------------")
+    header = f"{'Users':>5} | {'Queries/s':>9} | {'Errors':>6}"
+    for stage in REPORTED_STAGES:
+        header += f" | {stage + ' p50/p99 (s)':>22}"
+    print(header)
+    for level in levels:
+        row = f"{level['users']:>5} | {level['throughput']:>9.2f} | {level['errors']:>6}"
+        for stage in REPORTED_STAGES:
+            s = level["summary"][stage]
+            row += f" | {s['p50']:>10.3f} / {s['p99']:>9.3f}" if s["n"] else f" | {'-':>22}"
+        print(row)
+
+    saturated_at, max_users = find_saturation(levels, args.saturation_gain, args.ttft_target)
+    if saturated_at is not None:
+        print(f"BENCHMARK: Throughput saturates at {saturated_at} users "
+              f"(more users add less than {args.saturation_gain:.0%})")
+    else:
+        print("BENCHMARK: Throughput still rising at the highest level; try more users")
+    if args.ttft_target is not None:
+        print(f"BENCHMARK: {max_users or 0} concurrent users within p90 TTFT {args.ttft_target:.2f}s")
+    print("-----------------------------------------------------")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": vars(args),
+                       "environment": environment_info(), "levels": levels,
+                       "saturated_at": saturated_at, "max_users_within_target": max_users}, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,287 @@
+"""Memory footprint of an index bundle and its projection to larger corpora.
+
+Loads an index bundle (FAISS index, chunk store, BM25 / topic / position
+sidecars) and the embedding model, and reports the bytes held by:
+
+    vectors        the stored vectors (codes) of the FAISS index
+    ivf lists      IVF list IDs and centroids, or the HNSW graph
+    chunk store    the chunk strings held in memory
+    sidecars       BM25, topic and position files (memory-mapped or loaded)
+    model          parameters of the embedding model
+    process RSS    measured after every loading step
+
+It then rebuilds the same index (same type and parameters; IVF indexes keep
+their trained centroids) on growing subsets of the stored vectors, measures
+index bytes and single-query search latency at each size, fits both as a
+fixed cost plus a per-vector cost (HNSW latency grows with log n instead),
+and extrapolates them to target corpus sizes (by default up to the ~36M
+vectors of full Wikipedia, see the README) to tell whether a configuration
+fits in the memory budget of an 8GB Pi.
+
+On small indexes the fixed per-call overhead of a search hides the
+per-vector work, so the latency projection is only made when the scaling
+points span at least MIN_LATENCY_SPAN and reach MIN_LATENCY_VECTORS vectors;
+otherwise only memory is projected.
+
+Example:
+    python memory_report.py --index-path index_optimized_sentence_3_1.faiss
+    python memory_report.py --index-path my_document_ivf.faiss --target-sizes 1e6,36e6 --memory-budget-gb 8
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import numpy as np
+import faiss
+from profiling import rss_kb
+
+
+DEFAULT_TARGET_SIZES = "1e6,1e7,3.6e7"
+# Memory the OS, llama-server's runtime and the rest of the process need besides the index
+DEFAULT_RESERVED_GB = 1.5
+# Scaling points needed before search latency is extrapolated
+MIN_LATENCY_SPAN = 10.0  # Largest / smallest measured size
+MIN_LATENCY_VECTORS = 10000  # Largest measured size
+
+
+def faiss_breakdown(index):
+    """Bytes of the vectors and of the index structure (IVF lists and centroids, HNSW graph).
+
+    Returns:
+        Dict with "vectors", "structure" and "total" (the serialized size, which
+        matches what FAISS holds in memory closely)
+    """
+    total = faiss.serialize_index(index).nbytes
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        vectors = ivf.ntotal * ivf.code_size
+    elif isinstance(index, faiss.IndexHNSW):
+        vectors = index.ntotal * faiss.downcast_index(index.storage).code_size
+    elif hasattr(index, "code_size"):
+        vectors = index.ntotal * index.code_size
+    else:
+        vectors = index.ntotal * index.d * 4
+    return {"vectors": vectors, "structure": max(total - vectors, 0), "total": total}
+
+
+def chunk_store_bytes(chunks):
+    """Bytes held by a list of chunk strings (string objects plus the list)."""
+    return sys.getsizeof(chunks) + sum(sys.getsizeof(chunk) for chunk in chunks)
+
+
+def sidecar_files(prefix):
+    """Sidecar files of an index bundle and their sizes on disk."""
+    return {path: os.path.getsize(path) for path in sorted(glob.glob(glob.escape(prefix) + ".*"))}
+
+
+def model_bytes(model):
+    """Bytes of the parameters and buffers of a sentence-transformers (torch) model."""
+    return sum(t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers()))
+
+
+def load_vectors(index):
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def search_latency(index, queries, k):
+    """Median single-query search time in seconds."""
+    latencies = []
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        index.search(queries[i:i + 1], k)
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies))
+
+
+def scaling_points(index, vectors, sizes, n_queries, k, seed):
+    """Rebuild the index on the first n vectors for every n and measure bytes and latency."""
+    rng = np.random.default_rng(seed)
+    query_ids = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    noise = rng.normal(scale=vectors.std() * 0.1, size=(len(query_ids), vectors.shape[1]))
+    queries = (vectors[query_ids] + noise).astype('float32')
+
+    points = []
+    for n in sizes:
+        sub_index = faiss.clone_index(index)
+        sub_index.reset()
+        sub_index.add(vectors[:n])
+        points.append({"n": n, "bytes": faiss_breakdown(sub_index)["total"],
+                       "latency": search_latency(sub_index, queries, k)})
+    return points
+
+
+def fit_projection(points, latency_scale="linear", fit_latency=True):
+    """Fit bytes = a + b * n and latency = c + d * f(n), with c, d >= 0, to the scaling points.
+
+    Args:
+        points: Scaling points from scaling_points()
+        latency_scale: "linear" (f(n) = n: flat and IVF indexes scan a fixed share
+            of the vectors) or "log" (f(n) = log n: HNSW graph search)
+        fit_latency: False when the points cannot support a latency projection
+
+    Returns:
+        Function n -> (bytes, latency); latency is None without fit_latency
+    """
+    n = np.array([p["n"] for p in points], dtype=np.float64)
+    size = np.array([p["bytes"] for p in points], dtype=np.float64)
+    latency = np.array([p["latency"] for p in points], dtype=np.float64)
+    b, a = np.polyfit(n, size, 1)
+    scale = np.log if latency_scale == "log" else (lambda x: x)
+    x = scale(n)
+    d, c = np.polyfit(x, latency, 1)
+    if d < 0:
+        # Measurement noise; latency does not shrink with more vectors
+        d, c = 0.0, float(latency.mean())
+    elif c < 0:
+        # A search cannot take negative time; fit the slope alone, through the origin
+        d, c = float(np.dot(x, latency) / np.dot(x, x)), 0.0
+
+    def project(target):
+        projected = float(c + d * scale(max(target, 1.0))) if fit_latency else None
+        return a + b * target, projected
+    project.bytes_per_vector = b
+    project.latency_fixed = c
+    project.latency_slope = d
+    return project
+
+
+def format_bytes(n):
+    if abs(n) < 1024:
+        return f"{n:.0f} B"
+    for unit in ("KiB", "MiB", "GiB"):
+        n /= 1024
+        if abs(n) < 1024 or unit == "GiB":
+            return f"{n:.1f} {unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory footprint of an index bundle and its scale projection')
+    parser.add_argument('--index-path', type=str, default='index_optimized_sentence_3_1.faiss',
+                        help='FAISS index of the bundle (default: index_optimized_sentence_3_1.faiss)')
+    parser.add_argument('--embedding-model', type=str, default='sentence-transformers/all-MiniLM-L6-v2',
+                        help='Sentence transformer model (default: sentence-transformers/all-MiniLM-L6-v2)')
+    parser.add_argument('--no-model', action='store_true', help='Do not load the embedding model')
+    parser.add_argument('--target-sizes', type=str, default=DEFAULT_TARGET_SIZES,
+                        help=f'Corpus sizes in vectors to project to (default: {DEFAULT_TARGET_SIZES})')
+    parser.add_argument('--n-points', type=int, default=5, help='Scaling points to measure (default: 5)')
+    parser.add_argument('--n-queries', type=int, default=200, help='Queries per latency point (default: 200)')
+    parser.add_argument('--top-k', type=int, default=3, help='k for the latency measurement (default: 3)')
+    parser.add_argument('--memory-budget-gb', type=float, default=8.0, help='Device memory (default: 8)')
+    parser.add_argument('--reserved-gb', type=float, default=DEFAULT_RESERVED_GB,
+                        help=f'Memory kept for the OS and the rest of the process (default: {DEFAULT_RESERVED_GB})')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the latency queries (default: 0)')
+    parser.add_argument('--output', type=str, default=None, help='Write the report as JSON to this file')
+    args = parser.parse_args()
+
+    rss = [("start", rss_kb())]
+
+    index = faiss.read_index(args.index_path)
+    rss.append(("FAISS index", rss_kb()))
+    with open(args.index_path + ".json", 'r') as f:
+        chunks = json.load(f)
+    rss.append(("chunk store", rss_kb()))
+
+    model_size = None
+    if not args.no_model:
+        # Only needed for the model's share; --no-model works without sentence-transformers
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(args.embedding_model)
+        model_size = model_bytes(model)
+        rss.append(("embedding model", rss_kb()))
+
+    breakdown = faiss_breakdown(index)
+    chunks_size = chunk_store_bytes(chunks)
+    sidecars = {path: size for path, size in sidecar_files(args.index_path).items()
+                if path != args.index_path + ".json"}
+    sidecars_size = sum(sidecars.values())
+    n_vectors = index.ntotal
+
+    print(f"\n--- Memory footprint of '{args.index_path}' ({n_vectors} vectors, dimension {index.d}, "
+          f"{type(index).__name__}) ---")
+    print(f"{'Vectors':>24}: {format_bytes(breakdown['vectors'])}")
+    print(f"{'IVF lists / HNSW graph':>24}: {format_bytes(breakdown['structure'])}")
+    print(f"{'Chunk store':>24}: {format_bytes(chunks_size)} ({len(chunks)} chunks)")
+    for path, size in sidecars.items():
+        print(f"{os.path.basename(path)[-24:]:>24}: {format_bytes(size)} (on disk)")
+    if model_size is not None:
+        print(f"{'Embedding model':>24}: {format_bytes(model_size)}")
+    print("\nProcess RSS:")
+    previous = rss[0][1]
+    for step, value in rss:
+        print(f"{step:>24}: {format_bytes(value * 1024)} (+{format_bytes((value - previous) * 1024)})")
+        previous = value
+
+    # Scaling points: the index type rebuilt on growing subsets of its own vectors
+    vectors = load_vectors(index)
+    sizes = sorted({int(n) for n in np.geomspace(max(n_vectors // 100, 100), n_vectors, args.n_points)
+                    if n <= n_vectors})
+    if faiss.try_extract_index_ivf(index) is not None:
+        sizes = [n for n in sizes if n >= faiss.try_extract_index_ivf(index).nlist] or [n_vectors]
+    print(f"\nMeasuring {len(sizes)} scaling points ({', '.join(str(n) for n in sizes)} vectors)...")
+    points = scaling_points(index, vectors, sizes, args.n_queries, args.top_k, args.seed)
+    for point in points:
+        print(f"{point['n']:>12} vectors: {format_bytes(point['bytes']):>10}, "
+              f"search {point['latency'] * 1000:.3f} ms")
+
+    if len(points) < 2:
+        print("Not enough scaling points for a projection")
+        projections = []
+    else:
+        fit_latency = sizes[-1] / sizes[0] >= MIN_LATENCY_SPAN and sizes[-1] >= MIN_LATENCY_VECTORS
+        latency_scale = "log" if isinstance(index, faiss.IndexHNSW) else "linear"
+        project = fit_projection(points, latency_scale, fit_latency)
+        chunk_bytes_per_vector = chunks_size / max(len(chunks), 1)
+        sidecar_bytes_per_vector = sidecars_size / max(n_vectors, 1)
+        budget = (args.memory_budget_gb - args.reserved_gb) * 1024 ** 3
+        fixed = model_size or 0
+
+        print(f"\nFit: {format_bytes(project.bytes_per_vector)} per vector in the index")
+        if fit_latency:
+            term = "ln(n)" if latency_scale == "log" else "n"
+            print(f"     search latency {project.latency_fixed * 1000:.3f} ms + "
+                  f"{project.latency_slope * 1e6:.4f} us * {term}")
+        else:
+            print(f"Warning: scaling points span {sizes[0]}-{sizes[-1]} vectors; the search latency is not "
+                  f"projected (needs {MIN_LATENCY_SPAN:g}x and at least {MIN_LATENCY_VECTORS} vectors)")
+        print(f"{'Vectors':>12} | {'Index':>10} | {'Chunks':>10} | {'Sidecars':>10} | {'Total':>10} | "
+              f"{'Search (ms)':>11} | Fits {args.memory_budget_gb:g}GB")
+        projections = []
+        for target in (float(t) for t in args.target_sizes.split(',') if t.strip()):
+            index_size, latency = project(target)
+            chunk_size = chunk_bytes_per_vector * target
+            sidecar_size = sidecar_bytes_per_vector * target
+            total = index_size + chunk_size + sidecar_size + fixed
+            fits = bool(total <= budget)
+            projections.append({"n": target, "index_bytes": index_size, "chunk_bytes": chunk_size,
+                                "sidecar_bytes": sidecar_size, "total_bytes": total,
+                                "search_latency": latency, "fits": fits})
+            print(f"{target:>12.3g} | {format_bytes(index_size):>10} | {format_bytes(chunk_size):>10} | "
+                  f"{format_bytes(sidecar_size):>10} | {format_bytes(total):>10} | "
+                  f"{f'{latency * 1000:.2f}' if latency is not None else '-':>11} | "
+                  f"{'yes' if fits else 'no'}")
+        per_vector = project.bytes_per_vector + chunk_bytes_per_vector + sidecar_bytes_per_vector
+        index_fixed, _ = project(0)
+        max_vectors = max((budget - fixed - index_fixed) / per_vector, 0) if per_vector > 0 else float('inf')
+        print("-----------------------------------------------------")
+        print(f"BENCHMARK: Projected memory per vector (index + chunks + sidecars): {format_bytes(per_vector)}")
+        print(f"BENCHMARK: About {max_vectors:.3g} vectors fit in {args.memory_budget_gb:g}GB "
+              f"({args.reserved_gb:g}GB reserved)")
+        print("-----------------------------------------------------")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"index_path": args.index_path, "index_type": type(index).__name__, "n_vectors": n_vectors,
+                       "faiss": breakdown, "chunk_store_bytes": chunks_size, "sidecars": sidecars,
+                       "model_bytes": model_size, "rss_kb": dict(rss), "scaling_points": points,
+                       "projections": projections}, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
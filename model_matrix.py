@@ -0,0 +1,254 @@
+"""Run a query set against several GGUF models and write the comparison tables.
+
+Automates what rag_llm_comparison.md was compiled from by hand: every model
+is started in its own llama-server (llama_server_manager.LlamaServer, waiting
+for /health, so model loading is measured separately), the query set is run
+against it, and the server is stopped before the next model is loaded, so
+only one model is in memory at a time.
+
+Retrieval and prompt building run once per query, before any model is
+loaded; every model then gets exactly the same chat messages, so differences
+in the tables come from the models alone. Per model the runner collects the
+model-load time, TTFT, prefill and decode tokens/s (from llama-server's
+`timings`), LLM generation time and total time (retrieval + prompt +
+generation), and writes:
+
+    markdown  speed table sorted fastest first plus every model's answers,
+              in the layout of rag_llm_comparison.md
+    JSON      configuration, the shared retrieval context, per-model
+              summaries, raw samples and answers
+
+Example:
+    python model_matrix.py models/gemma-3-270m-it-Q4_K_M.gguf models/LFM2-350M-Q4_K_M.gguf \
+        models/LFM2-1.2B-RAG-Q4_K_M.gguf --queries data/queries.txt --runs 5 --threads 4
+    python model_matrix.py a.gguf b.gguf --index-path '' --executable "python stub_llm_server.py --load-delay 1"
+
+Arguments the runner does not know are passed on to llama-server.
+"""
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+from llm_client import LLMClient
+from llama_server_manager import LlamaServer, DEFAULT_EXECUTABLE
+from prompts import build_messages
+from benchmark_harness import add_pipeline_arguments, load_queries, stream_answer, summarize, environment_info
+from rag_benchmark import load_index
+from retrieval import needs_embedding_model
+
+
+REPORTED_STAGES = ("ttft", "generation", "total", "prefill_tokens_per_second", "decode_tokens_per_second")
+
+
+def model_name(model_path):
+    """Model file name without directory and .gguf extension."""
+    name = os.path.basename(model_path)
+    return name[:-len(".gguf")] if name.lower().endswith(".gguf") else name
+
+
+def prepare_contexts(retriever, queries, args):
+    """Retrieve and build the chat messages of every query once.
+
+    Returns:
+        List of dicts with "query", "messages", "documents", "retrieval" and "prompt"
+        (seconds); the times are added to every model's total
+    """
+    contexts = []
+    for query in queries:
+        documents = None
+        retrieval = 0.0
+        if retriever is not None:
+            result = retriever.search(query, top_k=args.top_k, mode=args.mode, topic=args.topic,
+                                      merge_adjacent=args.merge_adjacent, mmr=args.mmr)
+            retrieval = result.timings["total"]
+            documents = result.passages
+        prompt_start = time.perf_counter()
+        messages = build_messages(query, documents, prompt_format=args.prompt_format)
+        contexts.append({"query": query, "messages": messages, "documents": documents,
+                         "retrieval": retrieval, "prompt": time.perf_counter() - prompt_start})
+    return contexts
+
+
+def run_model(model_path, contexts, args, extra_args):
+    """Start a server for one model, run every context args.runs times, stop the server.
+
+    Returns:
+        Dict with "model", "path", "load_time", "samples" (per stage), "records"
+        (per query and run) and, if the server could not be used, "error"
+    """
+    server = LlamaServer(model_path, port=args.port, threads=args.threads, ctx_size=args.ctx_size,
+                         executable=args.executable, extra_args=extra_args,
+                         log_path=f"llama_server_{model_name(model_path)}.log")
+    result = {"model": model_name(model_path), "path": model_path, "load_time": None,
+              "samples": {stage: [] for stage in REPORTED_STAGES}, "records": []}
+    client = None
+    try:
+        server.start()
+        result["load_time"] = server.wait_until_ready(timeout=args.timeout)
+        client = LLMClient(base_url=server.base_url, api_key="dummy")
+
+        for context in contexts[:args.warmup]:
+            stream_answer(client, context["messages"], args)
+        for context in contexts:
+            for run in range(args.runs):
+                sample = stream_answer(client, context["messages"], args)
+                sample["total"] = context["retrieval"] + context["prompt"] + sample["generation"]
+                for stage in REPORTED_STAGES:
+                    if stage in sample:
+                        result["samples"][stage].append(sample[stage])
+                result["records"].append({"query": context["query"], "run": run, **sample})
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if client is not None:
+            client.close()
+        server.stop()
+    result["summary"] = {stage: summarize(values) for stage, values in result["samples"].items()}
+    generation = result["samples"]["generation"]
+    result["summary"]["generation"]["std"] = float(np.std(generation)) if generation else None
+    return result
+
+
+def _format(summary, key, scale=1.0, digits=3, suffix=""):
+    value = summary.get(key)
+    return f"{value * scale:.{digits}f}{suffix}" if summary.get("n") and value is not None else "-"
+
+
+def format_markdown(results, contexts, args):
+    """Comparison tables in the layout of rag_llm_comparison.md."""
+    ranked = sorted((r for r in results if r["samples"]["generation"]),
+                    key=lambda r: r["summary"]["generation"]["mean"])
+    failed = [r for r in results if not r["samples"]["generation"]]
+
+    lines = ["## Results", "",
+             "**Experimental Configuration:**",
+             f"- Prompt format: `{args.prompt_format}`",
+             "- Retrieval: none" if not args.index_path else
+             f"- Retrieval: `{args.index_path}`, {args.mode}, top {args.top_k} (retrieved once, the same context "
+             "for every model)",
+             f"- Temperature: {args.temperature}",
+             f"- Max tokens: {args.max_tokens}",
+             f"- Queries: {len(contexts)}, runs per query: {args.runs} (after {args.warmup} warm-up quer"
+             f"{'y' if args.warmup == 1 else 'ies'})",
+             f"- Threads: {args.threads if args.threads is not None else 'llama-server default'}",
+             "", "### Speed", "",
+             "Results sorted by speed (fastest to slowest):", "",
+             "| Model | Load Time | TTFT p50 | Prefill (tokens/s) | Decode (tokens/s) | LLM Generation Time | Std Dev "
+             "| Total Time p50 |",
+             "|-------|-----------|----------|--------------------|-------------------|---------------------|---------"
+             "|----------------|"]
+    for position, result in enumerate(ranked):
+        s = result["summary"]
+        name = f"**{result['model']}**" if position == 0 else result["model"]
+        load = f"{result['load_time']:.2f}s" if result["load_time"] is not None else "-"
+        lines.append(f"| {name} | {load} | {_format(s['ttft'], 'p50', suffix='s')} | "
+                     f"{_format(s['prefill_tokens_per_second'], 'p50', digits=1)} | "
+                     f"{_format(s['decode_tokens_per_second'], 'p50', digits=1)} | "
+                     f"{_format(s['generation'], 'mean', digits=4, suffix='s')} | "
+                     f"±{s['generation']['std']:.4f}s | {_format(s['total'], 'p50', suffix='s')} |")
+    for result in failed:
+        lines.append(f"| {result['model']} | failed: {result.get('error', 'no answers')} | - | - | - | - | - | - |")
+
+    if ranked and len(ranked) > 1:
+        fastest, slowest = ranked[0], ranked[-1]
+        ratio = slowest["summary"]["generation"]["mean"] / fastest["summary"]["generation"]["mean"]
+        lines += ["", f"The fastest model ({fastest['model']}) generates **{ratio:.1f}x faster** than the "
+                      f"slowest ({slowest['model']})."]
+
+    lines += ["", "### Model Outputs", "",
+              "Answers of the first run of every query:" if args.runs > 1 else "Answers to every query:"]
+    for result in ranked + failed:
+        lines += ["", f"#### {result['model']}"]
+        for context in contexts:
+            answer = next((r["answer"] for r in result["records"] if r["query"] == context["query"]), None)
+            if len(contexts) > 1:
+                lines += ["", f"*{context['query']}*"]
+            lines += ["", "```", answer if answer is not None else "(no answer)", "```"]
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare GGUF models on the same RAG contexts')
+    parser.add_argument('models', type=str, nargs='+', help='GGUF model files')
+    add_pipeline_arguments(parser)
+    parser.add_argument('--warmup', type=int, default=1,
+                        help='Queries run on every model before measuring, not recorded (default: 1)')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per query and model (default: 5)')
+    parser.add_argument('--port', type=int, default=8080, help='Port of the model servers (default: 8080)')
+    parser.add_argument('--threads', type=int, default=None, help='Threads per server, -t (default: llama-server)')
+    parser.add_argument('--ctx-size', type=int, default=None, help='Context size, -c (default: model)')
+    parser.add_argument('--executable', type=str, default=DEFAULT_EXECUTABLE,
+                        help=f'Server command (default: {DEFAULT_EXECUTABLE})')
+    parser.add_argument('--timeout', type=float, default=300.0,
+                        help='Seconds to wait for a model to load (default: 300)')
+    parser.add_argument('--markdown', type=str, default='results/model_matrix.md',
+                        help='Markdown output (default: results/model_matrix.md)')
+    parser.add_argument('--output', type=str, default='results/model_matrix.json',
+                        help='JSON output (default: results/model_matrix.json)')
+    args, extra_args = parser.parse_known_args()
+
+    missing = [path for path in args.models if not os.path.exists(path)]
+    if missing and args.executable == DEFAULT_EXECUTABLE:
+        print(f"Error: Model not found at '{missing[0]}'")
+        return 1
+    if args.no_llm:
+        print("Error: --no-llm leaves nothing to compare")
+        return 1
+    queries = load_queries(args.queries)
+    if not queries:
+        print(f"Error: No queries in '{args.queries}'")
+        return 1
+
+    # Retrieval context once, before any model takes up memory
+    retriever = None
+    if args.index_path:
+        retriever, _ = load_index(args.index_path, args.embedding_model,
+                                  preload_model=needs_embedding_model(args.mode, args.mmr))
+    try:
+        contexts = prepare_contexts(retriever, queries, args)
+    finally:
+        if retriever is not None:
+            retriever.close()
+    print(f"Prepared {len(contexts)} prompt(s); running {len(args.models)} model(s)...")
+
+    results = []
+    for model_path in args.models:
+        print(f"\n{model_name(model_path)}: loading...")
+        result = run_model(model_path, contexts, args, extra_args)
+        results.append(result)
+        if "error" in result:
+            print(f"  Error: {result['error']}")
+        if result["samples"]["generation"]:
+            s = result["summary"]
+            print(f"  load {result['load_time']:.2f}s, TTFT p50 {_format(s['ttft'], 'p50', suffix='s')}, "
+                  f"generation mean {s['generation']['mean']:.4f}s ±{s['generation']['std']:.4f}s")
+
+    markdown = format_markdown(results, contexts, args)
+    print("\n" + markdown)
+    ranked = sorted((r for r in results if r["samples"]["generation"]), key=lambda r: r["summary"]["generation"]["mean"])
+    if ranked:
+        print(f"BENCHMARK: Fastest model {ranked[0]['model']} "
+              f"({ranked[0]['summary']['generation']['mean']:.4f}s LLM generation)")
+
+    for path in (args.markdown, args.output):
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    if args.markdown:
+        with open(args.markdown, 'w', encoding='utf-8') as f:
+            f.write(markdown)
+        print(f"Markdown written to {args.markdown}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": vars(args),
+                       "server_args": extra_args, "environment": environment_info(),
+                       "contexts": [{key: value for key, value in context.items() if key != "messages"}
+                                    for context in contexts],
+                       "models": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0 if ranked else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,383 @@
+"""Named stage spans with wall time, CPU time and peak-RSS capture.
+
+Stages of the indexer and the query path (load, chunk, embed, index add,
+encode, search, prompt build, generate) are wrapped in spans:
+
+    from profiling import span, profiled
+
+    with span("embed", n_chunks=len(chunks)):
+        embeddings = model.encode(chunks)
+
+    @profiled("search")
+    def search(...): ...
+
+Profiling is off by default; then span() hands out a shared no-op context
+manager and profiled() functions cost a single flag check, so the hooks can
+stay in the hot path. Once enabled, every span records:
+
+    wall               perf_counter seconds
+    cpu                process CPU seconds (all threads, e.g. embedding workers)
+    thread_cpu         CPU seconds of the span's own thread
+    rss_kb             resident set size at the end of the span
+    peak_rss_delta_kb  how much the process' peak RSS grew during the span
+
+and, on request, a cProfile summary (top functions by cumulative time) and a
+tracemalloc diff (top allocating lines) per span. Spans are exported as a
+Chrome trace (chrome://tracing, https://ui.perfetto.dev) or as plain JSON.
+
+Taking and comparing tracemalloc snapshots is slow. It happens outside each
+span's own timers, and the time nested spans spend on it is subtracted from
+the wall, cpu and thread_cpu of the spans around them, so the numbers of an
+outer span do not grow with the number of spans inside it. That time is
+kept as capture_wall, and the Chrome trace adds it back so that nested spans
+still fit inside their parent's bar.
+
+Example:
+    import profiling
+    profiling.enable(cprofile=True)
+    ... run the pipeline ...
+    profiling.print_report()
+    profiling.export_chrome_trace("rag_profile.json")
+"""
+
+import io
+import os
+import json
+import time
+import pstats
+import cProfile
+import functools
+import threading
+import tracemalloc
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Rows kept of every cProfile / tracemalloc capture
+TOP_N = 15
+
+
+def peak_rss_kb() -> int:
+    """Peak resident set size of the process so far, in KiB (0 if unavailable)."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak // 1024 if os.uname().sysname == "Darwin" else peak
+
+
+def rss_kb() -> int:
+    """Current resident set size in KiB (0 if unavailable)."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _NullSpan:
+    """What span() returns while profiling is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """An active span; records itself in the profiler when it exits."""
+
+    __slots__ = ("profiler", "name", "args", "start", "cpu_start", "thread_cpu_start",
+                 "peak_rss_start", "depth", "profile", "snapshot", "capture", "nested_capture")
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+        self.profile = None
+        self.snapshot = None
+        # Wall, CPU and thread CPU seconds spent on snapshots by this span and by nested ones
+        self.capture = [0.0, 0.0, 0.0]
+        self.nested_capture = [0.0, 0.0, 0.0]
+
+    def __enter__(self):
+        profiler = self.profiler
+        stack = profiler._stack()
+        self.depth = len(stack)
+        stack.append(self)
+        self.peak_rss_start = peak_rss_kb()
+        if profiler.tracemalloc and tracemalloc.is_tracing():
+            started = _clocks()
+            self.snapshot = _take_snapshot()
+            self._add_capture(started)
+        if profiler.cprofile:
+            self.profile = profiler._start_cprofile()
+        self.cpu_start = time.process_time()
+        self.thread_cpu_start = time.thread_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        end = time.perf_counter()
+        thread_cpu = time.thread_time() - self.thread_cpu_start
+        cpu = time.process_time() - self.cpu_start
+        profiler = self.profiler
+        nested_wall, nested_cpu, nested_thread_cpu = self.nested_capture
+        record = {
+            "name": self.name,
+            "start": self.start - profiler.origin,
+            "wall": end - self.start - nested_wall,
+            "cpu": cpu - nested_cpu,
+            "thread_cpu": thread_cpu - nested_thread_cpu,
+            "rss_kb": rss_kb(),
+            "peak_rss_delta_kb": peak_rss_kb() - self.peak_rss_start,
+            "tid": threading.get_ident(),
+            "thread": threading.current_thread().name,
+            "depth": self.depth,
+        }
+        if nested_wall:
+            record["capture_wall"] = nested_wall
+        if self.args:
+            record["args"] = self.args
+        if self.profile is not None:
+            record["cprofile"] = profiler._stop_cprofile(self.profile)
+        if self.snapshot is not None:
+            started = _clocks()
+            record["allocations"], record["allocated_kb"] = _allocation_diff(self.snapshot)
+            self._add_capture(started)
+        stack = profiler._stack()
+        stack.pop()
+        if stack:
+            parent = stack[-1]
+            parent.nested_capture = [a + b + c for a, b, c in
+                                     zip(parent.nested_capture, self.capture, self.nested_capture)]
+        profiler._record(record)
+        return False
+
+    def _add_capture(self, started):
+        self.capture = [total + now - start for total, now, start in zip(self.capture, _clocks(), started)]
+
+
+def _clocks():
+    return time.perf_counter(), time.process_time(), time.thread_time()
+
+
+def _take_snapshot():
+    # Leave out the allocations of tracemalloc and of the profiler itself
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+
+
+def _allocation_diff(before):
+    """Top allocating lines since `before` and the net KiB allocated."""
+    stats = _take_snapshot().compare_to(before, 'lineno')
+    net_kb = sum(stat.size_diff for stat in stats) / 1024
+    return [str(stat) for stat in stats[:TOP_N]], net_kb
+
+
+class Profiler:
+    """Collects spans from all threads.
+
+    Args:
+        cprofile: Capture a cProfile summary per span (only the outermost span
+            being profiled at a time, since only one profiler can be active)
+        tracemalloc: Capture a tracemalloc allocation diff per span (slows
+            allocation-heavy code down considerably)
+    """
+
+    def __init__(self, cprofile: bool = False, tracemalloc: bool = False):
+        self.enabled = False
+        self.cprofile = cprofile
+        self.tracemalloc = tracemalloc
+        self.origin = time.perf_counter()
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cprofile_active = False
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def _start_cprofile(self):
+        with self._lock:
+            if self._cprofile_active:
+                return None
+            self._cprofile_active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def _stop_cprofile(self, profile):
+        profile.disable()
+        with self._lock:
+            self._cprofile_active = False
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(TOP_N)
+        return out.getvalue()
+
+    def span(self, name: str, **args):
+        """Context manager timing the stage `name`; keyword arguments are stored with it."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per-stage totals: count, wall, cpu, max peak-RSS growth and max RSS."""
+        summary = {}
+        for record in self.spans:
+            stage = summary.setdefault(record["name"], {"count": 0, "wall": 0.0, "cpu": 0.0,
+                                                        "peak_rss_delta_kb": 0, "rss_kb": 0})
+            stage["count"] += 1
+            stage["wall"] += record["wall"]
+            stage["cpu"] += record["cpu"]
+            stage["peak_rss_delta_kb"] = max(stage["peak_rss_delta_kb"], record["peak_rss_delta_kb"])
+            stage["rss_kb"] = max(stage["rss_kb"], record["rss_kb"])
+        return summary
+
+    def chrome_trace(self) -> Dict:
+        """The spans as Chrome trace events (complete "X" events, microseconds)."""
+        pid = os.getpid()
+        events = []
+        threads = {}
+        for record in self.spans:
+            threads[record["tid"]] = record["thread"]
+            args = {key: value for key, value in record.items()
+                    if key not in ("name", "start", "wall", "tid", "thread", "depth")}
+            duration = record["wall"] + record.get("capture_wall", 0.0)
+            events.append({"name": record["name"], "cat": "stage", "ph": "X", "pid": pid, "tid": record["tid"],
+                           "ts": record["start"] * 1e6, "dur": duration * 1e6, "args": args})
+        for tid, thread_name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                           "args": {"name": thread_name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"summary": self.summary()}}
+
+
+# Process-wide profiler used by span() / profiled()
+_profiler = Profiler()
+
+
+def get_profiler() -> Profiler:
+    return _profiler
+
+
+def enable(cprofile: bool = False, tracemalloc: bool = False):
+    """Start recording spans (optionally with cProfile / tracemalloc captures)."""
+    _profiler.cprofile = cprofile
+    _profiler.tracemalloc = tracemalloc
+    if tracemalloc:
+        _start_tracemalloc()
+    _profiler.enabled = True
+
+
+def _start_tracemalloc():
+    # Separate function: enable()'s `tracemalloc` argument shadows the module
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    _profiler.enabled = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled() -> bool:
+    return _profiler.enabled
+
+
+def span(name: str, **args):
+    """Time a stage of the process-wide profiler; a no-op while profiling is disabled."""
+    if not _profiler.enabled:
+        return _NULL_SPAN
+    return _Span(_profiler, name, args)
+
+
+def profiled(name: Optional[str] = None):
+    """Decorator running every call of a function in a span (named after the function by default)."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _profiler.enabled:
+                return fn(*args, **kwargs)
+            with _Span(_profiler, span_name, None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def export_chrome_trace(path: str):
+    """Write the spans as a Chrome trace (open in chrome://tracing or ui.perfetto.dev)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(_profiler.chrome_trace(), f)
+
+
+def export_json(path: str):
+    """Write the raw spans and the per-stage summary as JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"spans": _profiler.spans, "summary": _profiler.summary()}, f, indent=2)
+
+
+def print_report(show_captures: bool = False):
+    """Print the per-stage summary (and the cProfile / tracemalloc captures with show_captures)."""
+    summary = _profiler.summary()
+    if not summary:
+        return
+    print("\n--- Stage profile ---")
+    print(f"{'Stage':>16} | {'Count':>5} | {'Wall (ms)':>10} | {'CPU (ms)':>10} | {'CPU/Wall':>8} | "
+          f"{'Peak RSS +MiB':>13} | {'RSS MiB':>8}")
+    for name, stage in summary.items():
+        ratio = stage["cpu"] / stage["wall"] if stage["wall"] else 0.0
+        print(f"{name:>16} | {stage['count']:>5} | {stage['wall'] * 1000:>10.2f} | {stage['cpu'] * 1000:>10.2f} | "
+              f"{ratio:>8.2f} | {stage['peak_rss_delta_kb'] / 1024:>13.1f} | {stage['rss_kb'] / 1024:>8.1f}")
+    if show_captures:
+        for record in _profiler.spans:
+            if "cprofile" in record:
+                print(f"\n--- cProfile: {record['name']} ---\n{record['cprofile']}")
+            if "allocations" in record:
+                print(f"\n--- tracemalloc: {record['name']} ({record['allocated_kb']:+.1f} KiB) ---")
+                print("\n".join(record["allocations"]))
+
+
+def add_profile_arguments(parser):
+    """Add --profile, --profile-cprofile and --profile-tracemalloc to an argument parser."""
+    parser.add_argument('--profile', type=str, default=None, metavar='TRACE_JSON',
+                        help='Record stage spans and write them as a Chrome trace to this file')
+    parser.add_argument('--profile-cprofile', action='store_true',
+                        help='With --profile: capture a cProfile summary per stage')
+    parser.add_argument('--profile-tracemalloc', action='store_true',
+                        help='With --profile: capture the top allocations per stage (slow)')
+
+
+def enable_from_args(args):
+    """Enable profiling if --profile was given."""
+    if args.profile:
+        enable(cprofile=args.profile_cprofile, tracemalloc=args.profile_tracemalloc)
+
+
+def report_from_args(args):
+    """Print the stage profile and write the trace if --profile was given."""
+    if args.profile:
+        print_report(show_captures=args.profile_cprofile or args.profile_tracemalloc)
+        export_chrome_trace(args.profile)
+        print(f"Stage trace written to {args.profile} (open in chrome://tracing or ui.perfetto.dev)")
@@ -0,0 +1,126 @@
+"""Prompt assembly shared by the RAG benchmarks.
+
+Keeps the exact prompt formats used in rag_benchmark.py so that every script
+sends byte-identical prompts for the same query and retrieved documents.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+
+PROMPT_FORMATS = ("default", "lfm2-rag")
+
+NO_RAG_SYSTEM_MESSAGE = "Instructions: Provide clear, concise answers based on what you know. Limit your response to 3-4 sentences maximum. Be direct and avoid unnecessary elaboration."
+
+# Conversations keep the system message fixed, so the server can reuse its KV cache
+# for everything before the newest turn; the documents travel with each question
+CONVERSATION_SYSTEM_MESSAGE = "Instructions: You are answering a series of related questions. Each question may come with documents that provide additional information; follow-up questions can refer to earlier questions and answers. Provide clear, concise answers based on the documents and the conversation so far. Limit your response to 3-4 sentences maximum. Be direct and avoid unnecessary elaboration."
+
+CONVERSATION_SUMMARY_REQUEST = "Summarize the conversation above in 2-3 sentences, keeping the names, numbers and facts needed to answer follow-up questions."
+
+
+def build_messages(query: str, documents: Optional[List[str]] = None,
+                   prompt_format: str = "lfm2-rag") -> List[Dict[str, str]]:
+    """Build the chat messages for a query and its retrieved documents.
+
+    Args:
+        query: User question
+        documents: Retrieved chunks (or merged passages); None means no retrieval
+        prompt_format: "default" (single user message) or "lfm2-rag"
+            (system message with <documentN> tags, see LFM2_RAG_guidelines.txt)
+
+    Returns:
+        List of message dicts with 'role' and 'content'
+    """
+    if documents is None:
+        return [
+            {"role": "system", "content": NO_RAG_SYSTEM_MESSAGE},
+            {"role": "user", "content": query}
+        ]
+
+    if prompt_format == "lfm2-rag":
+        # LFM2-RAG format: system message with documents, user message with question
+        documents_str = ""
+        for i, chunk in enumerate(documents, 1):
+            documents_str += f"<document{i}>\n{chunk}\n</document{i}>\n\n"
+
+        system_message = f"""The following documents may provide you additional information to answer questions:
+
+    {documents_str.strip()}
+
+    Instructions: Provide clear, concise answers based only on the information in the documents. Limit your response to 3-4 sentences maximum. Be direct and avoid unnecessary elaboration."""
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": query}
+        ]
+
+    # Default format: single user message with context and question
+    context_str = "\n\n".join(documents)
+    prompt = f"""Based on the following context, please answer the user's question concisely and directly.
+    If the context does not contain the answer, state that the information is not available in the provided context.
+    Limit your response to 3-4 sentences maximum. Be clear and focused - avoid unnecessary elaboration.
+
+    Context:
+    {context_str}
+
+    Question:
+    {query}
+
+    Answer:
+    """
+    return [
+        {"role": "user", "content": prompt}
+    ]
+
+
+def static_prefix_messages(prompt_format: str = "lfm2-rag", retrieval: bool = True) -> List[Dict[str, str]]:
+    """The start of build_messages() that is the same for every query and set of documents.
+
+    The messages up to the first one that depends on the query or the documents,
+    which is cut where its content starts to differ. Sent to llama-server ahead
+    of the first query (rag_benchmark.prewarm_slots), it leaves that prefix in
+    the KV cache.
+
+    Args:
+        prompt_format: "default" or "lfm2-rag"
+        retrieval: Whether the prompts carry retrieved documents
+
+    Returns:
+        List of message dicts with 'role' and 'content'
+    """
+    first = build_messages("a", ["a"] if retrieval else None, prompt_format=prompt_format)
+    second = build_messages("b", ["b"] if retrieval else None, prompt_format=prompt_format)
+    prefix = []
+    for a, b in zip(first, second):
+        if a == b:
+            prefix.append(a)
+            continue
+        common = os.path.commonprefix([a["content"], b["content"]])
+        if common:
+            prefix.append({"role": a["role"], "content": common})
+        break
+    return prefix
+
+
+def build_conversation_turn(query: str, documents: Optional[List[str]] = None,
+                            prompt_format: str = "lfm2-rag") -> Dict[str, str]:
+    """Build the user message of one conversation turn.
+
+    Unlike build_messages(), the documents go into the user message, so the
+    messages of earlier turns stay unchanged (see CONVERSATION_SYSTEM_MESSAGE).
+
+    Args:
+        query: User question
+        documents: Retrieved chunks for this turn; None means no retrieval
+        prompt_format: "default" (context and question) or "lfm2-rag" (<documentN> tags)
+
+    Returns:
+        Message dict with 'role' and 'content'
+    """
+    if not documents:
+        return {"role": "user", "content": query}
+    if prompt_format == "lfm2-rag":
+        documents_str = "".join(f"<document{i}>\n{chunk}\n</document{i}>\n\n" for i, chunk in enumerate(documents, 1))
+        return {"role": "user", "content": f"{documents_str}{query}"}
+    context_str = "\n\n".join(documents)
+    return {"role": "user", "content": f"Context:\n{context_str}\n\nQuestion:\n{query}"}
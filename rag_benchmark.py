@@ -1,10 +1,14 @@
 import os
 import time
-import json
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
+from urllib.parse import urlparse
 from llm_client import LLMClient
+from llama_server_manager import LlamaServer
+from stub_llm_server import StubServer
+from retrieval import load_retriever, load_embedding_model, needs_embedding_model
+from prompts import build_messages, static_prefix_messages
+import profiling
+from profiling import span
 
 # --- Configuration ---
 # Stage 1: Index Loading Configuration
@@ -26,6 +30,12 @@ FAISS_INDEX_PATH = "index_optimized_sentence_3_1.faiss"
 
 # Stage 2: Search & Retrieval Configuration
 TOP_K = 3 # Number of relevant chunks to retrieve
+RETRIEVAL_MODE = "vector"  # "vector" (FAISS), "bm25" (inverted index) or "hybrid" (both, fused with RRF)
+TOPIC_FILTER = None  # e.g. "Sinclair Sovereign" to only search that topic and its subtopics
+N_SEARCH_RUNS = 20  # Number of searches used to compare filtered vs. unfiltered latency
+USE_MMR = False  # Over-fetch candidates and pick TOP_K diverse ones with maximal-marginal-relevance
+MMR_LAMBDA = 0.5  # MMR trade-off: 1.0 = pure relevance, 0.0 = pure diversity
+MERGE_ADJACENT_CHUNKS = False  # Merge overlapping / adjacent hits into one passage with a single topic header
 
 # USER_QUERY = "What was the Sinclair Sovereign? Include what type of device it was, the year it was introduced, its price range, and one notable or special fact about it."
 
@@ -35,55 +45,166 @@ USER_QUERY = "What is the song Bossy about?"
 
 # Stage 3: LLM Response Configuration
 LLAMA_SERVER_BASE_URL = "http://localhost:8080/v1"  # llama-server OpenAI-compatible API
+LLAMA_MODEL_PATH = None  # e.g. "models/LFM2-1.2B-RAG-Q4_K_M.gguf" to start llama-server here and time model loading
+LLAMA_SERVER_THREADS = None  # llama-server -t (None = llama-server default)
+LLAMA_SERVER_CTX_SIZE = None  # llama-server -c (None = model default)
+LLAMA_SERVER_PARALLEL = 1  # llama-server -np slots
+USE_STUB_LLM = False  # Replace llama-server with stub_llm_server.py to measure the pipeline without model noise
+STUB_LLM_TTFT = 0.1  # Stub: seconds before the first token
+STUB_LLM_TOKEN_RATE = 20.0  # Stub: tokens per second
+STUB_LLM_PROMPT_RATE = 200.0  # Stub: prompt tokens per second (prefill of tokens not in the slot's cache)
 DEFAULT_LLM_SERVER_MODEL = "dummy"  # Model name (can be any string when running single model)
 N_LLM_RUNS = 5  # Number of times to repeat LLM generation for averaging
 LLM_GEN_TEMPERATURE = 0.0  # Temperature for generation (0=deterministic, 0.8-1.0=creative, default was ~0.8)
 MAX_LLM_GEN_TOKENS = 200  # Maximum tokens to generate (controls output length and reduces variance)
 PROMPT_FORMAT = "lfm2-rag"  # "default" or "lfm2-rag" (for LFM2-RAG model)
+COMPARE_PREWARM = True  # Time the first query on the pre-warmed prefix and again with the prompt cache skipped
 DEBUG_PROMPT = True  # Set to True to print the full prompt sent to the LLM
 
+# Profiling: per-stage wall / CPU / peak-RSS spans (see profiling.py)
+PROFILE_TRACE_PATH = None  # e.g. "rag_profile.json" to record spans and write a Chrome trace
+PROFILE_CPROFILE = False  # Also capture a cProfile summary per stage
+PROFILE_TRACEMALLOC = False  # Also capture the top allocations per stage (slow)
+
 # --- Helper Functions ---
 
-def load_index(faiss_index_path, embedding_model_name):
+def load_index(faiss_index_path, embedding_model_name, preload_model=True):
     """
-    Load an existing FAISS index and its associated chunks.
+    Load an existing FAISS index, its associated chunks and BM25 index (if built).
 
     Args:
         faiss_index_path: Path to the FAISS index file
         embedding_model_name: Name of the sentence transformer model
+        preload_model: Load the embedding model now (and count it in the loading time);
+            otherwise it is constructed by the first search that encodes a query
 
     Returns:
-        Tuple of (index, chunks, model, loading_duration)
+        Tuple of (retriever, loading_duration)
     """
     print(f"Loading existing index from '{faiss_index_path}'...")
     start_time_loading = time.time()
 
-    # Load the embedding model
-    print(f"Loading embedding model: {embedding_model_name}...")
-    model = SentenceTransformer(embedding_model_name)
-    embedding_dim = model.get_sentence_embedding_dimension()
-    print(f"Model loaded. Embedding dimension: {embedding_dim}")
-
-    # Load the index
-    index = faiss.read_index(faiss_index_path)
+    if preload_model:
+        # Load the embedding model
+        print(f"Loading embedding model: {embedding_model_name}...")
+        with span("load_model"):
+            model = load_embedding_model(embedding_model_name)
+        embedding_dim = model.get_sentence_embedding_dimension()
+        print(f"Model loaded. Embedding dimension: {embedding_dim}")
+    else:
+        print(f"Embedding model {embedding_model_name} is loaded on first use.")
+        model = embedding_model_name
 
-    # Load the chunks
-    with open(faiss_index_path + ".json", 'r') as f:
-        chunks = json.load(f)
+    # Load the index, the chunks and the BM25 inverted index
+    with span("load_index"):
+        retriever = load_retriever(faiss_index_path, model)
 
     end_time_loading = time.time()
     loading_duration = end_time_loading - start_time_loading
 
-    print(f"Loaded {len(chunks)} chunks from existing index.")
+    print(f"Loaded {len(retriever.chunks)} chunks from existing index.")
+    if retriever.inverted_index is not None:
+        print(f"Loaded BM25 index with {len(retriever.inverted_index.terms)} terms (memory-mapped).")
     print("-----------------------------------------------------")
     print(f"BENCHMARK: Loading index took {loading_duration:.4f} seconds.")
     print("-----------------------------------------------------")
 
-    return index, chunks, model, loading_duration
+    return retriever, loading_duration
+
+
+def benchmark_topic_filter(retriever, query, topic, top_k, mode, n_runs):
+    """
+    Compare median search latency with and without a topic filter.
+
+    Args:
+        retriever: Loaded Retriever with a topic index
+        query: Query text
+        topic: Topic filter passed to Retriever.search()
+        top_k: Number of chunks to retrieve
+        mode: Retrieval mode
+        n_runs: Number of searches per variant
+
+    Returns:
+        Tuple of (unfiltered_median, filtered_median, n_selected) in seconds / chunks
+    """
+    # Exclude query encoding so only the search itself is compared
+    search_stages = ("vector_search", "bm25_search", "fusion", "topic_filter")
+
+    def median_search_time(search_topic):
+        durations = []
+        for _ in range(n_runs):
+            timings = retriever.search(query, top_k=top_k, mode=mode, topic=search_topic).timings
+            durations.append(sum(timings.get(stage, 0.0) for stage in search_stages))
+        return float(np.median(durations))
+
+    unfiltered = median_search_time(None)
+    filtered = median_search_time(topic)
+    n_selected = len(retriever.topic_index.select_ids(topic))
+    return unfiltered, filtered, n_selected
+
+def prewarm_slots(client, n_slots=LLAMA_SERVER_PARALLEL, prompt_format=PROMPT_FORMAT, retrieval=True):
+    """
+    Send the static start of the RAG prompt to every llama-server slot.
+
+    Loads the weights like any warm-up request, and leaves the instructions every
+    prompt starts with (prompts.static_prefix_messages) in each slot's KV cache,
+    so the first real query only prefills its documents and question.
+
+    Returns:
+        List of (slot, seconds, prompt tokens processed) tuples
+    """
+    messages = static_prefix_messages(prompt_format, retrieval=retrieval)
+    prewarmed = []
+    for slot in range(n_slots):
+        start_time = time.time()
+        response = client.chat.completions.create(
+            model=DEFAULT_LLM_SERVER_MODEL,
+            messages=messages,
+            temperature=LLM_GEN_TEMPERATURE,
+            max_tokens=1,
+            stream=False,
+            id_slot=slot,
+            cache_prompt=True
+        )
+        prompt_n = response.timings.prompt_n if response.timings is not None else None
+        prewarmed.append((slot, time.time() - start_time, prompt_n))
+    return prewarmed
 
 # --- Main Benchmarking Script ---
 
 def main():
+    if PROFILE_TRACE_PATH:
+        profiling.enable(cprofile=PROFILE_CPROFILE, tracemalloc=PROFILE_TRACEMALLOC)
+
+    if USE_STUB_LLM:
+        stub = StubServer(ttft=STUB_LLM_TTFT, token_delay=1.0 / STUB_LLM_TOKEN_RATE,
+                          prompt_token_delay=1.0 / STUB_LLM_PROMPT_RATE, slots=LLAMA_SERVER_PARALLEL,
+                          n_tokens=MAX_LLM_GEN_TOKENS).start()
+        print(f"Using stub LLM at {stub.base_url} (TTFT {STUB_LLM_TTFT}s, {STUB_LLM_TOKEN_RATE} tokens/s)")
+        try:
+            run_benchmark(llm_base_url=stub.base_url)
+        finally:
+            stub.stop()
+        return
+
+    # Start llama-server first so the model loads while the index is loading
+    llama_server = None
+    if LLAMA_MODEL_PATH:
+        llama_server = LlamaServer(
+            LLAMA_MODEL_PATH,
+            port=urlparse(LLAMA_SERVER_BASE_URL).port or 8080,
+            threads=LLAMA_SERVER_THREADS,
+            ctx_size=LLAMA_SERVER_CTX_SIZE,
+            parallel=LLAMA_SERVER_PARALLEL
+        ).start()
+    try:
+        run_benchmark(llama_server=llama_server)
+    finally:
+        if llama_server is not None:
+            llama_server.stop()
+
+
+def run_benchmark(llama_server=None, llm_base_url=LLAMA_SERVER_BASE_URL):
     print("--- RAG Performance Benchmark on Raspberry Pi ---")
 
 
@@ -103,9 +224,10 @@ def main():
             print(f"  python index_generation.py --index-path {FAISS_INDEX_PATH}")
             return
 
-        index, chunks, model, indexing_duration = load_index(
+        retriever, indexing_duration = load_index(
             faiss_index_path=FAISS_INDEX_PATH,
-            embedding_model_name=EMBEDDING_MODEL_NAME
+            embedding_model_name=EMBEDDING_MODEL_NAME,
+            preload_model=needs_embedding_model(RETRIEVAL_MODE, USE_MMR)
         )
 
 
@@ -122,54 +244,74 @@ def main():
         retrieval_duration = 0
     else:
         print("\n--- STAGE 2: SEARCH & RETRIEVAL ---")
-        
-
-        
+        print(f"Retrieval mode: {RETRIEVAL_MODE}" + (f" + MMR (lambda={MMR_LAMBDA})" if USE_MMR else ""))
+        if TOPIC_FILTER:
+            print(f"Topic filter: {TOPIC_FILTER}")
 
-        # Embed the query
-        start_time_encoding = time.time()
-        query_embedding = model.encode([query])
-        encoding_duration = time.time() - start_time_encoding
+        # Encode the query and search the index(es)
+        result = retriever.search(query, top_k=TOP_K, mode=RETRIEVAL_MODE, topic=TOPIC_FILTER,
+                                  merge_adjacent=MERGE_ADJACENT_CHUNKS, mmr=USE_MMR, mmr_lambda=MMR_LAMBDA)
+        retrieved_chunks = result.passages
 
-        # Search the FAISS index
-        # D: distances, I: indices of the nearest neighbors
-        start_time_retrieval = time.time()
-        D, I = index.search(np.array(query_embedding).astype('float32'), TOP_K)
-
-        # Retrieve the actual text chunks
-        retrieved_chunks = [chunks[i] for i in I[0]]
-        
-        end_time_retrieval = time.time()
-        retrieval_duration = end_time_retrieval - start_time_retrieval
+        # Encoding is part of the vector branch; everything else counts as retrieval
+        encoding_duration = result.timings.get("encode", 0.0)
+        retrieval_duration = result.timings["total"] - encoding_duration
 
         print(f"\nTop {TOP_K} relevant chunks found:")
+        if MERGE_ADJACENT_CHUNKS:
+            print(f"(merged into {len(result.passages)} passages)")
         for i, chunk in enumerate(retrieved_chunks):
             print(f"  {i+1}. {chunk}")
 
         print("-----------------------------------------------------")
         print(f"BENCHMARK: Query encoding took {encoding_duration:.4f} seconds.")
+        if "vector_search" in result.timings:
+            print(f"BENCHMARK: FAISS search took {result.timings['vector_search']:.4f} seconds.")
+        if "bm25_search" in result.timings:
+            print(f"BENCHMARK: BM25 search took {result.timings['bm25_search']:.4f} seconds.")
+        if "fusion" in result.timings:
+            print(f"BENCHMARK: RRF fusion took {result.timings['fusion']:.4f} seconds.")
+        if "mmr" in result.timings:
+            print(f"BENCHMARK: MMR selection took {result.timings['mmr']:.4f} seconds.")
+        if "merge" in result.timings:
+            print(f"BENCHMARK: Chunk merging took {result.timings['merge']:.4f} seconds.")
         print(f"BENCHMARK: Retrieval took {retrieval_duration:.4f} seconds.")
+        if TOPIC_FILTER:
+            unfiltered, filtered, n_selected = benchmark_topic_filter(
+                retriever, query, TOPIC_FILTER, TOP_K, RETRIEVAL_MODE, N_SEARCH_RUNS
+            )
+            print(f"BENCHMARK: Unfiltered search (median of {N_SEARCH_RUNS}): {unfiltered * 1000:.3f} ms "
+                  f"over {len(retriever.chunks)} chunks")
+            print(f"BENCHMARK: Filtered search (median of {N_SEARCH_RUNS}):   {filtered * 1000:.3f} ms "
+                  f"over {n_selected} chunks")
         print("-----------------------------------------------------")
 
 
+    # ==================================================================
+    # MODEL LOADING (only when llama-server is started by this script)
+    # ==================================================================
+    model_load_duration = None
+    if llama_server is not None:
+        print("\n--- Waiting for llama-server to load the model ---")
+        try:
+            model_load_duration = llama_server.wait_until_ready()
+            print(f"BENCHMARK: Model loading took {model_load_duration:.4f} seconds.")
+        except RuntimeError as e:
+            print(f"Warning: {e}")
+
+
     # ==================================================================
     # WARMUP: LLM
     # ==================================================================
-    print("\n--- Warming up LLM ---")
+    print("\n--- Warming up LLM (pre-warming every slot with the prompt prefix) ---")
     try:
-        # Use a long string to warm up KV cache (content doesn't matter, just length)
-        warmup_prompt = "warmup " * 100  # ~100 tokens to warm up the model
-
-        with LLMClient(base_url=LLAMA_SERVER_BASE_URL, api_key="dummy") as client:
+        with LLMClient(base_url=llm_base_url, api_key="dummy") as client:
             start_warmup = time.time()
-            _ = client.chat.completions.create(
-                model=DEFAULT_LLM_SERVER_MODEL,
-                messages=[{"role": "user", "content": warmup_prompt}],
-                temperature=LLM_GEN_TEMPERATURE,
-                max_tokens=MAX_LLM_GEN_TOKENS,
-                stream=False
-            )
+            prewarmed = prewarm_slots(client, retrieval=bool(FAISS_INDEX_PATH))
             warmup_duration = time.time() - start_warmup
+            for slot, slot_duration, prompt_n in prewarmed:
+                tokens = f", {prompt_n} prefix tokens" if prompt_n is not None else ""
+                print(f"  Slot {slot}: {slot_duration:.2f}s{tokens}")
             print(f"LLM warmed up in {warmup_duration:.2f} seconds.")
     except Exception as e:
         print(f"Warning: Could not warm up LLM: {e}")
@@ -183,46 +325,11 @@ def main():
     print(f"Using prompt format: {PROMPT_FORMAT}")
 
     # Prepare the messages based on the selected prompt format
-    if not FAISS_INDEX_PATH:
-        system_message = "Instructions: Provide clear, concise answers based on what you know. Limit your response to 3-4 sentences maximum. Be direct and avoid unnecessary elaboration."
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": query}
-        ]
-    else:
-        if PROMPT_FORMAT == "lfm2-rag":
-            # LFM2-RAG format: system message with documents, user message with question
-            documents_str = ""
-            for i, chunk in enumerate(retrieved_chunks, 1):
-                documents_str += f"<document{i}>\n{chunk}\n</document{i}>\n\n"
-
-            system_message = f"""The following documents may provide you additional information to answer questions:
-
-    {documents_str.strip()}
-
-    Instructions: Provide clear, concise answers based only on the information in the documents. Limit your response to 3-4 sentences maximum. Be direct and avoid unnecessary elaboration."""
-            messages = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": query}
-            ]
+    with span("prompt_build"):
+        if not FAISS_INDEX_PATH:
+            messages = build_messages(query, prompt_format=PROMPT_FORMAT)
         else:
-            # Default format: single user message with context and question
-            context_str = "\n\n".join(retrieved_chunks)
-            prompt = f"""Based on the following context, please answer the user's question concisely and directly.
-    If the context does not contain the answer, state that the information is not available in the provided context.
-    Limit your response to 3-4 sentences maximum. Be clear and focused - avoid unnecessary elaboration.
-
-    Context:
-    {context_str}
-
-    Question:
-    {query}
-
-    Answer:
-    """
-            messages = [
-                {"role": "user", "content": prompt}
-            ]
+            messages = build_messages(query, retrieved_chunks, prompt_format=PROMPT_FORMAT)
 
     # Debug: Print the prompt if DEBUG_PROMPT is enabled
     if DEBUG_PROMPT:
@@ -235,25 +342,52 @@ def main():
             print("-"*60)
         print("="*60 + "\n")
 
+    if COMPARE_PREWARM:
+        # First query on the pre-warmed slots, then the same query with the prompt cache skipped
+        print("Timing the first query with and without the pre-warmed prefix...")
+        first_query = {}
+        try:
+            with LLMClient(base_url=llm_base_url, api_key="dummy") as client:
+                for label, cache_prompt in (("pre-warmed", True), ("without pre-warm", False)):
+                    start_time_llm = time.time()
+                    response = client.chat.completions.create(
+                        model=DEFAULT_LLM_SERVER_MODEL,
+                        messages=messages,
+                        temperature=LLM_GEN_TEMPERATURE,
+                        max_tokens=MAX_LLM_GEN_TOKENS,
+                        stream=False,
+                        cache_prompt=cache_prompt
+                    )
+                    first_query[label] = (time.time() - start_time_llm, response.timings)
+        except Exception as e:
+            print(f"Warning: Could not time the first query: {e}")
+        for label, (duration, timings) in first_query.items():
+            prefill = (f" (prefill {timings.prompt_n} tokens in {timings.prompt_ms / 1000:.4f}s, "
+                       f"{timings.cache_n} reused)" if timings is not None else "")
+            print(f"BENCHMARK: First query {label}: {duration:.4f} seconds{prefill}")
+        print()
+
     print(f"Running LLM generation {N_LLM_RUNS} times for statistics...")
     print(f"(Using temperature={LLM_GEN_TEMPERATURE} and max_tokens={MAX_LLM_GEN_TOKENS} for consistency)\n")
     llm_durations = []
+    server_timings = []  # llama-server's prefill / decode timings per run
     generated_text = ""
 
     try:
         # Initialize the LLM client
-        with LLMClient(base_url=LLAMA_SERVER_BASE_URL, api_key="dummy") as client:
+        with LLMClient(base_url=llm_base_url, api_key="dummy") as client:
             for run in range(N_LLM_RUNS):
                 print(f"  Run {run + 1}/{N_LLM_RUNS}...")
                 start_time_llm = time.time()
 
-                response = client.chat.completions.create(
-                    model=DEFAULT_LLM_SERVER_MODEL,
-                    messages=messages,
-                    temperature=LLM_GEN_TEMPERATURE,
-                    max_tokens=MAX_LLM_GEN_TOKENS,
-                    stream=False
-                )
+                with span("generate", run=run):
+                    response = client.chat.completions.create(
+                        model=DEFAULT_LLM_SERVER_MODEL,
+                        messages=messages,
+                        temperature=LLM_GEN_TEMPERATURE,
+                        max_tokens=MAX_LLM_GEN_TOKENS,
+                        stream=False
+                    )
 
                 end_time_llm = time.time()
                 llm_duration = end_time_llm - start_time_llm
@@ -261,6 +395,12 @@ def main():
 
                 current_output = response.choices[0].message.content.strip()
                 print(f"    Time: {llm_duration:.4f}s")
+                if response.timings is not None:
+                    server_timings.append(response.timings)
+                    print(f"    Prefill: {response.timings.prompt_n} tokens in {response.timings.prompt_ms / 1000:.4f}s "
+                          f"({response.timings.prompt_per_second:.1f} tokens/s)")
+                    print(f"    Decode:  {response.timings.predicted_n} tokens in {response.timings.predicted_ms / 1000:.4f}s "
+                          f"({response.timings.predicted_per_second:.1f} tokens/s)")
                 print(f"    Output: {current_output}\n")
 
                 # Save the first response to display
@@ -280,17 +420,38 @@ def main():
     print("-----------------------------------------------------")
     print(f"BENCHMARK: LLM Generation (avg over {N_LLM_RUNS} runs): {llm_mean:.4f} ± {llm_std:.4f} seconds")
     print(f"           Min: {min(llm_durations):.4f}s, Max: {max(llm_durations):.4f}s")
+    if server_timings:
+        prefill_rate = np.mean([t.prompt_per_second for t in server_timings])
+        decode_rate = np.mean([t.predicted_per_second for t in server_timings])
+        prefill_time = np.mean([t.prompt_ms for t in server_timings]) / 1000
+        decode_time = np.mean([t.predicted_ms for t in server_timings]) / 1000
+        print(f"BENCHMARK: Prefill: {prefill_rate:.1f} tokens/s ({prefill_time:.4f}s avg), "
+              f"Decode: {decode_rate:.1f} tokens/s ({decode_time:.4f}s avg)")
+        # Whatever the server did not spend on prefill / decode is HTTP and client overhead
+        print(f"BENCHMARK: Client overhead: {(llm_mean - prefill_time - decode_time) * 1000:.1f} ms per request")
+    else:
+        print("           (server reported no timings; prefill / decode split unavailable)")
     print("-----------------------------------------------------")
     
     print("\n--- Benchmark Summary ---")
+    if model_load_duration is not None:
+        print(f"  Model Loading:       {model_load_duration:.4f} seconds (one-time, not part of query latency)")
     print(f"  Indexing:            {indexing_duration:.4f} seconds")
     print("--------------------------")
     print(f"  Encoding Query:      {encoding_duration:.4f} seconds")
     print(f"  Retrieval:           {retrieval_duration:.4f} seconds")
     print(f"  LLM Generation:      {llm_mean:.4f} ± {llm_std:.4f} seconds (avg of {N_LLM_RUNS} runs)")
+    if server_timings:
+        print(f"    Prefill:           {prefill_time:.4f} seconds ({prefill_rate:.1f} tokens/s)")
+        print(f"    Decode:            {decode_time:.4f} seconds ({decode_rate:.1f} tokens/s)")
     print("--------------------------")
     print(f"  Total RAG Pipeline:  {encoding_duration + retrieval_duration + llm_mean:.4f} seconds (excluding one-time indexing)")
 
+    if PROFILE_TRACE_PATH:
+        profiling.print_report(show_captures=PROFILE_CPROFILE or PROFILE_TRACEMALLOC)
+        profiling.export_chrome_trace(PROFILE_TRACE_PATH)
+        print(f"Stage trace written to {PROFILE_TRACE_PATH}")
+
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,11 @@
 import os
 import time
 import numpy as np
-import faiss
-import requests
 import json
 import re
 import argparse
-from sentence_transformers import SentenceTransformer
+from llm_client import LLMClient
+from interactive_session import InteractiveSession, run_session, add_session_arguments
 
 # --- Configuration ---
 TEXT_FILE_PATH = "my_document.txt"
@@ -20,7 +19,8 @@ CHUNK_OVERLAP_CHARS = 100
 
 TOP_K = 6
 OLLAMA_MODEL_NAME = "gemma3:1b"
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
+OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_KEEP_ALIVE = "30m" # Keep the model loaded between queries
 
 
 # --- Pre-processing Function ---
@@ -85,6 +85,7 @@ def recursive_character_splitter(text: str, chunk_size: int, chunk_overlap: int)
 
 def create_and_save_index(text_file, index_path, chunks_path, model):
     """Reads, PREPROCESSES, and chunks a text file to create and save a FAISS index."""
+    import faiss
     print("--- Creating new FAISS index using Recursive Character Splitting ---")
     start_time = time.time()
 
@@ -132,6 +133,7 @@ def create_and_save_index(text_file, index_path, chunks_path, model):
 
 def load_existing_index(index_path, chunks_path):
     """Loads a pre-existing FAISS index and its corresponding chunks."""
+    import faiss
     print("--- Loading existing FAISS index ---")
     try:
         index = faiss.read_index(index_path)
@@ -155,6 +157,7 @@ def main():
         action='store_true',  # This makes it a flag: if present, args.verbose is True
         help="Print the full context being sent to the LLM for each query."
     )
+    add_session_arguments(parser)
     args = parser.parse_args()
 
     print("--- Interactive RAG Benchmark with Recursive Splitting & Preprocessing ---")
@@ -162,6 +165,7 @@ def main():
 
     # Load the embedding model
     print(f"Loading embedding model: {EMBEDDING_MODEL_NAME}...")
+    from sentence_transformers import SentenceTransformer
     model = SentenceTransformer(EMBEDDING_MODEL_NAME)
     print("Embedding model loaded.")
 
@@ -175,28 +179,21 @@ def main():
         print("Failed to load or create an index. Exiting.")
         return
 
-    # --- Interactive Query Loop ---
-    print("\n--- Ready to Chat! ---")
-    print("Enter your query below. Type 'quit' or 'exit' to stop.")
-    
-    while True:
-        query = input("\nQuery: ")
-        if query.lower() in ['quit', 'exit']:
-            print("Exiting...")
-            break
+    # One client for the whole session, so the connection to Ollama is reused
+    client = LLMClient(base_url=OLLAMA_BASE_URL, api="ollama", keep_alive=OLLAMA_KEEP_ALIVE)
 
-        # STAGE 1: SEARCH & RETRIEVAL
-        start_retrieval_time = time.time()
+    def search(query):
         query_embedding = model.encode([query])
         D, I = index.search(np.array(query_embedding).astype('float32'), TOP_K)
-        retrieved_chunks = [chunks[i] for i in I[0]]
-        end_retrieval_time = time.time()
-        retrieval_duration = end_retrieval_time - start_retrieval_time
-        
-        context_str = "\n\n".join(retrieved_chunks)
+        return [chunks[i] for i in I[0]]
 
-        # STAGE 2: LLM RESPONSE GENERATION
-        prompt = f"""
+    def build_prompt(query, retrieved_chunks):
+        context_str = "\n\n".join(retrieved_chunks)
+        if args.verbose:
+            print("\n\n--- [VERBOSE] Context Sent to LLM ---")
+            print(context_str)
+            print("---------------------------------------")
+        return f"""
 Based on the following context, please answer the user's question.
 If the context does not contain the answer, state that the information is not available.
 
@@ -208,34 +205,12 @@ Question:
 
 Answer:
 """
-        start_llm_time = time.time()
-        try:
-            response = requests.post(
-                OLLAMA_API_URL,
-                json={"model": OLLAMA_MODEL_NAME, "prompt": prompt, "stream": False},
-                timeout=120
-            )
-            response.raise_for_status()
-            generated_text = response.json().get('response', '').strip()
-        except requests.exceptions.RequestException as e:
-            generated_text = f"Error communicating with Ollama: {e}"
-
-        end_llm_time = time.time()
-        llm_duration = end_llm_time - start_llm_time
 
-        if args.verbose:
-            print("\n\n--- [VERBOSE] Context Sent to LLM ---")
-            print(context_str)
-            print("---------------------------------------")
-
-        # --- Display Results ---
-        print("\n--- Answer ---")
-        print(generated_text)
-        print("\n--- Benchmarks ---")
-        print(f"  Search & Retrieval: {retrieval_duration:.4f} seconds")
-        print(f"  LLM Generation:     {llm_duration:.4f} seconds")
-        print(f"  Total Time:         {retrieval_duration + llm_duration:.4f} seconds")
-        print("--------------------")
+    session = InteractiveSession(client, OLLAMA_MODEL_NAME, search, build_prompt)
+    try:
+        run_session(session, replay=args.replay, pause=args.replay_pause, output=args.output)
+    finally:
+        client.close()
 
 if __name__ == "__main__":
     main()
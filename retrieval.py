@@ -0,0 +1,463 @@
+"""Shared query path for the RAG benchmarks.
+
+Wraps a FAISS index, its chunks, the embedding model and (optionally) the BM25
+inverted index and topic index built by index_generation_optimized.py, and
+exposes a single `Retriever.search()` that supports vector, BM25 and hybrid
+retrieval, optionally scoped to a topic. Candidates can be diversified with
+maximal-marginal-relevance (MMR) selection, and overlapping or adjacent hits
+can be merged into single passages before prompt assembly (see chunk_merging.py).
+
+In hybrid mode query encoding + FAISS search and BM25 search run in parallel
+threads (both release the GIL for their heavy lifting) and their rankings are
+merged with reciprocal-rank fusion.
+"""
+
+import os
+import time
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from inverted_index import InvertedIndex
+from topic_index import TopicIndex
+from chunk_merging import chunk_positions_exist, load_chunk_positions, merge_adjacent_chunks
+from profiling import span, profiled
+
+
+RETRIEVAL_MODES = ("vector", "bm25", "hybrid")
+
+# Constant from the original RRF paper (Cormack et al., 2009)
+RRF_K = 60
+
+# How many candidates each retriever contributes to the fusion, relative to top_k
+HYBRID_CANDIDATE_MULTIPLIER = 4
+
+# MMR: trade-off between relevance (1.0) and diversity (0.0), and over-fetch factor
+MMR_LAMBDA = 0.5
+MMR_CANDIDATE_MULTIPLIER = 4
+
+# faiss and sentence-transformers (torch) are imported where they are used: importing
+# them takes seconds on a Pi, which paths that never search should not pay
+
+
+def load_embedding_model(model_name: str):
+    """Construct a sentence-transformers model (imports sentence-transformers on first use)."""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def needs_embedding_model(mode: str, mmr: bool = False) -> bool:
+    """Whether searches in this mode encode the query (BM25 alone only does with MMR)."""
+    return mode != "bm25" or mmr
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], top_k: int,
+                           k: int = RRF_K) -> Tuple[List[float], List[int]]:
+    """Fuse several ranked lists of chunk IDs with reciprocal-rank fusion.
+
+    Each ID scores sum(1 / (k + rank)) over the lists it appears in (rank starts at 1).
+
+    Returns:
+        Tuple of (scores, ids) for the best top_k IDs, best first
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, 1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank)
+
+    best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [score for _, score in best], [chunk_id for chunk_id, _ in best]
+
+
+def maximal_marginal_relevance(query_vector: np.ndarray, candidate_vectors: np.ndarray,
+                               k: int, lambda_mult: float = MMR_LAMBDA) -> List[int]:
+    """Select k diverse candidates with maximal-marginal-relevance.
+
+    Each step picks the candidate maximizing
+        lambda * sim(query, c) - (1 - lambda) * max(sim(c, s) for s already selected)
+    using cosine similarity. All similarities come from two matrix products and the
+    per-step update is a vectorized maximum, so the only Python loop runs k times.
+
+    Args:
+        query_vector: Query embedding, shape (dim,) or (1, dim)
+        candidate_vectors: Candidate embeddings, shape (n, dim), in retrieval order
+        k: Number of candidates to select
+        lambda_mult: Relevance / diversity trade-off in [0, 1]
+
+    Returns:
+        Positions (into candidate_vectors) of the selected candidates, in selection order
+    """
+    n = len(candidate_vectors)
+    k = min(k, n)
+    if k == 0:
+        return []
+
+    candidates = candidate_vectors / np.maximum(np.linalg.norm(candidate_vectors, axis=1, keepdims=True), 1e-12)
+    query = query_vector.reshape(-1)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = lambda_mult * (candidates @ query)
+    redundancy_weight = 1.0 - lambda_mult
+    pairwise = candidates @ candidates.T
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = pairwise[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    for _ in range(k - 1):
+        scores = np.where(available, relevance - redundancy_weight * max_similarity, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, pairwise[best], out=max_similarity)
+
+    return selected
+
+
+class RetrievalResult:
+    """Chunks returned by a search, with per-stage timings in seconds.
+
+    `passages` are the texts to put into the prompt: the merged passages when
+    merging was requested, otherwise the chunks themselves.
+    """
+    def __init__(self, ids: List[int], scores: List[float], chunks: List[str],
+                 timings: Dict[str, float], passages: Optional[List[str]] = None):
+        self.ids = ids
+        self.scores = scores
+        self.chunks = chunks
+        self.timings = timings
+        self.passages = passages if passages is not None else chunks
+
+
+class Retriever:
+    """Runs queries against a loaded index bundle.
+
+    Example:
+        retriever = load_retriever("index_optimized_sentence_3_1.faiss", model)
+        result = retriever.search("What is the song Bossy about?", top_k=3, mode="hybrid")
+        for chunk in result.chunks:
+            print(chunk)
+        print(result.timings)  # {'encode': ..., 'vector_search': ..., 'bm25_search': ..., ...}
+
+        # Only search chunks under a topic (and its subtopics)
+        result = retriever.search("How much did it cost?", topic="Sinclair Sovereign")
+
+        # Over-fetch and pick diverse chunks with MMR
+        result = retriever.search(query, top_k=3, mmr=True)
+
+        # Merge overlapping / adjacent hits before building the prompt
+        result = retriever.search(query, top_k=5, merge_adjacent=True)
+        messages = build_messages(query, result.passages)
+    """
+
+    def __init__(self, index, chunks: List[str], model: Union[str, object],
+                 inverted_index: Optional[InvertedIndex] = None,
+                 topic_index: Optional[TopicIndex] = None,
+                 positions: Optional[np.ndarray] = None, position_unit: str = "sentence"):
+        self.index = index
+        self.chunks = chunks
+        # A model name defers constructing the model until the first query encodes
+        self._model = model
+        self._model_lock = threading.Lock()
+        self.inverted_index = inverted_index
+        self.topic_index = topic_index
+        self.positions = positions
+        self.position_unit = position_unit
+        self._direct_map_ready = False
+        # Two workers: one for encode + FAISS, one for BM25
+        self._executor = ThreadPoolExecutor(max_workers=2)
+
+    @property
+    def model(self):
+        """The embedding model; constructed on first use when a model name was given."""
+        if isinstance(self._model, str):
+            with self._model_lock:
+                if isinstance(self._model, str):
+                    with span("load_model"):
+                        self._model = load_embedding_model(self._model)
+        return self._model
+
+    def encode(self, query: str) -> np.ndarray:
+        """Embed a query into a float32 array of shape (1, dim)."""
+        return np.array(self.model.encode([query])).astype('float32')
+
+    def _search_parameters(self, allowed_ids: np.ndarray):
+        """Build FAISS search parameters that restrict the search to `allowed_ids`."""
+        import faiss
+        if allowed_ids[-1] - allowed_ids[0] + 1 == len(allowed_ids):
+            # Chunks of a topic are usually contiguous, a range check is cheapest
+            selector = faiss.IDSelectorRange(int(allowed_ids[0]), int(allowed_ids[-1]) + 1)
+        else:
+            selector = faiss.IDSelectorBatch(allowed_ids)
+
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+        elif isinstance(self.index, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.index.hnsw.efSearch)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        # The parameters only hold a raw pointer to the selector, keep it alive
+        params.selector_ref = selector
+        return params
+
+    def _vector_search(self, query: str, k: int, allowed_ids: Optional[np.ndarray] = None):
+        start = time.perf_counter()
+        with span("encode"):
+            query_embedding = self.encode(query)
+        encode_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with span("vector_search", k=k):
+            if allowed_ids is None:
+                D, I = self.index.search(query_embedding, k)
+            else:
+                D, I = self.index.search(query_embedding, k, params=self._search_parameters(allowed_ids))
+        search_duration = time.perf_counter() - start
+
+        # FAISS pads with -1 when fewer than k vectors are available
+        keep = I[0] >= 0
+        return (D[0][keep].tolist(), I[0][keep].tolist(),
+                {"encode": encode_duration, "vector_search": search_duration}, query_embedding)
+
+    def _bm25_search(self, query: str, k: int, allowed_ids: Optional[np.ndarray] = None):
+        start = time.perf_counter()
+        with span("bm25_search", k=k):
+            scores, ids = self.inverted_index.search(query, k, allowed_ids=allowed_ids)
+        duration = time.perf_counter() - start
+        return scores.tolist(), ids.tolist(), {"bm25_search": duration}, None
+
+    def reconstruct(self, ids: Sequence[int]) -> np.ndarray:
+        """Fetch the stored vectors of the given chunk IDs from the FAISS index."""
+        if not self._direct_map_ready:
+            import faiss
+            # IVF indexes need an ID -> list position map before they can reconstruct
+            ivf = faiss.try_extract_index_ivf(self.index)
+            if ivf is not None:
+                ivf.make_direct_map()
+            self._direct_map_ready = True
+        return self.index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+
+    def _mmr_rerank(self, query: str, query_embedding: Optional[np.ndarray],
+                    scores: List[float], ids: List[int], top_k: int, lambda_mult: float):
+        if not ids:
+            return scores, ids, {}
+        timings = {}
+        if query_embedding is None:
+            # BM25-only search did not encode the query
+            start = time.perf_counter()
+            query_embedding = self.encode(query)
+            timings["encode"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        selected = maximal_marginal_relevance(query_embedding, self.reconstruct(ids), top_k, lambda_mult)
+        timings["mmr"] = time.perf_counter() - start
+        return [scores[i] for i in selected], [ids[i] for i in selected], timings
+
+    @profiled("search")
+    def search(self, query: str, top_k: int = 3, mode: str = "vector",
+               topic: Optional[Union[str, Sequence[str]]] = None,
+               merge_adjacent: bool = False, mmr: bool = False,
+               mmr_lambda: float = MMR_LAMBDA) -> RetrievalResult:
+        """Retrieve the top_k chunks for a query.
+
+        Args:
+            query: Query text
+            top_k: Number of chunks to return
+            mode: "vector" (FAISS), "bm25" (inverted index) or "hybrid" (both, fused with RRF)
+            topic: Optional topic path (or list of paths); only chunks under it are searched
+            merge_adjacent: If True, merge hits that overlap or touch within a section
+                into single passages (result.passages)
+            mmr: If True, over-fetch top_k * MMR_CANDIDATE_MULTIPLIER candidates and
+                select top_k of them with maximal-marginal-relevance
+            mmr_lambda: MMR relevance / diversity trade-off (1.0 = pure relevance)
+
+        Returns:
+            RetrievalResult with ids, scores, chunk texts and timings
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        if mode != "vector" and self.inverted_index is None:
+            raise ValueError(f"Retrieval mode '{mode}' needs a BM25 index; "
+                             "rebuild the index with index_generation_optimized.py")
+
+        if topic is not None and self.topic_index is None:
+            raise ValueError("Topic filtering needs a topic index; "
+                             "rebuild the index with index_generation_optimized.py")
+        if merge_adjacent and self.positions is None:
+            raise ValueError("Merging adjacent chunks needs chunk positions; "
+                             "rebuild the index with index_generation_optimized.py")
+
+        start_total = time.perf_counter()
+
+        allowed_ids = None
+        filter_timings = {}
+        if topic is not None:
+            start = time.perf_counter()
+            allowed_ids = self.topic_index.select_ids(topic)
+            filter_timings["topic_filter"] = time.perf_counter() - start
+            if len(allowed_ids) == 0:
+                filter_timings["total"] = time.perf_counter() - start_total
+                return RetrievalResult(ids=[], scores=[], chunks=[], timings=filter_timings)
+            top_k = min(top_k, len(allowed_ids))
+
+        fetch_k = top_k * MMR_CANDIDATE_MULTIPLIER if mmr else top_k
+        if allowed_ids is not None:
+            fetch_k = min(fetch_k, len(allowed_ids))
+
+        if mode == "vector":
+            scores, ids, timings, query_embedding = self._vector_search(query, fetch_k, allowed_ids)
+        elif mode == "bm25":
+            scores, ids, timings, query_embedding = self._bm25_search(query, fetch_k, allowed_ids)
+        else:
+            n_candidates = fetch_k * HYBRID_CANDIDATE_MULTIPLIER
+            vector_future = self._executor.submit(self._vector_search, query, n_candidates, allowed_ids)
+            bm25_future = self._executor.submit(self._bm25_search, query, n_candidates, allowed_ids)
+            _, vector_ids, vector_timings, query_embedding = vector_future.result()
+            _, bm25_ids, bm25_timings, _ = bm25_future.result()
+
+            start = time.perf_counter()
+            scores, ids = reciprocal_rank_fusion([vector_ids, bm25_ids], fetch_k)
+            timings = {**vector_timings, **bm25_timings,
+                       "fusion": time.perf_counter() - start}
+
+        if mmr:
+            scores, ids, mmr_timings = self._mmr_rerank(query, query_embedding, scores, ids, top_k, mmr_lambda)
+            timings.update(mmr_timings)
+
+        timings.update(filter_timings)
+        chunks = [self.chunks[i] for i in ids]
+
+        passages = None
+        if merge_adjacent:
+            start = time.perf_counter()
+            passages = merge_adjacent_chunks(ids, chunks, self.positions, self.position_unit)
+            timings["merge"] = time.perf_counter() - start
+
+        timings["total"] = time.perf_counter() - start_total
+        return RetrievalResult(
+            ids=ids,
+            scores=scores,
+            chunks=chunks,
+            timings=timings,
+            passages=passages
+        )
+
+    def close(self):
+        """Shut down the worker threads."""
+        self._executor.shutdown(wait=False)
+
+
+def index_metadata_exists(prefix: str) -> bool:
+    """Check whether index metadata was saved under `prefix` (<prefix>.meta.json)."""
+    return os.path.exists(prefix + ".meta.json")
+
+
+def load_index_metadata(prefix: str) -> Dict:
+    """Load the metadata saved with save_index_metadata(), or {} if there is none."""
+    if not index_metadata_exists(prefix):
+        return {}
+    with open(prefix + ".meta.json", 'r') as f:
+        return json.load(f)
+
+
+def save_index_metadata(prefix: str, metadata: Dict):
+    """Merge `metadata` into <prefix>.meta.json (top-level keys are replaced)."""
+    merged = load_index_metadata(prefix)
+    merged.update(metadata)
+    with open(prefix + ".meta.json", 'w') as f:
+        json.dump(merged, f, indent=2)
+
+
+def _build_parameter_mismatches(index, build_parameters: Dict) -> List[str]:
+    """Build parameters (nlist, M) that `index` was not built with, as "name=expected (index: actual)"."""
+    import faiss
+    mismatches = []
+    if "nlist" in build_parameters:
+        ivf = faiss.try_extract_index_ivf(index)
+        actual = ivf.nlist if ivf is not None else None
+        if actual != build_parameters["nlist"]:
+            mismatches.append(f"nlist={build_parameters['nlist']} (index: {actual})")
+    if "M" in build_parameters:
+        # nb_neighbors(0) is 2*M, so level 1 gives M itself
+        actual = index.hnsw.nb_neighbors(1) if isinstance(index, faiss.IndexHNSW) else None
+        if actual != build_parameters["M"]:
+            mismatches.append(f"M={build_parameters['M']} (index: {actual})")
+    return mismatches
+
+
+def apply_search_parameters(index, parameters: Dict, build_parameters: Optional[Dict] = None) -> Dict:
+    """Set the search-time parameters that apply to this index type.
+
+    Search parameters are tuned for one index build: an nprobe swept on an IVF
+    index with nlist=256 does not carry over to one with nlist=1024. If
+    `build_parameters` are given and the index does not match them, nothing is
+    applied and a warning is printed.
+
+    Args:
+        index: FAISS index
+        parameters: e.g. {"nprobe": 8} for IVF or {"efSearch": 64} for HNSW indexes;
+            parameters for other index types are ignored
+        build_parameters: Parameters the search parameters were tuned for, e.g.
+            {"nlist": 256} or {"M": 32, "efConstruction": 40}
+
+    Returns:
+        The parameters that were applied
+    """
+    import faiss
+    applied = {}
+    mismatches = _build_parameter_mismatches(index, build_parameters or {})
+    if mismatches and parameters:
+        print(f"Warning: ignoring search parameters {parameters}: they were tuned for "
+              f"{', '.join(mismatches)}; re-run index_param_sweep.py for this index")
+        return applied
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and "nprobe" in parameters:
+        ivf.nprobe = int(parameters["nprobe"])
+        applied["nprobe"] = ivf.nprobe
+    if isinstance(index, faiss.IndexHNSW) and "efSearch" in parameters:
+        index.hnsw.efSearch = int(parameters["efSearch"])
+        applied["efSearch"] = index.hnsw.efSearch
+    return applied
+
+
+def load_retriever(faiss_index_path: str, model) -> Retriever:
+    """Load a FAISS index, its chunks and (if present) its BM25 index, topic index
+    and chunk positions. Search parameters recommended by index_param_sweep.py
+    (stored in the index metadata) are applied if the index still matches the
+    build parameters they were tuned for.
+
+    Args:
+        faiss_index_path: Path to the FAISS index file
+        model: Loaded sentence transformer model used to encode queries, or its
+            name to construct it on the first query that needs it
+
+    Returns:
+        Retriever for the index
+    """
+    import faiss
+    index = faiss.read_index(faiss_index_path)
+    metadata = load_index_metadata(faiss_index_path)
+    apply_search_parameters(index, metadata.get("search_parameters", {}), metadata.get("build_parameters", {}))
+
+    with open(faiss_index_path + ".json", 'r') as f:
+        chunks = json.load(f)
+
+    inverted_index = None
+    if InvertedIndex.exists(faiss_index_path):
+        inverted_index = InvertedIndex.load(faiss_index_path, mmap=True)
+
+    topic_index = None
+    if TopicIndex.exists(faiss_index_path):
+        topic_index = TopicIndex.load(faiss_index_path)
+
+    positions, position_unit = None, "sentence"
+    if chunk_positions_exist(faiss_index_path):
+        positions, position_unit = load_chunk_positions(faiss_index_path)
+
+    return Retriever(index, chunks, model, inverted_index=inverted_index, topic_index=topic_index,
+                     positions=positions, position_unit=position_unit)
@@ -0,0 +1,122 @@
+"""Group streamed LLM token deltas into complete sentences for text-to-speech.
+
+A TTS engine can start speaking as soon as the first sentence of the answer
+exists, so the latency a voice user hears is time to first sentence, not
+time to the finished answer. SentenceSplitter takes the deltas as they
+arrive and returns every sentence as soon as it is known to be complete.
+
+A sentence ends at '.', '!', '?' or '...' (plus closing quotes or brackets),
+followed by whitespace and a character that does not continue the sentence,
+or at a blank line. So the splitter waits for the first character after the
+whitespace, usually one more token, before it hands a sentence over. It does
+not end a sentence:
+
+    - when the next character is lower case ("approx. the same")
+    - after a known abbreviation ("Dr.", "No.", "St.", "e.g.", "U.S.")
+    - after a single capital letter, i.e. an initial ("J. R. R. Tolkien")
+    - after a list number at the start of a sentence ("1. First ...")
+    - inside numbers ("3.14", "1,000") or wikitext's " @.@ " / " @,@ "
+      separators ("1 @.@ 5"), which never have whitespace after the period
+
+Wikitext puts spaces around punctuation and currency symbols ("It cost
+GB £ 30 ."), and the model often copies that style from the retrieved
+chunks, so a period after a space ends a sentence like an attached one.
+
+Sentences are returned stripped and otherwise exactly as generated.
+
+Example:
+    for sentence in stream_sentences(client.chat.completions.stream_content(model, messages)):
+        tts.speak(sentence)
+"""
+
+import re
+from typing import Iterable, Iterator, List, Optional
+
+
+ABBREVIATIONS = frozenset((
+    "mr", "mrs", "ms", "dr", "prof", "st", "jr", "sr", "vs", "no", "nos", "vol", "vols", "fig", "figs",
+    "approx", "ca", "c", "inc", "ltd", "co", "corp", "dept", "mt", "ft", "gen", "col", "lt", "sgt", "capt",
+    "rev", "hon", "op", "pp", "ed", "eds", "cf", "al", "jan", "feb", "mar", "apr", "jun", "jul", "aug",
+    "sep", "sept", "oct", "nov", "dec",
+))
+
+# Terminator, closing quotes / brackets, whitespace, and the first character after it
+_BOUNDARY = re.compile(r'(\.\.\.|…|[.!?]+)(["\'”’)\]]*)(\s+)(\S)|\n\s*\n(?=\S)')
+_ATTACHED_WORD = re.compile(r'(\S+)$')
+_DOTTED_ABBREVIATION = re.compile(r'^(?:[A-Za-z]\.)+[A-Za-z]$')
+_LIST_NUMBER = re.compile(r'^\s*\d+$')
+
+
+class SentenceSplitter:
+    """Incremental sentence segmentation of streamed text.
+
+    Example:
+        splitter = SentenceSplitter()
+        for delta in deltas:
+            for sentence in splitter.feed(delta):
+                speak(sentence)
+        rest = splitter.flush()
+    """
+
+    def __init__(self, abbreviations: Iterable[str] = ABBREVIATIONS):
+        self.abbreviations = frozenset(a.lower() for a in abbreviations)
+        self._buffer = ""
+
+    def _ends_sentence(self, before: str, terminator: str, next_char: str) -> bool:
+        """Whether `terminator` ends the sentence `before`, given the next non-space character."""
+        if next_char.islower():
+            return False
+        if terminator != ".":
+            return True
+        word = _ATTACHED_WORD.search(before)
+        if word is None:
+            # Wikitext's spaced-out " ." or a period on its own
+            return True
+        word = word.group(1).lstrip("\"'“‘([")
+        if word.lower() in self.abbreviations or _DOTTED_ABBREVIATION.match(word):
+            return False
+        if len(word) == 1 and word.isupper():
+            return False
+        return not _LIST_NUMBER.match(before)
+
+    def feed(self, delta: str) -> List[str]:
+        """Add streamed text.
+
+        Returns:
+            The sentences it completed, in order (often none)
+        """
+        self._buffer += delta
+        sentences = []
+        start = 0
+        position = 0
+        while True:
+            match = _BOUNDARY.search(self._buffer, position)
+            if match is None:
+                break
+            if match.group(1) is None or self._ends_sentence(self._buffer[start:match.start(1)],
+                                                             match.group(1), match.group(4)):
+                # The sentence ends before the whitespace (or the blank line)
+                end = match.start(3) if match.group(1) is not None else match.start()
+                sentence = self._buffer[start:end].strip()
+                if sentence:
+                    sentences.append(sentence)
+                start = match.end(3) if match.group(1) is not None else match.end()
+            # Rescan from the character after the whitespace, which may start the next terminator
+            position = match.start(4) if match.group(1) is not None else match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """The unfinished rest at the end of the stream, or None."""
+        rest, self._buffer = self._buffer.strip(), ""
+        return rest or None
+
+
+def stream_sentences(deltas: Iterable[str], splitter: Optional[SentenceSplitter] = None) -> Iterator[str]:
+    """Yield complete sentences from streamed text deltas as soon as each one ends."""
+    splitter = splitter or SentenceSplitter()
+    for delta in deltas:
+        yield from splitter.feed(delta)
+    rest = splitter.flush()
+    if rest:
+        yield rest
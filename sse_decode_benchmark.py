@@ -0,0 +1,156 @@
+"""Client-side CPU cost per streamed token of LLMClient's SSE decoding.
+
+A recorded SSE stream is replayed through httpx.MockTransport, so no server or
+network is involved and only the client's decoding work is measured. By
+default a stream of --n-tokens events in llama-server's chunk format is
+synthesized; a real one can be captured with e.g.
+
+    curl -sN http://localhost:8080/v1/chat/completions -H 'Content-Type: application/json' \
+        -d '{"messages": [{"role": "user", "content": "Tell me a story"}], "stream": true}' > stream.sse
+
+and replayed with --sse-file stream.sse.
+
+Compared paths:
+    lines + json:       line-based decoding with json.loads (the previous implementation)
+    chunks + json:      create(stream=True) on raw bytes, stdlib json
+    chunks + orjson:    create(stream=True) on raw bytes, orjson (if installed)
+    content + orjson:   stream_content(), plain strings only
+
+Example:
+    python sse_decode_benchmark.py --n-tokens 5000 --n-runs 5
+"""
+
+import json
+import time
+import argparse
+import httpx
+import llm_client
+from llm_client import LLMClient, _parse_chunk
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def synthesize_stream(n_tokens):
+    """Build an SSE body with n_tokens content events, formatted like llama-server's."""
+    created = int(time.time())
+    events = []
+    for i in range(n_tokens):
+        delta = {"content": f" word{i}"} if i else {"role": "assistant", "content": "Once"}
+        events.append({
+            "choices": [{"finish_reason": None, "index": 0, "delta": delta}],
+            "created": created, "id": "chatcmpl-bench", "model": "gpt-3.5-turbo",
+            "system_fingerprint": "b4500-adfa5a7e", "object": "chat.completion.chunk",
+        })
+    events.append({
+        "choices": [{"finish_reason": "stop", "index": 0, "delta": {}}],
+        "created": created, "id": "chatcmpl-bench", "model": "gpt-3.5-turbo",
+        "system_fingerprint": "b4500-adfa5a7e", "object": "chat.completion.chunk",
+    })
+    body = "".join(f"data: {json.dumps(event, separators=(',', ':'))}\n\n" for event in events)
+    return (body + "data: [DONE]\n\n").encode('utf-8')
+
+
+def split_events(body):
+    """Split a recorded body into one network read per event, as a server flushes them."""
+    return [event + b"\n\n" for event in body.split(b"\n\n") if event]
+
+
+def make_transport(reads):
+    def handler(request):
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=iter(reads))
+    return httpx.MockTransport(handler)
+
+
+def legacy_stream(http_client, url):
+    """Line-based decoding with json.loads, as llm_client did before."""
+    with http_client.stream('POST', url, json={"stream": True}) as response:
+        for line in response.iter_lines():
+            line = line.strip()
+            if not line or not line.startswith('data: '):
+                continue
+            data_str = line[6:]
+            if data_str == '[DONE]':
+                break
+            yield _parse_chunk(json.loads(data_str))
+
+
+def measure(run, n_runs):
+    """Best-of-n CPU seconds and item count for one decoding path."""
+    best = float('inf')
+    n_items = 0
+    for _ in range(n_runs):
+        start = time.process_time()
+        n_items = sum(1 for _ in run())
+        best = min(best, time.process_time() - start)
+    return best, n_items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure client-side CPU per streamed token')
+    parser.add_argument('--sse-file', type=str, default=None,
+                        help='Recorded SSE response to replay (default: synthesize one)')
+    parser.add_argument('--n-tokens', type=int, default=5000,
+                        help='Tokens in the synthesized stream (default: 5000)')
+    parser.add_argument('--n-runs', type=int, default=5, help='Runs per path, best is reported (default: 5)')
+    args = parser.parse_args()
+
+    if args.sse_file:
+        with open(args.sse_file, 'rb') as f:
+            body = f.read()
+    else:
+        body = synthesize_stream(args.n_tokens)
+    reads = split_events(body)
+    transport = make_transport(reads)
+    messages = [{"role": "user", "content": "Tell me a story"}]
+
+    client = LLMClient(base_url="http://replay/v1", transport=transport)
+    stdlib_client = httpx.Client(transport=transport)
+
+    def with_parser(loads, run):
+        def wrapped():
+            previous = llm_client._json_loads
+            llm_client._json_loads = loads
+            try:
+                yield from run()
+            finally:
+                llm_client._json_loads = previous
+        return wrapped
+
+    paths = [
+        ("lines + json", lambda: legacy_stream(stdlib_client, "http://replay/v1/chat/completions")),
+        ("chunks + json", with_parser(json.loads, lambda: client.chat.completions.create(
+            model="bench", messages=messages, stream=True))),
+        ("content + json", with_parser(json.loads, lambda: client.chat.completions.stream_content(
+            model="bench", messages=messages))),
+    ]
+    if orjson is not None:
+        paths += [
+            ("chunks + orjson", with_parser(orjson.loads, lambda: client.chat.completions.create(
+                model="bench", messages=messages, stream=True))),
+            ("content + orjson", with_parser(orjson.loads, lambda: client.chat.completions.stream_content(
+                model="bench", messages=messages))),
+        ]
+    else:
+        print("orjson is not installed; only the stdlib json paths are measured.")
+
+    results = []
+    for name, run in paths:
+        cpu, n_items = measure(run, args.n_runs)
+        results.append((name, cpu, n_items))
+    client.close()
+    stdlib_client.close()
+
+    n_tokens = len(reads) - 1
+    baseline = results[0][1]
+    print(f"\n--- SSE decoding, {n_tokens} events, {len(body) / 1024:.0f} KiB ---")
+    print(f"{'Path':>17} | {'CPU (ms)':>8} | {'us/token':>8} | {'Items':>6} | Speedup")
+    for name, cpu, n_items in results:
+        print(f"{name:>17} | {cpu * 1000:>8.1f} | {cpu * 1e6 / n_tokens:>8.2f} | {n_items:>6} | "
+              f"{baseline / cpu if cpu else 0.0:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,49 @@
 #!/bin/bash
+# Starts llama-server in the background through llama_server_manager.py, which
+# restarts it on crashes, and waits until the model is loaded.
+# Extra arguments are passed on, e.g. --threads 4 --ctx-size 4096 --parallel 2
+# The manager's output goes to llama_server.log, llama-server's own output
+# (model loading, requests) to llama_server_<port>.log.
 
 # Check if model path is provided
 if [ -z "$1" ]; then
-    echo "Usage: $0 <model_path>"
-    echo "Example: $0 models/LFM2-1.2B-RAG-Q4_K_M.gguf"
+    echo "Usage: $0 <model_path> [manager options]"
+    echo "Example: $0 models/LFM2-1.2B-RAG-Q4_K_M.gguf --parallel 2"
     exit 1
 fi
 
 MODEL_PATH="$1"
+shift
 LOG_FILE="llama_server.log"
+SERVER_LOG="llama_server_{port}.log"
 PID_FILE="llama_server.pid"
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 
 # Delete old log and PID files if they exist
 [ -f "$LOG_FILE" ] && rm "$LOG_FILE"
 [ -f "$PID_FILE" ] && rm "$PID_FILE"
 
-# Start the server in the background
+# Start the manager (and through it the server) in the background
 echo "Starting llama server with model: $MODEL_PATH"
-nohup llama-server -m "$MODEL_PATH" > "$LOG_FILE" 2>&1 &
+nohup python3 "$SCRIPT_DIR/llama_server_manager.py" "$MODEL_PATH" --server-log "$SERVER_LOG" "$@" \
+    > "$LOG_FILE" 2>&1 &
 SERVER_PID=$!
 
 # Save the PID
 echo "$SERVER_PID" > "$PID_FILE"
 
+# Wait for the model to load
+while kill -0 "$SERVER_PID" 2>/dev/null && ! grep -q "llama-server ready" "$LOG_FILE"; do
+    sleep 0.5
+done
+if ! kill -0 "$SERVER_PID" 2>/dev/null; then
+    echo "Llama server failed to start; see $LOG_FILE"
+    grep "Server log:" "$LOG_FILE"
+    exit 1
+fi
+grep "Model loading took" "$LOG_FILE"
+
 echo "Llama server started with PID: $SERVER_PID"
-echo "Logs are being written to: $LOG_FILE"
+echo "Manager log: $LOG_FILE"
+grep "Server log:" "$LOG_FILE"
 echo "To stop the server, run: kill $SERVER_PID"
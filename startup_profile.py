@@ -0,0 +1,170 @@
+"""Cold-start profile of the RAG entry points, with a time budget.
+
+Every entry point module is imported in a fresh interpreter with
+`python -X importtime`, --repeat times, and the report shows:
+
+    startup      wall time of `import <module>` minus a bare interpreter start
+                 (median over the repeats)
+    packages     import time attributed to every top-level package (self times
+                 summed, so each module is counted once)
+    slowest      the modules with the highest cumulative import time
+    heavy        which heavy dependencies (torch, sentence-transformers, faiss,
+                 transformers) the import pulled in
+
+Importing an entry point must not load the embedding model stack or faiss:
+rag_benchmark.py with FAISS_INDEX_PATH = None never searches, and the other
+entry points only need them once an index is loaded. The check fails (exit
+status 1) when an entry point's startup exceeds --budget-ms or it imports one
+of the heavy dependencies, so it can run as a regression gate after changes:
+
+    python startup_profile.py || echo "Cold start regressed"
+    python startup_profile.py --modules rag_benchmark,retrieval --budget-ms 500 --repeat 5
+
+Files are read from the page cache after the first repeat; run once after a
+reboot (or drop the caches) to see the disk-bound first start on a Pi.
+"""
+
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+import numpy as np
+
+
+ENTRY_POINTS = ("rag_benchmark,benchmark_harness,load_generator,model_matrix,retrieval,llm_client,"
+                "interactive_rag_benchmark,recursive_rag_benchmark,advanced_rag_benchmark")
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "faiss")
+# Import time on top of a bare interpreter start. The entry points measure 200-320 ms
+# (median of 5); the budget leaves room for noise, not for another heavy import
+STARTUP_BUDGET_MS = 400.0
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s*(\d+)\s*\|\s*(\d+)\s*\|( *)(\S+)")
+
+
+def timed_start(code, importtime=False):
+    """Run `python -c code` in a fresh interpreter.
+
+    Returns:
+        Tuple of (wall seconds, stderr)
+
+    Raises:
+        RuntimeError: If the interpreter exits with an error
+    """
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    start = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True)
+    duration = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip()
+                           else f"exit code {completed.returncode}")
+    return duration, completed.stderr
+
+
+def parse_importtime(stderr):
+    """-X importtime output -> list of (module, self seconds, cumulative seconds, depth)."""
+    modules = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) // 2))
+    return modules
+
+
+def package_breakdown(modules):
+    """Self import time summed per top-level package, largest first."""
+    packages = defaultdict(float)
+    for name, self_time, _, _ in modules:
+        packages[name.split('.')[0]] += self_time
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+
+def profile_module(module, repeat, baseline):
+    """Cold-start profile of `import module`.
+
+    Returns:
+        Dict with "startup" (median seconds over a bare interpreter), "runs",
+        "packages", "slowest" and "heavy"
+    """
+    runs = [timed_start(f"import {module}")[0] - baseline for _ in range(repeat)]
+    _, stderr = timed_start(f"import {module}", importtime=True)
+    modules = parse_importtime(stderr)
+    imported = {name.split('.')[0] for name, _, _, _ in modules}
+    return {
+        "module": module,
+        "startup": float(np.median(runs)),
+        "runs": runs,
+        "import_time": sum(self_time for _, self_time, _, _ in modules),
+        "packages": package_breakdown(modules),
+        "slowest": [(name, cumulative) for name, _, cumulative, _ in
+                    sorted(modules, key=lambda m: m[2], reverse=True)],
+        "heavy": [name for name in HEAVY_MODULES if name in imported],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-time profile and cold-start budget of the entry points')
+    parser.add_argument('--modules', type=str, default=ENTRY_POINTS,
+                        help=f'Comma-separated modules to import (default: {ENTRY_POINTS})')
+    parser.add_argument('--repeat', type=int, default=3, help='Fresh interpreters per module (default: 3)')
+    parser.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS,
+                        help=f'Maximum startup per module in ms (default: {STARTUP_BUDGET_MS:.0f})')
+    parser.add_argument('--allow-heavy', action='store_true',
+                        help=f'Do not fail when a module imports {", ".join(HEAVY_MODULES)}')
+    parser.add_argument('--top', type=int, default=8, help='Packages and modules listed per entry point (default: 8)')
+    parser.add_argument('--output', type=str, default=None, help='Write the profile as JSON to this file')
+    args = parser.parse_args()
+
+    baseline = float(np.median([timed_start("pass")[0] for _ in range(args.repeat)]))
+    print(f"Bare interpreter start: {baseline * 1000:.1f} ms (subtracted below)")
+
+    profiles = []
+    failures = []
+    for module in (m.strip() for m in args.modules.split(',') if m.strip()):
+        try:
+            profile = profile_module(module, args.repeat, baseline)
+        except RuntimeError as e:
+            print(f"\n{module}: import failed: {e}")
+            failures.append(module)
+            continue
+        profiles.append(profile)
+
+        over_budget = profile["startup"] * 1000 > args.budget_ms
+        heavy = profile["heavy"] and not args.allow_heavy
+        if over_budget or heavy:
+            failures.append(module)
+        print(f"\n--- {module}: {profile['startup'] * 1000:.1f} ms startup "
+              f"({', '.join(f'{r * 1000:.0f}' for r in profile['runs'])} ms)"
+              f"{'  OVER BUDGET' if over_budget else ''} ---")
+        print(f"{'Package':>24} | {'Self (ms)':>9}")
+        for name, seconds in profile["packages"][:args.top]:
+            print(f"{name:>24} | {seconds * 1000:>9.1f}")
+        print("Slowest imports (cumulative): " + ", ".join(
+            f"{name} {seconds * 1000:.0f} ms" for name, seconds in profile["slowest"][:args.top]))
+        if profile["heavy"]:
+            print(f"Heavy dependencies imported: {', '.join(profile['heavy'])}"
+                  + ("" if args.allow_heavy else "  FAIL"))
+
+    print("\n-----------------------------------------------------")
+    for profile in profiles:
+        print(f"BENCHMARK: Cold start of {profile['module']}: {profile['startup'] * 1000:.1f} ms "
+              f"(budget {args.budget_ms:.0f} ms)")
+    print("-----------------------------------------------------")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "baseline": baseline,
+                       "budget_ms": args.budget_ms, "profiles": profiles}, f, indent=2)
+        print(f"Profile written to {args.output}")
+
+    if failures:
+        print(f"Startup check failed for: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
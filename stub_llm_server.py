@@ -0,0 +1,526 @@
+"""Local stand-in for llama-server's OpenAI-compatible API.
+
+Serves `/v1/models`, `/v1/chat/completions` and `/v1/completions` (streaming
+and non-streaming) and generates a fixed number of dummy tokens at a fixed
+rate, with at most `slots` generations running at once (like llama-server's
+`-np`). A fraction of requests can be made to stall before their first token,
+to reproduce the tail latency of a busy server. Like llama-server, responses
+(and the final stream chunk) carry `usage` and `timings` blocks; prompt tokens
+are counted as words. Ollama's native `/api/chat`, `/api/generate` (NDJSON)
+and `/api/tags` are served too. This lets the client benchmarks measure
+client-side behaviour without a real model.
+
+Every slot keeps the tokens of its last prompt and answer, like llama-server's
+KV cache (for `/v1/completions` the prompt is the cached text). A request is
+pinned to a slot with `id_slot` (otherwise slots are used in turn); with
+`cache_prompt` (on by default, as in llama-server) the prefix it shares with
+the slot's cache is not processed again. Only the rest costs
+`prompt_token_delay` per token before the first token, and `timings` reports
+it as `prompt_n` with the reused tokens as `cache_n`.
+
+`/health` answers 503 for `load_delay` seconds after start (like llama-server
+while it loads the model) and 200 afterwards. The command line accepts
+llama-server's `-m`, `-np`, `-t` and `-c`, so llama_server_manager.py can run
+the stub as a fake llama-server executable.
+
+Timing is deterministic for a given seed: TTFT and per-token delays get
+Gaussian jitter (`jitter`, in seconds) from a seeded generator. Fault
+injection for the OpenAI endpoints, on a `fault_rate` fraction of requests or
+per request with an `X-Stub-Fault: <mode>` header:
+    error       HTTP 500 before generation starts
+    disconnect  connection dropped after `fault_after` tokens
+    malformed   an invalid JSON event after `fault_after` tokens (or an invalid body)
+    hang        no more output after `fault_after` tokens until the server stops
+
+Example:
+    # In-process, e.g. from a benchmark
+    with StubServer(port=0, token_delay=0.01, slots=4) as server:
+        client = LLMClient(base_url=server.base_url)
+
+    # Standalone
+    python stub_llm_server.py --port 8080 --token-delay 0.01 --slots 4
+"""
+
+import os
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+from typing import Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_MODEL_ID = "stub-model"
+FAULT_MODES = ("error", "disconnect", "malformed", "hang")
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Request handler; configuration lives on the server object."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [
+                {"id": self.server.model_id, "object": "model", "owned_by": "stub"}
+            ]})
+        elif self.path.rstrip('/') == "/health":
+            if time.monotonic() < self.server.ready_at:
+                self._send_json(503, {"error": {"code": 503, "message": "Loading model",
+                                                "type": "unavailable_error"}})
+            else:
+                self._send_json(200, {"status": "ok"})
+        elif self.path.rstrip('/') == "/api/tags":
+            self._send_json(200, {"models": [{"name": self.server.model_id, "model": self.server.model_id}]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        self._prompt_tokens = None
+        self._cache_n = 0
+        self._n_generated = 0
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON"}})
+            return
+
+        path = self.path.rstrip('/')
+        if path in ("/api/chat", "/api/generate"):
+            n_tokens = int((payload.get("options") or {}).get("num_predict") or self.server.n_tokens)
+            n_tokens = min(n_tokens, self.server.n_tokens)
+            with self.server.slots:
+                # Ollama streams unless told otherwise
+                self._ollama_completion(payload, n_tokens, chat=path == "/api/chat",
+                                        stream=payload.get("stream", True))
+            return
+
+        if path not in ("/v1/chat/completions", "/v1/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        text = path == "/v1/completions"
+        if text:
+            # Count and cache a raw prompt like a single message
+            payload = dict(payload, messages=[{"content": str(payload.get("prompt", ""))}])
+
+        n_tokens = int(payload.get("max_tokens") or self.server.n_tokens)
+        n_tokens = min(n_tokens, self.server.n_tokens)
+
+        fault = self._pick_fault()
+        if fault == "error":
+            self._send_json(500, {"error": {"code": 500, "message": "Injected fault", "type": "server_error"}})
+            return
+
+        # Block until a slot is free, like llama-server with -np slots
+        with self.server.slots:
+            slot = self._claim_slot(payload)
+            if payload.get("stream"):
+                self._stream_completion(payload, n_tokens, fault, text)
+            else:
+                self._complete(payload, n_tokens, fault, text)
+            with self.server.cache_lock:
+                self.server.slot_cache[slot] = self._prompt_tokens + [
+                    self._token_text(i).strip() for i in range(self._n_generated)]
+
+    def _claim_slot(self, payload):
+        """Pick the request's slot and count the prompt tokens its cache already holds."""
+        self._prompt_tokens = [word for msg in payload.get("messages", [])
+                               for word in str(msg.get("content", "")).split()]
+        with self.server.cache_lock:
+            slot = payload.get("id_slot", -1)
+            if not isinstance(slot, int) or not 0 <= slot < len(self.server.slot_cache):
+                slot = self.server.next_slot
+                self.server.next_slot = (slot + 1) % len(self.server.slot_cache)
+            if payload.get("cache_prompt", True):
+                cached = self.server.slot_cache[slot]
+                n = 0
+                while n < min(len(cached), len(self._prompt_tokens)) and cached[n] == self._prompt_tokens[n]:
+                    n += 1
+                # The last prompt token is always evaluated again to get the first logits
+                self._cache_n = min(n, max(len(self._prompt_tokens) - 1, 0))
+        return slot
+
+    def _pick_fault(self):
+        """Fault mode for this request: from the X-Stub-Fault header, else drawn with fault_rate."""
+        fault = self.headers.get("X-Stub-Fault")
+        if fault:
+            return fault if fault in FAULT_MODES else None
+        if self.server.fault:
+            with self.server.rng_lock:
+                if self.server.rng.random() < self.server.fault_rate:
+                    return self.server.fault
+        return None
+
+    def _jittered(self, delay):
+        if not self.server.jitter:
+            return delay
+        with self.server.rng_lock:
+            return max(delay + self.server.rng.gauss(0.0, self.server.jitter), 0.0)
+
+    def _drop_connection(self):
+        """Close the socket without finishing the response."""
+        self.close_connection = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _token_text(self, i):
+        # Every sentence_length-th token ends a sentence, and the next one starts a new one
+        n = self.server.sentence_length
+        if not n:
+            return f"tok{i} "
+        text = f"Tok{i}" if i % n == 0 else f"tok{i}"
+        return f"{text}. " if (i + 1) % n == 0 else f"{text} "
+
+    def _tokens(self, n_tokens):
+        # Time to first token, plus an occasional stall
+        delay = self.server.ttft
+        if self._prompt_tokens is not None:
+            delay += (len(self._prompt_tokens) - self._cache_n) * self.server.prompt_token_delay
+        with self.server.rng_lock:
+            if self.server.rng.random() < self.server.stall_rate:
+                delay += self.server.stall_delay
+        time.sleep(self._jittered(delay))
+        for i in range(n_tokens):
+            time.sleep(self._jittered(self.server.token_delay))
+            self._n_generated = i + 1
+            yield self._token_text(i)
+
+    def _usage_and_timings(self, payload, start, first_token, end, n_tokens):
+        """`usage` and `timings` blocks in llama-server's format."""
+        n_prompt_tokens = sum(len(str(msg.get("content", "")).split()) for msg in payload.get("messages", []))
+        prompt_n = n_prompt_tokens - self._cache_n
+        # The first token's own decode time is not part of prefill
+        prompt_ms = max((first_token - start) - self.server.token_delay, 0.0) * 1000
+        predicted_ms = (end - first_token + self.server.token_delay) * 1000 if n_tokens else 0.0
+        return {
+            "usage": {
+                "prompt_tokens": n_prompt_tokens,
+                "completion_tokens": n_tokens,
+                "total_tokens": n_prompt_tokens + n_tokens,
+            },
+            "timings": {
+                "prompt_n": prompt_n,
+                "prompt_ms": prompt_ms,
+                "prompt_per_token_ms": prompt_ms / prompt_n if prompt_n else 0.0,
+                "prompt_per_second": prompt_n * 1000 / prompt_ms if prompt_ms else 0.0,
+                "predicted_n": n_tokens,
+                "predicted_ms": predicted_ms,
+                "predicted_per_token_ms": predicted_ms / n_tokens if n_tokens else 0.0,
+                "predicted_per_second": n_tokens * 1000 / predicted_ms if predicted_ms else 0.0,
+                "cache_n": self._cache_n,
+            },
+        }
+
+    @staticmethod
+    def _choice(content, finish_reason, text, stream):
+        """A choice of a chat completion (chunk) or, with `text`, of a text completion."""
+        if text:
+            return {"index": 0, "text": content, "finish_reason": finish_reason}
+        if stream:
+            return {"index": 0, "delta": {"content": content} if content else {}, "finish_reason": finish_reason}
+        return {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}
+
+    def _complete(self, payload, n_tokens, fault=None, text=False):
+        start = time.perf_counter()
+        first_token = None
+        tokens = []
+        for token in self._tokens(min(n_tokens, self.server.fault_after) if fault else n_tokens):
+            if first_token is None:
+                first_token = time.perf_counter()
+            tokens.append(token)
+        end = time.perf_counter()
+
+        if fault == "hang":
+            self.server.stopping.wait(self.server.hang_time)
+        if fault in ("hang", "disconnect"):
+            self._drop_connection()
+            return
+        if fault == "malformed":
+            body = b'{"id": "chatcmpl-stub", "choices": [{"message": {"content": "tok0'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self._send_json(200, {
+            "id": "cmpl-stub" if text else "chatcmpl-stub",
+            "object": "text_completion" if text else "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", self.server.model_id),
+            "choices": [self._choice("".join(tokens), "length", text, stream=False)],
+            **self._usage_and_timings(payload, start, first_token or end, end, len(tokens)),
+        })
+
+    def _ollama_completion(self, payload, n_tokens, chat, stream):
+        """Ollama /api/chat or /api/generate, as NDJSON lines or a single object."""
+        if chat:
+            prompt_payload = payload
+        else:
+            prompt_payload = {"messages": [{"content": payload.get("prompt", "")}]}
+        model = payload.get("model", self.server.model_id)
+
+        def text_fields(text):
+            if chat:
+                return {"message": {"role": "assistant", "content": text}}
+            return {"response": text}
+
+        if stream:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+        start = time.perf_counter()
+        first_token = None
+        tokens = []
+        try:
+            for token in self._tokens(n_tokens):
+                if first_token is None:
+                    first_token = time.perf_counter()
+                tokens.append(token)
+                if stream:
+                    self.wfile.write((json.dumps({
+                        "model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                        **text_fields(token), "done": False,
+                    }) + "\n").encode('utf-8'))
+                    self.wfile.flush()
+            end = time.perf_counter()
+            timings = self._usage_and_timings(prompt_payload, start, first_token or end, end, len(tokens))["timings"]
+            final = {
+                "model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                **text_fields("" if stream else "".join(tokens)),
+                "done": True, "done_reason": "length",
+                "total_duration": int((end - start) * 1e9), "load_duration": 0,
+                "prompt_eval_count": timings["prompt_n"], "prompt_eval_duration": int(timings["prompt_ms"] * 1e6),
+                "eval_count": timings["predicted_n"], "eval_duration": int(timings["predicted_ms"] * 1e6),
+            }
+            if stream:
+                self.wfile.write((json.dumps(final) + "\n").encode('utf-8'))
+                self.wfile.flush()
+            else:
+                self._send_json(200, final)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-stream
+            pass
+
+    def _stream_fault(self, fault, send_event):
+        """Inject a mid-stream fault; returns True if the response is over."""
+        if fault == "malformed":
+            send_event('{"id": "chatcmpl-stub", "choices": [{"delta": ')
+            return False
+        if fault == "hang":
+            self.server.stopping.wait(self.server.hang_time)
+        self._drop_connection()
+        return True
+
+    def _stream_completion(self, payload, n_tokens, fault=None, text=False):
+        # Chunked like llama-server, so a dropped connection shows up as an incomplete body
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        created = int(time.time())
+        model = payload.get("model", self.server.model_id)
+        completion_id = "cmpl-stub" if text else "chatcmpl-stub"
+        chunk_object = "text_completion" if text else "chat.completion.chunk"
+
+        def send_event(data):
+            event = f"data: {data}\n\n".encode('utf-8')
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+            self.wfile.flush()
+
+        start = time.perf_counter()
+        first_token = None
+        n_sent = 0
+        fault_at = min(self.server.fault_after, n_tokens) if fault else -1
+        try:
+            for token in self._tokens(n_tokens):
+                if n_sent == fault_at and self._stream_fault(fault, send_event):
+                    return
+                if first_token is None:
+                    first_token = time.perf_counter()
+                n_sent += 1
+                send_event(json.dumps({
+                    "id": completion_id,
+                    "object": chunk_object,
+                    "created": created,
+                    "model": model,
+                    "choices": [self._choice(token, None, text, stream=True)],
+                }))
+            if n_sent == fault_at and self._stream_fault(fault, send_event):
+                return
+            end = time.perf_counter()
+            send_event(json.dumps({
+                "id": completion_id,
+                "object": chunk_object,
+                "created": created,
+                "model": model,
+                "choices": [self._choice("", "length", text, stream=True)],
+                **self._usage_and_timings(payload, start, first_token or end, end, n_sent),
+            }))
+            send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-stream
+            pass
+
+
+class StubServer:
+    """Stub OpenAI-compatible server running in a background thread.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+        token_delay: Seconds per generated token
+        n_tokens: Maximum tokens per completion (max_tokens in the request can lower it)
+        slots: Number of generations that can run at the same time
+        model_id: Model name reported by /v1/models
+        ttft: Seconds before the first token (prompt processing)
+        prompt_token_delay: Extra seconds before the first token per prompt token not
+            found in the slot's cache
+        sentence_length: End a sentence with '.' after every this many tokens (0: never)
+        stall_rate: Fraction of requests that stall before their first token
+        stall_delay: Extra seconds a stalled request waits
+        seed: Seed for the stall, jitter and fault decisions
+        load_delay: Seconds /health reports the model as still loading
+        jitter: Standard deviation in seconds added to TTFT and every token delay
+        fault: Fault mode to inject (one of FAULT_MODES), or None
+        fault_rate: Fraction of requests that get the fault
+        fault_after: Tokens sent before a disconnect / malformed / hang fault
+        hang_time: Seconds a hanging request waits (it is released when the server stops)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, token_delay: float = 0.01,
+                 n_tokens: int = 50, slots: int = 1, model_id: str = DEFAULT_MODEL_ID,
+                 ttft: float = 0.0, prompt_token_delay: float = 0.0, sentence_length: int = 0,
+                 stall_rate: float = 0.0, stall_delay: float = 1.0,
+                 seed: int = 0, load_delay: float = 0.0, jitter: float = 0.0,
+                 fault: Optional[str] = None, fault_rate: float = 1.0, fault_after: int = 5,
+                 hang_time: float = 3600.0):
+        if fault is not None and fault not in FAULT_MODES:
+            raise ValueError(f"Unknown fault '{fault}'. Available: {FAULT_MODES}")
+        self.httpd = ThreadingHTTPServer((host, port), _StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.token_delay = token_delay
+        self.httpd.n_tokens = n_tokens
+        self.httpd.slots = threading.BoundedSemaphore(slots)
+        self.httpd.model_id = model_id
+        self.httpd.ttft = ttft
+        self.httpd.prompt_token_delay = prompt_token_delay
+        self.httpd.sentence_length = sentence_length
+        self.httpd.slot_cache = [[] for _ in range(slots)]
+        self.httpd.next_slot = 0
+        self.httpd.cache_lock = threading.Lock()
+        self.httpd.stall_rate = stall_rate
+        self.httpd.stall_delay = stall_delay
+        self.httpd.rng = random.Random(seed)
+        self.httpd.rng_lock = threading.Lock()
+        self.httpd.ready_at = time.monotonic() + load_delay
+        self.httpd.jitter = jitter
+        self.httpd.fault = fault
+        self.httpd.fault_rate = fault_rate
+        self.httpd.fault_after = fault_after
+        self.httpd.hang_time = hang_time
+        self.httpd.stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """Start serving in a daemon thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self.httpd.stopping.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub OpenAI-compatible LLM server for client benchmarks')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='Port to bind (default: 8080)')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='Seconds per generated token (default: 0.01)')
+    parser.add_argument('--rate', type=float, default=None, help='Tokens per second (overrides --token-delay)')
+    parser.add_argument('--n-tokens', type=int, default=50, help='Maximum tokens per completion (default: 50)')
+    parser.add_argument('--slots', '-np', '--parallel', type=int, default=1,
+                        help='Concurrent generations, like -np (default: 1)')
+    parser.add_argument('--ttft', type=float, default=0.0, help='Seconds before the first token (default: 0)')
+    parser.add_argument('--prompt-token-delay', type=float, default=0.0,
+                        help='Seconds per prompt token not in the slot cache (default: 0)')
+    parser.add_argument('--sentence-length', type=int, default=0,
+                        help='Tokens per generated sentence; 0 never ends one (default: 0)')
+    parser.add_argument('--stall-rate', type=float, default=0.0,
+                        help='Fraction of requests that stall before the first token (default: 0)')
+    parser.add_argument('--stall-delay', type=float, default=1.0, help='Seconds a stall lasts (default: 1.0)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--load-delay', type=float, default=0.0,
+                        help='Seconds /health reports the model as loading (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Std. dev. in seconds added to TTFT and token delays (default: 0)')
+    parser.add_argument('--fault', type=str, default=None, choices=FAULT_MODES, help='Fault to inject (default: none)')
+    parser.add_argument('--fault-rate', type=float, default=1.0,
+                        help='Fraction of requests that get the fault (default: 1.0)')
+    parser.add_argument('--fault-after', type=int, default=5,
+                        help='Tokens sent before a mid-stream fault (default: 5)')
+    # llama-server arguments, so the stub can stand in for it
+    parser.add_argument('-m', '--model', type=str, default=None, help='Model path; its file name is reported as the model ID')
+    parser.add_argument('-t', '--threads', type=int, default=None, help='Ignored (llama-server compatibility)')
+    parser.add_argument('-c', '--ctx-size', type=int, default=None, help='Ignored (llama-server compatibility)')
+    args = parser.parse_args()
+
+    model_id = os.path.basename(args.model) if args.model else DEFAULT_MODEL_ID
+    token_delay = 1.0 / args.rate if args.rate else args.token_delay
+    server = StubServer(host=args.host, port=args.port, token_delay=token_delay,
+                        n_tokens=args.n_tokens, slots=args.slots, model_id=model_id, ttft=args.ttft,
+                        prompt_token_delay=args.prompt_token_delay, sentence_length=args.sentence_length,
+                        stall_rate=args.stall_rate, stall_delay=args.stall_delay, seed=args.seed,
+                        load_delay=args.load_delay, jitter=args.jitter, fault=args.fault,
+                        fault_rate=args.fault_rate, fault_after=args.fault_after)
+    print(f"Stub LLM server listening on {server.base_url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Seeded generator of wikitext-formatted corpora of any size.
+
+data/wikitext_small.txt (~30KB) is far too small to exercise IVF training,
+embedding batches, streaming or memory behaviour of the indexers. This writes
+synthetic corpora in the same format, from a few MB to tens of GB:
+
+     = Topic =
+
+     Sentence one , with a high @-@ end word and 1 @,@ 500 units . Sentence two .
+
+     = = Subtopic = =
+
+     = = = Sub @-@ subtopic = = =
+
+Statistics are taken from a seed corpus (data/wikitext_small.txt by default):
+sentence lengths, comma and number rates, ` @-@ ` / ` @,@ ` / ` @.@ ` token
+rates, the words themselves and their frequencies, and the section names. The
+vocabulary is extended with generated words on a Zipf distribution so BM25
+term counts grow with the corpus like real text does. The same seed always
+gives the same bytes, and articles are written as they are generated, so
+memory use stays flat whatever the target size.
+
+Example:
+    python synthetic_corpus.py --size 100MB --output data/synthetic_100mb.txt
+    python synthetic_corpus.py --size 20GB --output /mnt/ssd/synthetic_20gb.txt --seed 1
+    python index_generation_optimized.py --text-file data/synthetic_100mb.txt --index-path index_synthetic.faiss
+"""
+
+import re
+import time
+import argparse
+from collections import Counter
+import numpy as np
+
+
+SEED_CORPUS_PATH = "data/wikitext_small.txt"
+DEFAULT_VOCAB_SIZE = 200000
+ZIPF_EXPONENT = 1.07
+
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3,
+              "KIB": 1024, "MIB": 1024 ** 2, "GIB": 1024 ** 3}
+
+# Used alongside the seed corpus' own section names
+COMMON_SECTIONS = ["History", "Background", "Design", "Reception", "Legacy", "Early life", "Career",
+                   "Production", "Release", "Plot", "Geography", "Description", "Aftermath",
+                   "Personal life", "Critical reception", "Track listing", "Notes", "Development"]
+
+SYLLABLES = ["ka", "lo", "ven", "tar", "mi", "sor", "el", "dra", "qui", "ban", "ne", "thor", "ul", "pe",
+             "ris", "gal", "om", "ter", "zu", "fin", "ach", "wy", "len", "bro", "ist", "cal", "dun", "ea"]
+
+
+def parse_size(text):
+    """'100MB', '2.5GB', '512MiB' or a plain number of bytes -> bytes."""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMG]I?B|B)?\s*", text.upper())
+    if not match:
+        raise ValueError(f"Cannot parse size '{text}'")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2) or ""])
+
+
+class CorpusModel:
+    """Word and structure statistics of a seed corpus, extended with generated vocabulary.
+
+    Args:
+        seed_text: Wikitext to learn from
+        vocab_size: Total vocabulary size (seed words plus generated words)
+        seed: Seed for the generated vocabulary
+    """
+
+    def __init__(self, seed_text: str, vocab_size: int = DEFAULT_VOCAB_SIZE, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        headers = [line.strip() for line in seed_text.split('\n') if line.strip().startswith('=')]
+        body = " ".join(line for line in seed_text.split('\n') if line.strip() and not line.strip().startswith('='))
+        tokens = body.split()
+
+        sentences = [s.split() for s in re.split(r" \. ", body) if s.strip()]
+        self.sentence_lengths = np.array([len(s) for s in sentences if len(s) >= 3] or [20])
+        n_tokens = max(len(tokens), 1)
+        self.comma_rate = tokens.count(',') / n_tokens
+        self.hyphen_rate = tokens.count('@-@') / n_tokens
+        self.number_rate = sum(1 for t in tokens if t.isdigit()) / n_tokens
+        self.capital_rate = sum(1 for t in tokens if t[:1].isupper()) / n_tokens
+
+        # Words by frequency, then generated words; Zipf-Mandelbrot weights by rank
+        counts = Counter(t.lower() for t in tokens if re.fullmatch(r"[A-Za-z']+", t))
+        words = [word for word, _ in counts.most_common()]
+        known = set(words)
+        while len(words) < vocab_size:
+            n_syllables = int(rng.integers(1, 5))
+            word = "".join(SYLLABLES[i] for i in rng.integers(0, len(SYLLABLES), n_syllables))
+            if word not in known:
+                known.add(word)
+                words.append(word)
+        self.words = np.array(words[:max(vocab_size, 1)], dtype=object)
+        weights = 1.0 / (np.arange(len(self.words)) + 2.7) ** ZIPF_EXPONENT
+        self.cumulative = np.cumsum(weights / weights.sum())
+
+        names = {re.sub(r"^[=\s]+|[=\s]+$", "", h) for h in headers if h.startswith('= =')}
+        self.section_names = sorted(n for n in names | set(COMMON_SECTIONS) if n)
+
+    def draw_words(self, rng, n):
+        """n words from the Zipf vocabulary."""
+        return self.words[np.searchsorted(self.cumulative, rng.random(n), side='right').clip(0, len(self.words) - 1)]
+
+    def number(self, rng):
+        kind = rng.random()
+        if kind < 0.45:
+            return str(int(rng.integers(1800, 2021)))
+        if kind < 0.75:
+            return str(int(rng.integers(1, 100)))
+        if kind < 0.9:
+            return f"{int(rng.integers(1, 1000))} @,@ {int(rng.integers(0, 1000)):03d}"
+        return f"{int(rng.integers(0, 100))} @.@ {int(rng.integers(0, 100))}"
+
+    def title(self, rng):
+        words = [w.capitalize() for w in self.draw_words(rng, int(rng.integers(1, 4)))]
+        if rng.random() < 0.1:
+            words.append(f"( {int(rng.integers(1900, 2021))} )")
+        return " ".join(words)
+
+    def paragraph(self, rng):
+        """2-8 sentences; words and decorations are drawn for the whole paragraph at once."""
+        lengths = rng.choice(self.sentence_lengths, size=int(rng.integers(2, 9)))
+        words = self.draw_words(rng, int(lengths.sum())).tolist()
+        decorations = rng.random((3, len(words)))
+        for i in np.flatnonzero(decorations[0] < self.capital_rate):
+            words[i] = words[i].capitalize()
+        for i in np.flatnonzero(decorations[1] < self.number_rate):
+            words[i] = self.number(rng)
+        # Separator after every word: ` @-@ ` joins a compound, ` , ` splits a clause
+        separators = [" @-@ " if d < self.hyphen_rate else " , " if d < self.hyphen_rate + self.comma_rate else " "
+                      for d in decorations[2].tolist()]
+        ends = np.cumsum(lengths)
+        for start, end in zip(ends - lengths, ends):
+            words[start] = words[start][:1].upper() + words[start][1:]
+            separators[end - 1] = " . "
+        return " " + "".join([w + sep for w, sep in zip(words, separators)]) + "\n\n"
+
+    def article(self, rng):
+        """One article: title, lead paragraphs, then sections with optional subsections."""
+        parts = [f" = {self.title(rng)} = \n\n\n"]
+        parts += [self.paragraph(rng) for _ in range(int(rng.integers(1, 4)))]
+        sections = rng.choice(len(self.section_names), size=min(int(rng.integers(2, 7)), len(self.section_names)),
+                              replace=False)
+        for section in sections:
+            parts.append(f"\n = = {self.section_names[section]} = = \n\n\n")
+            parts += [self.paragraph(rng) for _ in range(int(rng.integers(1, 5)))]
+            if rng.random() < 0.25:
+                parts.append(f"\n = = = {self.title(rng)} = = = \n\n\n")
+                parts += [self.paragraph(rng) for _ in range(int(rng.integers(1, 3)))]
+        return "".join(parts)
+
+
+def iter_articles(model, seed=0):
+    """Endless stream of articles; the same seed gives the same stream."""
+    rng = np.random.default_rng(seed)
+    while True:
+        yield model.article(rng)
+
+
+def write_corpus(path, target_bytes, model, seed=0, progress=True):
+    """Write articles to `path` until it holds at least target_bytes.
+
+    Returns:
+        Tuple of (bytes written, number of articles)
+    """
+    written = 0
+    n_articles = 0
+    next_report = target_bytes / 10
+    start = time.time()
+    with open(path, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+        for article in iter_articles(model, seed):
+            data = article.encode('utf-8')
+            f.write(article)
+            written += len(data)
+            n_articles += 1
+            if written >= target_bytes:
+                break
+            if progress and written >= next_report:
+                rate = written / (time.time() - start) / 1e6
+                print(f"  {written / 1e6:.0f} MB, {n_articles} articles ({rate:.1f} MB/s)")
+                next_report += target_bytes / 10
+    return written, n_articles
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a wikitext-formatted corpus of a target size')
+    parser.add_argument('--size', type=str, default='100MB', help='Target size, e.g. 100MB, 2GB (default: 100MB)')
+    parser.add_argument('--output', type=str, default='data/synthetic.txt',
+                        help='Output file (default: data/synthetic.txt)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--seed-corpus', type=str, default=SEED_CORPUS_PATH,
+                        help=f'Wikitext the statistics are learned from (default: {SEED_CORPUS_PATH})')
+    parser.add_argument('--vocab-size', type=int, default=DEFAULT_VOCAB_SIZE,
+                        help=f'Vocabulary size (default: {DEFAULT_VOCAB_SIZE})')
+    args = parser.parse_args()
+
+    try:
+        target_bytes = parse_size(args.size)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    with open(args.seed_corpus, 'r', encoding='utf-8') as f:
+        model = CorpusModel(f.read(), vocab_size=args.vocab_size, seed=args.seed)
+
+    print(f"Generating {target_bytes / 1e6:.0f} MB into '{args.output}' (seed {args.seed}, "
+          f"{len(model.words)} words, {len(model.section_names)} section names)...")
+    start = time.time()
+    written, n_articles = write_corpus(args.output, target_bytes, model, seed=args.seed)
+    duration = time.time() - start
+    print("-----------------------------------------------------")
+    print(f"BENCHMARK: Generated {written / 1e6:.1f} MB ({n_articles} articles) in {duration:.4f} seconds "
+          f"({written / 1e6 / duration:.1f} MB/s).")
+    print("-----------------------------------------------------")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,106 @@
+"""Topic-path metadata index for filtered and scoped search.
+
+optimized_text_splitter() prefixes every chunk with its `[Topic: A > B]` path.
+This module keeps that path as structured data so searches can be restricted
+to a topic (and its subtopics) without parsing chunk text at query time.
+
+Files written for an index saved under `<prefix>`:
+    <prefix>.topics.json                 list of distinct topic paths (topic ID = position)
+    <prefix>.topics.chunk_topic_ids.npy  int32 [n_chunks], topic ID of every chunk
+    <prefix>.topics.offsets.npy          int64 [n_topics + 1], start of each topic's chunk IDs
+    <prefix>.topics.chunk_ids.npy        int64 [n_chunks], chunk IDs grouped by topic
+"""
+
+import os
+import json
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+
+
+TOPIC_SEPARATOR = " > "
+
+
+class TopicIndex:
+    """Topic -> chunk-ID table plus a per-chunk topic ID array.
+
+    Example:
+        topics = TopicIndex.build(["Sinclair Sovereign", "Sinclair Sovereign > History", ...])
+        topics.save("index_optimized.faiss")
+
+        topics = TopicIndex.load("index_optimized.faiss")
+        ids = topics.select_ids("Sinclair Sovereign")  # includes "Sinclair Sovereign > History"
+    """
+
+    def __init__(self, topics: List[str], chunk_topic_ids: np.ndarray,
+                 offsets: np.ndarray, chunk_ids: np.ndarray):
+        self.topics = topics
+        self.chunk_topic_ids = chunk_topic_ids
+        self.offsets = offsets
+        self.chunk_ids = chunk_ids
+
+    @classmethod
+    def build(cls, chunk_topics: Sequence[str]) -> "TopicIndex":
+        """Build the tables from the topic path of every chunk (in chunk order)."""
+        topic_ids: Dict[str, int] = {}
+        chunk_topic_ids = np.empty(len(chunk_topics), dtype=np.int32)
+        for chunk_id, topic in enumerate(chunk_topics):
+            chunk_topic_ids[chunk_id] = topic_ids.setdefault(topic, len(topic_ids))
+
+        # Group chunk IDs by topic; a stable sort keeps them ascending within a topic
+        chunk_ids = np.argsort(chunk_topic_ids, kind='stable').astype(np.int64)
+        counts = np.bincount(chunk_topic_ids, minlength=len(topic_ids))
+        offsets = np.zeros(len(topic_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        return cls(list(topic_ids), chunk_topic_ids, offsets, chunk_ids)
+
+    @staticmethod
+    def exists(prefix: str) -> bool:
+        """Check whether a topic index was saved under `prefix`."""
+        return os.path.exists(prefix + ".topics.json")
+
+    def save(self, prefix: str):
+        """Write the topic list and ID arrays next to `prefix`."""
+        with open(prefix + ".topics.json", 'w') as f:
+            json.dump(self.topics, f)
+        np.save(prefix + ".topics.chunk_topic_ids.npy", self.chunk_topic_ids)
+        np.save(prefix + ".topics.offsets.npy", self.offsets)
+        np.save(prefix + ".topics.chunk_ids.npy", self.chunk_ids)
+
+    @classmethod
+    def load(cls, prefix: str) -> "TopicIndex":
+        """Load a topic index saved with save()."""
+        with open(prefix + ".topics.json", 'r') as f:
+            topics = json.load(f)
+        return cls(
+            topics=topics,
+            chunk_topic_ids=np.load(prefix + ".topics.chunk_topic_ids.npy"),
+            offsets=np.load(prefix + ".topics.offsets.npy"),
+            chunk_ids=np.load(prefix + ".topics.chunk_ids.npy"),
+        )
+
+    def match_topics(self, topic_filter: Union[str, Sequence[str]]) -> List[int]:
+        """Return the IDs of all topics equal to, or nested under, the filter path(s).
+
+        Matching is case-insensitive, so "sinclair sovereign" matches both
+        "Sinclair Sovereign" and "Sinclair Sovereign > History".
+        """
+        filters = [topic_filter] if isinstance(topic_filter, str) else list(topic_filter)
+        filters = [f.strip().lower() for f in filters]
+
+        matches = []
+        for topic_id, topic in enumerate(self.topics):
+            topic = topic.lower()
+            if any(topic == f or topic.startswith(f + TOPIC_SEPARATOR.lower()) for f in filters):
+                matches.append(topic_id)
+        return matches
+
+    def select_ids(self, topic_filter: Union[str, Sequence[str]]) -> np.ndarray:
+        """Return the sorted chunk IDs that belong to the matching topics."""
+        topic_ids = self.match_topics(topic_filter)
+        if not topic_ids:
+            return np.empty(0, dtype=np.int64)
+        ids = np.concatenate([self.chunk_ids[self.offsets[t]:self.offsets[t + 1]] for t in topic_ids])
+        ids.sort()
+        return ids